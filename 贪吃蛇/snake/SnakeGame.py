@@ -1,18 +1,42 @@
 # -*- coding: utf-8 -*-
 # 主程序：使用拆分后的模块（碰撞判定、排行榜、页面）
-import pygame
+# 导入本模块没有副作用：pygame 初始化、窗口、字体与排行榜都在 main() 中创建；联机与自动驾驶模块在用到时才导入。
+# python SnakeGame.py --startup-time 输出启动各阶段耗时（到首帧为止）后退出。
+# python SnakeGame.py --board 5000x5000 使用大于窗口的棋盘（分块存储，视口跟随蛇头）。
+# python SnakeGame.py --connect localhost:7777 作为联机客户端，局面由 netplay.py serve 的服务器推进。
+# python SnakeGame.py --autopilot 演示模式：由自动驾驶操控，死亡后直接开下一局，不记入排行榜。
+# python SnakeGame.py --profile frames.csv 记录逐帧各阶段耗时，退出时导出（.json 为 Chrome trace）；局中按 F3 显示帧耗时。
 import time
-import random
+_IMPORT_START = time.perf_counter()
+import argparse
+import atexit
+import sys
+import pygame
 import os
 from datetime import datetime
-import collision
 import pages
 import leaderboard
+import persist
+import profiling
+import replay
+import snapshot
+import fonts
+import occupancy
+from renderer import make_renderer
+from engine import SnakeEngine, CELL, board_size
+from inputbuffer import TurnBuffer
 
 # 全局配置常量
 snake_speed = 30
+# 输入与绘制的帧率；蛇的移动按 snake_speed 以固定步长推进，与帧率无关
+RENDER_FPS = 60
+# 一帧内最多补推的步数（窗口被拖动等长时间卡顿后不一次性快进）
+MAX_CATCHUP_TICKS = 5
 window_x = 720
 window_y = 480
+# 棋盘尺寸（格）；默认与窗口相同，--board 指定更大的棋盘时由视口显示蛇头附近的部分
+board_w = window_x // CELL
+board_h = window_y // CELL
 
 black = pygame.Color(0, 0, 0)
 white = pygame.Color(255, 255, 255)
@@ -23,40 +47,20 @@ yellow = pygame.Color(255, 255, 0)
 gray = pygame.Color(100, 100, 100)
 light_gray = pygame.Color(170, 170, 170)
 
-pygame.init()
-pygame.display.set_caption('贪吃蛇 - Pavan Ananth Sharma')
-game_window = pygame.display.set_mode((window_x, window_y))
-fps = pygame.time.Clock()
+# 占用网格标记 → 颜色
+PALETTE = {
+    occupancy.EMPTY: black,
+    occupancy.BODY: green,
+    occupancy.OBSTACLE: yellow,
+    occupancy.FRUIT_WHITE: white,
+    occupancy.FRUIT_RED: red,
+}
 
 try:
     BASE_DIR = os.path.dirname(__file__)
 except NameError:
     BASE_DIR = os.path.abspath(os.curdir)
 
-# 字体查找与获取（保持原逻辑）
-def find_chinese_font():
-    candidates = ['msyh', 'msyhui', 'simhei', 'simsun', 'noto', 'noto sans cjk', 'arialunicode', 'wqy-zenhei', 'wqy-microhei']
-    for name in candidates:
-        f = pygame.font.match_font(name)
-        if f:
-            return f
-    fonts_dir = os.path.join(BASE_DIR, 'fonts')
-    if os.path.isdir(fonts_dir):
-        for fname in os.listdir(fonts_dir):
-            if fname.lower().endswith(('.ttf', '.ttc', '.otf')):
-                return os.path.join(fonts_dir, fname)
-    return None
-
-FONT_PATH = find_chinese_font()
-
-def get_font(size, bold=False):
-    try:
-        if FONT_PATH:
-            return pygame.font.Font(FONT_PATH, size)
-    except Exception:
-        pass
-    return pygame.font.SysFont('arial', size, bold=bold)
-
 # 游戏配置
 RED_PROBABILITY = 0.2
 MAX_FRUITS = 20
@@ -68,280 +72,343 @@ CENTER_X = window_x // 2
 CENTER_Y = window_y // 2
 
 # 排行榜模块配置
-LEADERBOARD_FILE = os.path.join(BASE_DIR, "leaderboard.json")
-leaderboard.configure(LEADERBOARD_FILE, size=10)
-
-# 可重置状态
-snake_position = None
-snake_body = None
-fruits = None
-move_count = None
-pending_growth = None
-direction = None
-change_to = None
+# 排行榜使用 SQLite 后端保存全部历史；首次运行时导入旧的 leaderboard.json
+LEADERBOARD_FILE = os.path.join(BASE_DIR, "leaderboard.db")
+LEGACY_LEADERBOARD_FILE = os.path.join(BASE_DIR, "leaderboard.json")
+# 排行榜写入与逐局统计都在后台线程完成，游戏结束页面不等待磁盘；退出时自动落盘
+TELEMETRY_FILE = os.path.join(BASE_DIR, "telemetry.jsonl")
+# 每局录像（种子 + 每步输入）保存到 replays 目录，可用 replay.py 校验分数或回放
+REPLAY_DIR = os.path.join(BASE_DIR, "replays")
+# 局中按 F5 存档、F9 读档（整局状态的二进制快照）
+SAVE_FILE = os.path.join(BASE_DIR, "savegame.snks")
+# 本次运行中最近一次存档的内容（读档时优先使用，不等待后台写入）
+last_save = None
+
+KEY_DIRECTIONS = {pygame.K_UP: 'UP', pygame.K_DOWN: 'DOWN', pygame.K_LEFT: 'LEFT', pygame.K_RIGHT: 'RIGHT'}
+
+# 运行时对象，由 main() 创建
+game_window = None
+fps = None
+FONT_PATH = None
+writer = None
+engine = None
+recorder = None
+renderer = None
+# 方向键按顺序缓冲，每步消费一个有效转向
+turns = TurnBuffer()
+# 演示模式下代替方向键给出每步输入的自动驾驶
+pilot = None
+# 逐帧剖析：未开启时为 None，主循环与引擎都不计时
+profiler = None
+PROFILE_KEY = pygame.K_F3
+# 叠加显示的帧耗时统计每隔多久刷新一次（毫秒）
+OVERLAY_REFRESH_MS = 250
+OVERLAY_WIDTH = 300
+show_profile = False
+overlay_surface = None
+overlay_time = 0
 score = None
-obstacles = []
 difficulty = None
+# 读档后的局没有从开局起的完整输入，不再保存录像
+recording = True
 
-# 生成果实与障碍（保留原逻辑，但使用 collision.in_center_block）
-def spawn_fruit(fruits_list, fruit_type=None):
-    if len(fruits_list) >= MAX_FRUITS:
-        return
-    attempts = 0
-    while attempts < 1000:
-        pos = [random.randrange(1, (window_x // 10)) * 10,
-               random.randrange(1, (window_y // 10)) * 10]
-        collision_with_snake = any(pos[0] == b[0] and pos[1] == b[1] for b in snake_body)
-        collision_with_fruits = any(pos[0] == f['pos'][0] and pos[1] == f['pos'][1] for f in fruits_list)
-        collision_with_obstacles = any(pos[0] == o[0] and pos[1] == o[1] for o in obstacles)
-        if not (collision_with_snake or collision_with_fruits or collision_with_obstacles or collision.in_center_block(pos[0], pos[1], CENTER_X, CENTER_Y, CENTER_BLOCK_HALF)):
-            local_type = fruit_type if fruit_type is not None else ('red' if random.random() < RED_PROBABILITY else 'white')
-            fruits_list.append({'pos': pos, 'type': local_type, 'spawn_time': pygame.time.get_ticks()})
-            return
-        attempts += 1
-
-def spawn_obstacles(count):
-    attempts = 0
-    created = 0
-    grid_w = window_x // 10
-    grid_h = window_y // 10
-    while created < count and attempts < count * 200:
-        pos = [random.randrange(0, grid_w) * 10,
-               random.randrange(0, grid_h) * 10]
-        if collision.in_center_block(pos[0], pos[1], CENTER_X, CENTER_Y, CENTER_BLOCK_HALF):
-            attempts += 1
-            continue
-        collision_with_snake = any(pos[0] == b[0] and pos[1] == b[1] for b in snake_body)
-        collision_with_fruits = any(pos[0] == f['pos'][0] and pos[1] == f['pos'][1] for f in fruits)
-        collision_with_obstacles = any(pos[0] == o[0] and pos[1] == o[1] for o in obstacles)
-        if not (collision_with_snake or collision_with_fruits or collision_with_obstacles):
-            obstacles.append(pos)
-            created += 1
-        attempts += 1
-
-def spawn_large_obstacles(num, w=3, h=3):
-    # 声明使用全局的 obstacles 变量
-    global obstacles
-    
-    grid_w = window_x // 10
-    grid_h = window_y // 10
-    w = max(1, min(w, grid_w))
-    h = max(1, min(h, grid_h))
-    created = 0
-    attempts = 0
-    max_attempts = 2000
-    
-    while created < num and attempts < max_attempts:
-        # 随机选择一个起始位置
-        tl_x = random.randint(0, grid_w - w)
-        tl_y = random.randint(0, grid_h - h)
-        
-        # 检查是否会与中心区域重叠
-        would_hit_center = False
-        for gx in range(tl_x, tl_x + w):
-            for gy in range(tl_y, tl_y + h):
-                px, py = gx * 10, gy * 10
-                if collision.in_center_block(px, py, CENTER_X, CENTER_Y, CENTER_BLOCK_HALF):
-                    would_hit_center = True
-                    break
-            if would_hit_center:
-                break
-        
-        if would_hit_center:
-            attempts += 1
-            continue
-        
-        # 检查是否与蛇身重叠
-        overlap_with_snake = False
-        for gx in range(tl_x, tl_x + w):
-            for gy in range(tl_y, tl_y + h):
-                px, py = gx * 10, gy * 10
-                if any(px == b[0] and py == b[1] for b in snake_body):
-                    overlap_with_snake = True
-                    break
-            if overlap_with_snake:
-                break
-        
-        if overlap_with_snake:
-            attempts += 1
-            continue
-        
-        # 检查是否与现有障碍物重叠
-        overlap_with_obstacles = False
-        for gx in range(tl_x, tl_x + w):
-            for gy in range(tl_y, tl_y + h):
-                px, py = gx * 10, gy * 10
-                if any(px == o[0] and py == o[1] for o in obstacles):
-                    overlap_with_obstacles = True
-                    break
-            if overlap_with_obstacles:
-                break
-        
-        if overlap_with_obstacles:
-            attempts += 1
-            continue
-        
-        # 检查是否与果实重叠
-        overlap_with_fruits = False
-        for gx in range(tl_x, tl_x + w):
-            for gy in range(tl_y, tl_y + h):
-                px, py = gx * 10, gy * 10
-                if any(px == f['pos'][0] and py == f['pos'][1] for f in fruits):
-                    overlap_with_fruits = True
-                    break
-            if overlap_with_fruits:
-                break
-        
-        if overlap_with_fruits:
-            attempts += 1
-            continue
-        
-        # 如果所有检查都通过，生成障碍物
-        for gx in range(tl_x, tl_x + w):
-            for gy in range(tl_y, tl_y + h):
-                obstacles.append([gx * 10, gy * 10])
-        created += 1
-        
-        attempts += 1
-    
-    print(f"Generated {created} large obstacles out of {num} requested")
+# 字体获取：字体对象按字号缓存，见 fonts 模块
+def get_font(size, bold=False):
+    return fonts.load_font(FONT_PATH, size, bold)
 
 def reset_game():
-    global snake_position, snake_body, fruits, move_count, pending_growth, direction, change_to, score, obstacles
-    cx = (window_x // 2 // 10) * 10
-    cy = (window_y // 2 // 10) * 10
-    snake_position = [cx, cy]
-    snake_body = [[cx, cy],
-                  [cx - 10, cy],
-                  [cx - 20, cy],
-                  [cx - 30, cy]]
-    fruits = []
-    move_count = 0
-    pending_growth = 0
-    direction = 'RIGHT'
-    change_to = direction
-    score = 0
-    obstacles = []  # 清空障碍物列表
-    spawn_fruit(fruits, 'white')
-    # 只在困难模式下生成障碍物
-    if difficulty == 'hard':
-        # 尝试生成更多但更小的障碍物
-        spawn_large_obstacles(6, w=3, h=3)
+    global score, recording
+    engine.difficulty = difficulty
+    engine.snake_speed = snake_speed
+    engine.red_probability = RED_PROBABILITY
+    engine.reset()
+    recorder.start()
+    recording = True
+    renderer.invalidate()
+    turns.clear()
+    score = engine.score
+
+def save_game():
+    global last_save
+    try:
+        data = snapshot.dumps(engine)
+    except snapshot.SnapshotError:
+        return
+    last_save = data
+    writer.submit_file(SAVE_FILE, data)
 
-def show_score(choice, color, font_name, size):
-    score_font = get_font(size)
-    score_surface = score_font.render('分数：' + str(score), True, color)
-    score_rect = score_surface.get_rect()
-    game_window.blit(score_surface, score_rect)
+def load_game():
+    global score, recording, difficulty, snake_speed, RED_PROBABILITY
+    # 本次运行中保存过时直接用内存中的内容：刚提交的存档可能还在后台写入队列里，不等待写入完成
+    if last_save is None and not os.path.exists(SAVE_FILE):
+        return
+    try:
+        if last_save is not None:
+            snapshot.load_into(engine, last_save)
+        else:
+            snapshot.load(SAVE_FILE, engine)
+    except (OSError, snapshot.SnapshotError):
+        return
+    difficulty, snake_speed, RED_PROBABILITY = engine.difficulty, engine.snake_speed, engine.red_probability
+    recording = False
+    renderer.invalidate()
+    turns.clear()
+    score = engine.score
+
+# 分数文字只在分数变化时重新渲染
+score_surface = None
+score_surface_value = None
 
-# 初始化流程：使用 pages 模块的页面函数
-pages.show_start_screen(game_window, get_font, fps, window_x, window_y)
+def show_score(choice, color, font_name, size):
+    global score_surface, score_surface_value
+    if score_surface is None or score_surface_value != score:
+        score_surface = fonts.render_text(get_font, '分数：' + str(score), size, color)
+        score_surface_value = score
+    return score_surface
 
 # 修改：将难度选择放在一个函数中，确保全局变量被正确更新
 def select_difficulty():
     global difficulty, snake_speed, RED_PROBABILITY
     difficulty, snake_speed, RED_PROBABILITY = pages.show_difficulty_screen(game_window, get_font, fps, window_x, window_y)
 
-select_difficulty()
-reset_game()
-
-# 主循环
-while True:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            pygame.quit()
-            raise SystemExit
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_UP:
-                change_to = 'UP'
-            if event.key == pygame.K_DOWN:
-                change_to = 'DOWN'
-            if event.key == pygame.K_LEFT:
-                change_to = 'LEFT'
-            if event.key == pygame.K_RIGHT:
-                change_to = 'RIGHT'
-            if event.key == pygame.K_ESCAPE:
+def show_leaderboard(rank):
+    # 总榜之外再给出本难度下的名次与百分位；总名次在前 N 名之外时显示其附近的几名。
+    # 全部查询排在本局成绩的写入之后由后台线程执行，界面线程不等待磁盘、也不持有排行榜的锁
+    final_score, final_difficulty = score, difficulty
+
+    def summary():
+        pct = leaderboard.percentile(final_score, final_difficulty)
+        if pct is None:
+            return None
+        return f"{pages.DIFF_MAP.get(final_difficulty, '未知')}难度第 {leaderboard.rank_of(final_score, final_difficulty)} 名，超过 {pct:.1f}% 的成绩"
+    board = writer.submit_query(pages.query_leaderboard, leaderboard.load_leaderboard, rank, leaderboard.page, summary)
+    pages.show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, board, LEADERBOARD_LOCK_SECONDS)
+
+def enable_profiler():
+    global profiler
+    if profiler is None:
+        profiler = profiling.Profiler()
+        profiler.instrument(engine)
+    return profiler
+
+def toggle_profile_overlay():
+    global show_profile, overlay_surface
+    enable_profiler()
+    show_profile = not show_profile
+    overlay_surface = None
+    # 关闭时整屏重画以擦掉叠加层
+    renderer.invalidate()
+
+def draw_profile_overlay(rects):
+    """右上角叠加帧耗时 p50 / p99 与最慢阶段；统计每 OVERLAY_REFRESH_MS 刷新一次。"""
+    global overlay_surface, overlay_time
+    now = pygame.time.get_ticks()
+    if overlay_surface is None or now - overlay_time >= OVERLAY_REFRESH_MS:
+        p50, p99, phases, slowest = profiler.stats()
+        lines = [f'帧耗时 p50 {p50 / 1e6:.2f} ms  p99 {p99 / 1e6:.2f} ms']
+        if slowest is not None:
+            lines.append(f'最慢阶段 {slowest}  p99 {phases[slowest][1] / 1e6:.2f} ms')
+        texts = [fonts.render_text(get_font, line, 16, white) for line in lines]
+        overlay_surface = pygame.Surface((OVERLAY_WIDTH, 4 + 20 * len(texts)))
+        overlay_surface.fill(gray)
+        for i, text in enumerate(texts):
+            overlay_surface.blit(text, (6, 2 + 20 * i))
+        overlay_time = now
+    rect = game_window.blit(overlay_surface, (window_x - OVERLAY_WIDTH - 4, 4))
+    if rects is not None:
+        rects.append(rect)
+
+def startup(timings=None):
+    """初始化 pygame、窗口、字体、排行榜与引擎；timings 为列表时追加 (阶段, 累计秒数)。"""
+    global game_window, fps, FONT_PATH, writer, engine, recorder, renderer
+
+    def mark(phase):
+        if timings is not None:
+            timings.append((phase, time.perf_counter() - _IMPORT_START))
+
+    mark('import')
+    pygame.init()
+    pygame.display.set_caption('贪吃蛇 - Pavan Ananth Sharma')
+    game_window = pygame.display.set_mode((window_x, window_y))
+    fps = pygame.time.Clock()
+    mark('pygame.init + window')
+
+    # 字体查找结果缓存在磁盘上，字体文件未变时不再扫描系统字体
+    FONT_PATH = fonts.find_chinese_font_cached(BASE_DIR)
+    mark('font discovery')
+
+    leaderboard.configure(LEADERBOARD_FILE, size=10)
+    leaderboard.import_legacy_json(LEGACY_LEADERBOARD_FILE)
+    writer = persist.BackgroundWriter(TELEMETRY_FILE)
+    mark('leaderboard')
+
+    # 可重置状态：规则与状态都在无界面引擎中，这里只负责输入、绘制与页面
+    engine = SnakeEngine(board_w * CELL, board_h * CELL, red_probability=RED_PROBABILITY, max_fruits=MAX_FRUITS,
+                         fruit_lifetime_ms=FRUIT_LIFETIME_MS, center_block_half=CENTER_BLOCK_HALF)
+    recorder = replay.ReplayRecorder(engine)
+    # 增量渲染：每帧只重画变化的格子；大棋盘只画视口内的块
+    renderer = make_renderer(game_window, engine, PALETTE)
+    mark('engine + renderer')
+
+def run():
+    global score
+    # 主循环：每帧轮询输入并绘制；累计的时间每满一步（1000 / snake_speed 毫秒）推进一步
+    accumulator = 0.0
+    fps.tick()
+    t = 0
+    while True:
+        prof = profiler
+        if prof is not None:
+            t = prof.begin_frame()
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
                 pygame.quit()
                 raise SystemExit
-
-    # 移除过期果实
-    now_ms = pygame.time.get_ticks()
-    before_count = len(fruits)
-    fruits[:] = [f for f in fruits if now_ms - f.get('spawn_time', now_ms) < FRUIT_LIFETIME_MS]
-    removed = before_count - len(fruits)
-    for _ in range(removed):
-        if len(fruits) < MAX_FRUITS:
-            spawn_fruit(fruits)
-
-    # 防止反向
-    if change_to == 'UP' and direction != 'DOWN':
-        direction = 'UP'
-    if change_to == 'DOWN' and direction != 'UP':
-        direction = 'DOWN'
-    if change_to == 'LEFT' and direction != 'RIGHT':
-        direction = 'LEFT'
-    if change_to == 'RIGHT' and direction != 'LEFT':
-        direction = 'RIGHT'
-
-    # 移动蛇头
-    if direction == 'UP':
-        snake_position[1] -= 10
-    if direction == 'DOWN':
-        snake_position[1] += 10
-    if direction == 'LEFT':
-        snake_position[0] -= 10
-    if direction == 'RIGHT':
-        snake_position[0] += 10
-
-    move_count += 1
-    if move_count % 20 == 0 and len(fruits) < MAX_FRUITS:
-        spawn_fruit(fruits)
-
-    snake_body.insert(0, list(snake_position))
-
-    eaten_index = None
-    for i, f in enumerate(fruits):
-        if snake_position[0] == f['pos'][0] and snake_position[1] == f['pos'][1]:
-            eaten_index = i
-            if f['type'] == 'white':
-                score += 10
-                pending_growth += 1
-            else:
-                score += 20
-                pending_growth += 2
-            break
-
-    if eaten_index is not None:
-        fruits.pop(eaten_index)
-        if len(fruits) == 0:
-            spawn_fruit(fruits)
-    else:
-        if pending_growth > 0:
-            pending_growth -= 1
-        else:
-            snake_body.pop()
-
-    game_window.fill(black)
-
-    for o in obstacles:
-        pygame.draw.rect(game_window, yellow, pygame.Rect(o[0], o[1], 10, 10))
-
-    for pos in snake_body:
-        pygame.draw.rect(game_window, green, pygame.Rect(pos[0], pos[1], 10, 10))
-
-    for f in fruits:
-        col = red if f['type'] == 'red' else white
-        pygame.draw.rect(game_window, col, pygame.Rect(f['pos'][0], f['pos'][1], 10, 10))
-
-    # 撞墙 / 障碍 / 自身 碰撞判定 使用 collision 模块
-    if collision.hit_wall(snake_position, window_x, window_y):
-        pages.show_game_over_screen(game_window, get_font, fps, window_x, window_y, leaderboard.add_score_to_leaderboard, lambda idx: pages.show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, leaderboard.load_leaderboard, idx, LEADERBOARD_LOCK_SECONDS), select_difficulty, reset_game, score, difficulty)
-    if collision.hit_obstacle(snake_position, obstacles):
-        pages.show_game_over_screen(game_window, get_font, fps, window_x, window_y, leaderboard.add_score_to_leaderboard, lambda idx: pages.show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, leaderboard.load_leaderboard, idx, LEADERBOARD_LOCK_SECONDS), select_difficulty, reset_game, score, difficulty)
-    if collision.hit_self(snake_position, snake_body):
-        pages.show_game_over_screen(game_window, get_font, fps, window_x, window_y, leaderboard.add_score_to_leaderboard, lambda idx: pages.show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, leaderboard.load_leaderboard, idx, LEADERBOARD_LOCK_SECONDS), select_difficulty, reset_game, score, difficulty)
-
-    show_score(1, white, 'times new roman', 20)
-
-    pygame.display.update()
-    fps.tick(snake_speed)
\ No newline at end of file
+            if event.type == pygame.KEYDOWN:
+                if event.key in KEY_DIRECTIONS:
+                    turns.push(KEY_DIRECTIONS[event.key], engine.direction)
+                if event.key == pygame.K_F5:
+                    save_game()
+                if event.key == pygame.K_F9:
+                    load_game()
+                if event.key == PROFILE_KEY:
+                    toggle_profile_overlay()
+                if event.key == pygame.K_ESCAPE:
+                    pygame.quit()
+                    raise SystemExit
+        if prof is not None:
+            t = prof.span(profiling.EVENTS, t)
+
+        tick_ms = 1000.0 / snake_speed
+        accumulator = min(accumulator, tick_ms * MAX_CATCHUP_TICKS)
+        death = None
+        while accumulator >= tick_ms:
+            accumulator -= tick_ms
+            change_to = pilot() if pilot is not None else turns.pop(engine.direction)
+            recorder.record(change_to)
+            death = engine.step(change_to)
+            if death is not None:
+                break
+        score = engine.score
+        if prof is not None:
+            t = prof.span(profiling.TICK, t)
+
+        # 演示模式：不记分、不存录像，直接开下一局
+        if death is not None and pilot is not None:
+            reset_game()
+            death = None
+            accumulator = 0.0
+
+        # 撞墙 / 障碍 / 自身 碰撞判定由引擎完成
+        if death is not None:
+            now = datetime.utcnow()
+            replay_file = os.path.join(REPLAY_DIR, f"{now:%Y%m%d-%H%M%S}_{score}.snkr")
+            if recording:
+                writer.submit_file(replay_file, recorder.finish().to_bytes())
+            writer.submit_telemetry({"time": now.isoformat() + "Z", "score": score, "difficulty": difficulty,
+                                     "ticks": engine.move_count, "death": death, "fruits": engine.fruits_eaten,
+                                     "seed": engine.seed, "replay": os.path.basename(replay_file) if recording else None})
+            pages.show_game_over_screen(game_window, get_font, fps, window_x, window_y, writer.submit_score, show_leaderboard, select_difficulty, reset_game, score, difficulty)
+            # 停留在结算与菜单页面的时间不计入新一局
+            accumulator = 0.0
+            fps.tick()
+            if prof is not None:
+                t = prof.restart_frame()
+
+        label = show_score(1, white, 'times new roman', 20)
+        if prof is not None:
+            t = prof.span(profiling.SCORE, t)
+        rects = renderer.draw(label)
+        if show_profile:
+            draw_profile_overlay(rects)
+        if prof is not None:
+            t = prof.span(profiling.DRAW, t)
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+        if prof is not None:
+            t = prof.span(profiling.PRESENT, t)
+        accumulator += fps.tick(RENDER_FPS)
+        if prof is not None:
+            prof.span(profiling.WAIT, t)
+
+def run_remote(address):
+    """联机模式：只把方向键发给服务器，按服务器广播的增量绘制；死亡与重开都由服务器决定。"""
+    global score
+    # 联机（asyncio）与自动驾驶只在对应模式下导入，不进入单机启动路径
+    import netplay
+    host, _, port = address.rpartition(':')
+    try:
+        client = netplay.NetClient(host or 'localhost', int(port or netplay.DEFAULT_PORT))
+    except (OSError, ValueError, netplay.ProtocolError) as e:
+        print(f'无法连接 {address}: {e}', file=sys.stderr)
+        return 1
+    game = client.game
+    view = make_renderer(game_window, game, PALETTE)
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                client.close()
+                pygame.quit()
+                return 0
+            if event.type == pygame.KEYDOWN and event.key in KEY_DIRECTIONS:
+                client.send_action(KEY_DIRECTIONS[event.key])
+        try:
+            if client.poll():
+                view.invalidate()
+        except (ConnectionError, netplay.ProtocolError) as e:
+            print(f'连接已断开: {e}', file=sys.stderr)
+            client.close()
+            pygame.quit()
+            return 1
+        score = game.score
+        rects = view.draw(show_score(1, white, 'times new roman', 20))
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+        fps.tick(RENDER_FPS)
+
+def main(argv=None):
+    global board_w, board_h, pilot
+    parser = argparse.ArgumentParser(description='贪吃蛇')
+    parser.add_argument('--startup-time', action='store_true', help='输出启动各阶段耗时（到开始页面首帧）后退出')
+    parser.add_argument('--board', type=board_size, help='棋盘尺寸（格），如 5000x5000；默认与窗口相同')
+    parser.add_argument('--connect', metavar='HOST:PORT', help='连接联机服务器（netplay.py serve）')
+    parser.add_argument('--autopilot', action='store_true', help='演示模式：由自动驾驶操控')
+    parser.add_argument('--profile', metavar='PATH', help='记录逐帧各阶段耗时，退出时导出到 PATH（.csv 或 .json）')
+    args = parser.parse_args(argv)
+    if args.board:
+        board_w, board_h = args.board
+
+    timings = [] if args.startup_time else None
+    startup(timings)
+    if args.startup_time:
+        # 预先放入一个空格键事件：开始页面画完首帧后立即返回
+        pygame.event.post(pygame.event.Event(pygame.KEYDOWN, key=pygame.K_SPACE))
+    # 初始化流程：使用 pages 模块的页面函数
+    pages.show_start_screen(game_window, get_font, fps, window_x, window_y)
+    if args.startup_time:
+        timings.append(('first frame', time.perf_counter() - _IMPORT_START))
+        prev = 0.0
+        for phase, t in timings:
+            print(f'{phase:<20} {1000 * (t - prev):8.1f} ms  (累计 {1000 * t:8.1f} ms)', file=sys.stderr)
+            prev = t
+        writer.close()
+        pygame.quit()
+        return 0
+
+    if args.connect:
+        return run_remote(args.connect)
+    if args.profile:
+        atexit.register(enable_profiler().export, args.profile)
+    select_difficulty()
+    if args.autopilot:
+        import autopilot
+        pilot = autopilot.Autopilot(engine)
+    reset_game()
+    run()
+
+if __name__ == '__main__':
+    sys.exit(main())
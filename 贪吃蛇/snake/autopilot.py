@@ -0,0 +1,515 @@
+# -*- coding: utf-8 -*-
+# 自动驾驶：演示模式与无界面压测用的机器人，每步返回一个方向（与主循环中的 change_to 相同的输入）。
+# 到果实的距离场用多源 BFS 计算，随蛇头前进、蛇尾让出格子、果实生成与消失增量更新；
+# 找不到安全的果实路线时改为追尾或选可活动空间（泛洪计数）最大的方向。
+# 每次决策有处理格子数的预算（而不是时间预算），距离场更新与泛洪计数都从中扣除，决策与机器负载无关，
+# 同一种子的对局可复现；大棋盘上的整体重建分摊到多步完成。
+#
+# 用法示例：
+#   python autopilot.py --games 50 --difficulty hard
+#   python sweep.py --policy autopilot:policy --games 500
+#   python SnakeGame.py --autopilot
+import argparse
+import heapq
+import sys
+import time
+import weakref
+from collections import deque
+
+import engine
+from occupancy import EMPTY, BODY, OBSTACLE, FRUIT_WHITE, FRUIT_RED
+
+INF = 1 << 30
+# 每次决策最多处理的格子数（距离场更新与泛洪计数合计）：约合数毫秒，困难模式 40 步/秒时一步 25 毫秒，预算只占其中一小部分
+DECISION_BUDGET_NODES = 8192
+# 距离场每步最多用掉预算的 1/FIELD_SHARE，其余留给泛洪计数
+FIELD_SHARE = 2
+# 增量更新波及的格子超过棋盘的 1/REBUILD_FRACTION（或超出本步预算）时改为整体重建
+REBUILD_FRACTION = 4
+# 占用标记 → 是否可通行（空地与果实）
+PASSABLE = bytes(1 if tag in (EMPTY, FRUIT_WHITE, FRUIT_RED) else 0 for tag in range(256))
+
+
+def neighbors(idx, width, n):
+    """格子 idx 上下左右不越界的邻格（按需计算，不为整个棋盘预先建邻接表）。"""
+    x = idx % width
+    result = []
+    if x > 0:
+        result.append(idx - 1)
+    if x < width - 1:
+        result.append(idx + 1)
+    if idx >= width:
+        result.append(idx - width)
+    if idx < n - width:
+        result.append(idx + width)
+    return result
+
+
+class DistanceField:
+    """
+    到最近源点（果实）的 BFS 距离场，owner 记录每格最近的源点，basins 为 源点 → 以它为最近源点的格子集合
+    （与 owner 同步维护）。block / free / add_source / remove_source 只登记变化，update() 统一处理：
+    被占用的格子先找出失去最短路支撑的区域（距离只会变大）；消失的源点只影响它的 basin 中的格子。
+    清除这些格子后与新开放的格子一起从边界向外松弛。每步的工作量与受影响的局部区域成正比。
+    每次 update() 处理的格子数有上限，增量更新超出时改为整体重建；整体重建按开始时的通行性快照做 BFS，
+    分摊到之后各步的 update() 中，完成（ready）之前距离场不可用，期间登记的变化在完成时一并处理。
+    """
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        n = width * height
+        self.passable = bytearray(n)
+        self.dist = [INF] * n
+        self.owner = [-1] * n
+        self.basins = {}
+        self.sources = set()
+        self._raised = []
+        self._removed = []
+        self._lowered = []
+        # 进行中的整体重建：BFS 队列与开始时的通行性快照
+        self._pending = None
+        self._snapshot = None
+        # 本次 update() 已处理的格子数与上限
+        self.work = 0
+        self.limit = INF
+        self.rebuilds = 0
+
+    @property
+    def ready(self):
+        return self._pending is None
+
+    def block(self, idx):
+        self.passable[idx] = 0
+        self._raised.append(idx)
+
+    def free(self, idx):
+        self.passable[idx] = 1
+        self._lowered.append(idx)
+
+    def add_source(self, idx):
+        self.sources.add(idx)
+        self._lowered.append(idx)
+
+    def remove_source(self, idx):
+        self.sources.discard(idx)
+        self._removed.append(idx)
+
+    def rebuild(self, limit=INF):
+        """按当前的通行性与源点重新开始整体 BFS，这次最多处理 limit 格，余下的留给之后的 update()；返回处理的格子数。"""
+        self.work = 0
+        self.limit = limit
+        self._start_rebuild()
+        self._resume()
+        return self.work
+
+    def update(self, limit=INF):
+        """处理登记的变化（或继续进行中的整体重建），最多处理约 limit 格；返回处理的格子数。"""
+        self.work = 0
+        if self._pending is not None:
+            self.limit = limit
+            if not self._resume():
+                return self.work
+            # 重建期间登记的变化：这次不设上限（只计数），否则变化不断时重建可能永远完成不了
+            self.limit = INF
+        else:
+            self.limit = min(limit, self.width * self.height // REBUILD_FRACTION)
+        raised, removed, lowered = self._raised, self._removed, self._lowered
+        if ((raised and not self._raise(raised)) or (removed and not self._drop_sources(removed))
+                or (lowered and not self._reseed(lowered))):
+            self.limit = limit
+            self._start_rebuild()
+            self._resume()
+            return self.work
+        raised.clear()
+        removed.clear()
+        lowered.clear()
+        return self.work
+
+    def _start_rebuild(self):
+        n = self.width * self.height
+        self.dist = dist = [INF] * n
+        self.owner = owner = [-1] * n
+        self.basins = basins = {}
+        self._raised.clear()
+        self._removed.clear()
+        self._lowered.clear()
+        # 快照之后的变化照常登记，重建完成时再处理
+        self._snapshot = snapshot = bytes(self.passable)
+        queue = deque()
+        for idx in self.sources:
+            if snapshot[idx]:
+                dist[idx] = 0
+                owner[idx] = idx
+                basins[idx] = {idx}
+                queue.append(idx)
+        self._pending = queue
+        self.rebuilds += 1
+
+    def _resume(self):
+        """继续整体重建直到完成（返回 True）或达到本次的上限（返回 False）。"""
+        if not self._relax(self._pending, self._snapshot):
+            return False
+        self._pending = self._snapshot = None
+        return True
+
+    def _set_owner(self, idx, o):
+        old = self.owner[idx]
+        if old != o:
+            if old >= 0:
+                self.basins[old].discard(idx)
+            if o >= 0:
+                self.basins[o].add(idx)
+            self.owner[idx] = o
+
+    def _relax(self, queue, passable=None):
+        """从队列中的格子向外松弛；处理的格子数达到上限时停下（队列中保留余下的格子）并返回 False。"""
+        dist, owner, basins = self.dist, self.owner, self.basins
+        if passable is None:
+            passable = self.passable
+        width, n = self.width, self.width * self.height
+        budget = self.limit - self.work
+        done = 0
+        while queue:
+            if done >= budget:
+                self.work += done
+                return False
+            idx = queue.popleft()
+            done += 1
+            d = dist[idx] + 1
+            o = owner[idx]
+            basin = basins[o]
+            x = idx % width
+            for nb in (idx - 1 if x > 0 else -1, idx + 1 if x < width - 1 else -1,
+                       idx - width, idx + width if idx < n - width else -1):
+                if nb >= 0 and passable[nb] and dist[nb] > d:
+                    dist[nb] = d
+                    old = owner[nb]
+                    if old != o:
+                        if old >= 0:
+                            basins[old].discard(nb)
+                        basin.add(nb)
+                        owner[nb] = o
+                    queue.append(nb)
+        self.work += done
+        return True
+
+    def _reseed(self, cells):
+        """按邻格重新计算 cells 的距离，从距离有限的格子开始向外松弛；超出上限时返回 False。"""
+        dist, owner, passable, sources = self.dist, self.owner, self.passable, self.sources
+        width, n = self.width, self.width * self.height
+        self.work += len(cells)
+        if self.work > self.limit:
+            return False
+        seeds = []
+        for idx in cells:
+            if not passable[idx]:
+                continue
+            if idx in sources:
+                dist[idx] = 0
+                self.basins.setdefault(idx, set())
+                self._set_owner(idx, idx)
+            else:
+                for nb in neighbors(idx, width, n):
+                    if passable[nb] and dist[nb] + 1 < dist[idx]:
+                        dist[idx] = dist[nb] + 1
+                        self._set_owner(idx, owner[nb])
+            if dist[idx] < INF:
+                seeds.append(idx)
+        seeds.sort(key=dist.__getitem__)
+        return self._relax(deque(seeds))
+
+    def _drop_sources(self, removed):
+        """
+        源点消失时只有以它为最近源点的格子（它的 basin）需要重算：其他格子到各自源点的最短路上，
+        不会经过离消失的源点更近的格子（否则它们的最近源点就是后者）。超出上限时返回 False。
+        """
+        dist, owner = self.dist, self.owner
+        basin = set()
+        for src in removed:
+            basin |= self.basins.pop(src, ())
+        self.work += len(basin)
+        if self.work > self.limit:
+            return False
+        for idx in basin:
+            dist[idx] = INF
+            owner[idx] = -1
+        return self._reseed(basin)
+
+    def _raise(self, cells):
+        """
+        清除失去支撑的区域：按原距离从小到大处理，某格若没有其他未受影响、可通行且距离恰好小 1 的邻格，
+        它的最短路必经受影响的格子，也要清除。超出上限时返回 False。
+        """
+        dist, passable, sources = self.dist, self.passable, self.sources
+        width, n = self.width, self.width * self.height
+        heap = [(dist[idx], idx) for idx in set(cells) if dist[idx] < INF]
+        heapq.heapify(heap)
+        affected = {idx for _, idx in heap}
+        while heap:
+            d, idx = heapq.heappop(heap)
+            self.work += 1
+            for nb in neighbors(idx, width, n):
+                if nb in affected or dist[nb] != d + 1 or (nb in sources and passable[nb]):
+                    continue
+                for m in neighbors(nb, width, n):
+                    if dist[m] == d and passable[m] and m not in affected:
+                        break
+                else:
+                    affected.add(nb)
+                    heapq.heappush(heap, (d + 1, nb))
+            if self.work > self.limit:
+                return False
+        for idx in affected:
+            dist[idx] = INF
+            self._set_owner(idx, -1)
+        return self._reseed(affected)
+
+
+class Autopilot:
+    """
+    每步调用一次（在 engine.step 之前），返回方向或 None。
+    优先沿距离场走向能在过期前吃到的最近果实，前提是走这一步后可活动空间不少于蛇长；
+    否则在安全的方向中优先能回到蛇尾的、其次可活动空间最大的。
+    分块的大棋盘不建全盘距离场，改按曼哈顿距离选果实，其余规则相同；距离场整体重建尚未完成时也是如此。
+    """
+
+    def __init__(self, eng, budget=DECISION_BUDGET_NODES):
+        self.engine = eng
+        self.budget = budget
+        self.left = budget
+        self.field = None if eng.chunked else DistanceField(eng.grid_w, eng.grid_h)
+        self.body = deque()
+        # 来不及在过期前吃到的果实：格子下标 → 过期时刻，不作为距离场的源点；
+        # 该格的果实被吃掉或过期（过期时刻对不上）后移除
+        self.ignored = {}
+        self.tick = None
+        self.seed = None
+        # 统计：决策次数、用完预算的次数、走了后备规则的次数、每次决策耗时（纳秒）与处理的格子数
+        self.decisions = 0
+        self.overruns = 0
+        self.fallbacks = 0
+        self.last_ns = 0
+        self.last_work = 0
+
+    def __call__(self):
+        start = time.perf_counter_ns()
+        eng = self.engine
+        if eng.death is not None:
+            return None
+        self.left = self.budget
+        self.prune_ignored()
+        if self.field is not None:
+            self.sync()
+        action = self.decide()
+        self.last_ns = time.perf_counter_ns() - start
+        self.last_work = self.budget - self.left
+        self.decisions += 1
+        if self.left <= 0:
+            self.overruns += 1
+        return action
+
+    def prune_ignored(self):
+        """移除已被吃掉或已过期的忽略果实（该格现在没有果实，或是另一个过期时刻不同的新果实）。"""
+        ignored = self.ignored
+        if ignored:
+            expires_at = self.engine.fruits.expires_at
+            for idx in [idx for idx, expiry in ignored.items() if expires_at(idx) != expiry]:
+                del ignored[idx]
+
+    def sync(self):
+        """
+        把上一步以来蛇身与果实的变化登记到距离场；不是紧接着的下一步（重开、读档、跳转）时整体重建。
+        距离场的处理量从本步预算中扣除，最多用掉 1/FIELD_SHARE。
+        """
+        eng = self.engine
+        if eng.seed == self.seed and eng.move_count == self.tick:
+            return
+        field = self.field
+        limit = self.budget // FIELD_SHARE
+        if eng.seed != self.seed or eng.move_count != self.tick + 1:
+            self.seed = eng.seed
+            self.tick = eng.move_count
+            field.passable[:] = bytes(eng.grid.cells).translate(PASSABLE)
+            field.sources = set(eng.fruits.cells())
+            self.ignored.clear()
+            self.body = deque(eng.snake_body.cells())
+            self.left -= field.rebuild(limit)
+            return
+        self.tick = eng.move_count
+        body = self.body
+        snake = eng.snake_body
+        cells = eng.grid.cells
+        head = snake.head()
+        if head != body[0]:
+            body.appendleft(head)
+            field.block(head)
+        while len(body) > len(snake):
+            tail = body.pop()
+            if PASSABLE[cells[tail]]:
+                field.free(tail)
+        fruits = set(eng.fruits.cells())
+        for idx in fruits - field.sources - self.ignored.keys():
+            field.add_source(idx)
+        for idx in field.sources - fruits:
+            field.remove_source(idx)
+        self.left -= field.update(limit)
+
+    def candidates(self):
+        """不会立即撞死的方向：[(方向, 格子下标)]。蛇尾这一步会让出（无待生长）时可以走进去。"""
+        eng = self.engine
+        grid = eng.grid
+        cells = grid.cells
+        snake = eng.snake_body
+        tail = snake.tail() if eng.pending_growth == 0 else -1
+        gx, gy = eng.snake_position[0] // engine.CELL, eng.snake_position[1] // engine.CELL
+        result = []
+        for d in engine.DIRECTIONS:
+            if d == engine.OPPOSITE[eng.direction]:
+                continue
+            dx, dy = engine.STEP[d]
+            nx, ny = gx + dx // engine.CELL, gy + dy // engine.CELL
+            if not grid.in_bounds(nx, ny):
+                continue
+            idx = ny * grid.width + nx
+            tag = cells[idx]
+            if tag == OBSTACLE or (tag == BODY and idx != tail):
+                continue
+            result.append((d, idx))
+        return result
+
+    def flood(self, start, cap):
+        """
+        从 start 出发可到达的格子数（最多数到 cap）以及是否能碰到蛇尾；蛇身与障碍物不可通行。
+        每展开一格消耗一点预算，用完时提前返回已数到的结果。
+        """
+        eng = self.engine
+        grid = eng.grid
+        cells = grid.cells
+        width = grid.width
+        n = width * grid.height
+        tail = eng.snake_body.tail()
+        seen = {start}
+        queue = deque((start,))
+        reaches_tail = False
+        count = 0
+        left = self.left
+        while queue and count < cap and left > 0:
+            idx = queue.popleft()
+            count += 1
+            left -= 1
+            x = idx % width
+            for nb in (idx - 1 if x > 0 else -1, idx + 1 if x < width - 1 else -1,
+                       idx - width, idx + width if idx < n - width else -1):
+                if nb < 0 or nb in seen:
+                    continue
+                if nb == tail:
+                    reaches_tail = True
+                    continue
+                if PASSABLE[cells[nb]]:
+                    seen.add(nb)
+                    queue.append(nb)
+        self.left = left
+        return count, reaches_tail
+
+    def target(self, moves):
+        """
+        走向最近的、到达时尚未过期的果实的方向；没有时返回 None。
+        按曼哈顿距离选果实时每个方向都要比较全部果实，按比较次数扣除预算；预算用完时不再重选。
+        """
+        eng = self.engine
+        fruits = eng.fruits
+        tick_ms = 1000.0 / eng.snake_speed
+        field = self.field
+        while True:
+            if field is not None and field.ready:
+                scored = [(field.dist[idx], field.owner[idx], d, idx) for d, idx in moves if field.dist[idx] < INF]
+            else:
+                width = eng.grid.width
+                targets = [f for f in fruits.cells() if f not in self.ignored]
+                self.left -= len(targets) * len(moves)
+                scored = []
+                for d, idx in moves if targets else ():
+                    x, y = idx % width, idx // width
+                    dist, fruit = min((abs(x - f % width) + abs(y - f // width), f) for f in targets)
+                    scored.append((dist, fruit, d, idx))
+            if not scored:
+                return None
+            dist, fruit, d, idx = min(scored)
+            expiry = fruits.expires_at(fruit)
+            # 这一步进入 idx，之后再走 dist 步到达果实；到达那一步开始时果实不能已过期
+            if expiry is None or expiry > (eng.move_count + dist) * tick_ms:
+                return d, idx
+            self.ignored[fruit] = expiry
+            if field is not None:
+                field.remove_source(fruit)
+            if self.left <= 0:
+                # 登记的变化留给下一步的 sync 处理
+                return None
+            if field is not None and field.ready:
+                self.left -= field.update(self.left)
+
+    def decide(self):
+        moves = self.candidates()
+        if not moves:
+            return None
+        need = len(self.engine.snake_body) + 1
+        choice = self.target(moves)
+        if choice is not None:
+            area, reaches_tail = self.flood(choice[1], need)
+            if area >= need or reaches_tail or self.left <= 0:
+                return choice[0]
+        # 后备：优先能回到蛇尾的方向（追尾总能活下去），其次可活动空间最大的
+        self.fallbacks += 1
+        best, best_key = moves[0][0], None
+        for d, idx in moves:
+            if self.left <= 0:
+                break
+            area, reaches_tail = self.flood(idx, 4 * need)
+            key = (reaches_tail, area)
+            if best_key is None or key > best_key:
+                best, best_key = d, key
+        return best
+
+
+_pilots = weakref.WeakKeyDictionary()
+
+
+def policy(eng):
+    """sweep.py 的策略接口（--policy autopilot:policy）：每个引擎各用一个 Autopilot。"""
+    pilot = _pilots.get(eng)
+    if pilot is None:
+        pilot = _pilots[eng] = Autopilot(eng)
+    return pilot()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='自动驾驶对局统计')
+    parser.add_argument('--games', type=int, default=20)
+    parser.add_argument('--difficulty', choices=sorted(engine.DIFFICULTIES), default='hard')
+    parser.add_argument('--max-ticks', type=int, default=20000)
+    parser.add_argument('--budget-nodes', type=int, default=DECISION_BUDGET_NODES)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    speed, red_probability = engine.DIFFICULTIES[args.difficulty]
+    eng = engine.SnakeEngine(difficulty=args.difficulty, snake_speed=speed, red_probability=red_probability)
+    pilot = Autopilot(eng, args.budget_nodes)
+    scores = []
+    times = []
+    for game in range(args.games):
+        eng.reset(args.seed + game)
+        while eng.death is None and eng.move_count < args.max_ticks:
+            eng.step(pilot())
+            times.append(pilot.last_ns)
+        scores.append(eng.score)
+    times.sort()
+    print(f'{args.games} 局：平均分 {sum(scores) / len(scores):.1f}，最高 {max(scores)}，'
+          f'决策耗时 p50 {times[len(times) // 2] / 1000:.0f} us / p99 {times[len(times) * 99 // 100] / 1000:.0f} us / '
+          f'最大 {times[-1] / 1000:.0f} us，超出预算 {pilot.overruns} 次，后备规则 {pilot.fallbacks} 次，'
+          f'距离场重建 {pilot.field.rebuilds if pilot.field else 0} 次')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
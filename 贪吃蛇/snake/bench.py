@@ -0,0 +1,467 @@
+# -*- coding: utf-8 -*-
+# 性能基准：碰撞判定、单步推进、果实 / 障碍物生成、果实过期、排行榜写入与整帧渲染等热点路径，
+# 按蛇长、障碍物数、果实数、棋盘填充率、排行榜历史条数取若干规模，得到耗时随规模变化的曲线。
+# 无界面运行（SDL_VIDEODRIVER=dummy），棋盘布局与对局都使用固定种子，结果保存为 JSON 基线供之后比较。
+#
+# 用法示例：
+#   python bench.py --out baseline.json                       运行全部用例并保存为基线
+#   python bench.py --compare baseline.json --threshold 0.2   与基线比较，任一用例慢 20% 以上时退出码为 1
+#   python bench.py --filter render spawn --repeat 5           只运行名字含 render 或 spawn 的用例
+#   python bench.py --list                                     列出全部用例
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+from functools import partial
+
+# 必须在导入 pygame 之前设置
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+import collision
+import engine
+import leaderboard
+from engine import CELL
+from occupancy import EMPTY, BODY, OBSTACLE, FRUIT_WHITE, FRUIT_RED
+from renderer import make_renderer
+
+BENCH_VERSION = 1
+SEED = 12345
+# 每个用例的计时批数；结果取各批单次耗时的最小值（受系统调度干扰最小），同时记录中位数
+REPEAT = 15
+# 每批的目标时长（纳秒）：批次较短时更容易整批避开调度停顿
+BATCH_NS = 2_000_000
+# 需要逐次复原状态的用例（生成类、排行榜写入）逐次计时：最多 REPEAT * UNDO_SAMPLES 次，总计时超过 UNDO_BUDGET_NS 后提前结束
+UNDO_SAMPLES = 20
+UNDO_BUDGET_NS = 500_000_000
+# 默认的退步阈值：比基线慢 20% 以上视为退步
+THRESHOLD = 0.2
+
+SNAKE_LENGTHS = (4, 100, 1000, 10000)
+FILL_RATIOS = (0.0, 0.5, 0.9, 0.99)
+OBSTACLE_COUNTS = (10, 100, 1000)
+LARGE_OBSTACLE_COUNTS = (6, 24, 96)
+FRUIT_COUNTS = (20, 200, 2000)
+HISTORY_SIZES = (100, 1000, 10000)
+LEADERBOARD_BACKENDS = (('log', '.jsonl'), ('sqlite', '.db'))
+# 长蛇用例的棋盘（格）：绕整个棋盘的环路须长于最长的蛇，行数为偶数
+CYCLE_BOARD = (160, 128)
+# 分块存储的大棋盘
+HUGE_BOARD = (4096, 4096)
+HUGE_OBSTACLES = 200
+# 大棋盘上蛇绕正方形兜圈的边长（步）
+SQUARE_SIDE = 16
+# 每步推进的毫秒数（默认蛇速）
+TICK_MS = 1000 // engine.SNAKE_SPEED
+FRUIT_LIFETIME_MS = 1000
+
+PALETTE = {
+    EMPTY: pygame.Color(0, 0, 0),
+    BODY: pygame.Color(0, 255, 0),
+    OBSTACLE: pygame.Color(255, 255, 0),
+    FRUIT_WHITE: pygame.Color(255, 255, 255),
+    FRUIT_RED: pygame.Color(255, 0, 0),
+}
+
+now_ns = time.perf_counter_ns
+
+
+def make_engine(board=None, **kwargs):
+    """board 为 (宽, 高) 格数；省略时为默认窗口大小。引擎以固定种子开局。"""
+    if board is not None:
+        kwargs['window_x'], kwargs['window_y'] = board[0] * CELL, board[1] * CELL
+    eng = engine.SnakeEngine(**kwargs)
+    eng.reset(SEED)
+    return eng
+
+
+def clear_fruits(eng):
+    for idx in eng.fruits.cells():
+        eng.fruits.take(idx)
+        eng.grid.set(idx, EMPTY)
+
+
+def clear_obstacles(eng):
+    for px, py in eng.obstacles:
+        eng.grid.set(eng.cell_of(px, py), EMPTY)
+    eng.obstacles.clear()
+
+
+def cycle_cells(grid_w, grid_h):
+    """覆盖整个棋盘的环路（grid_h 为偶数）：第 0 行向右，其余各行在第 1 列起往返，最后沿第 0 列回到起点。"""
+    path = list(range(grid_w))
+    for gy in range(1, grid_h):
+        xs = range(grid_w - 1, 0, -1) if gy % 2 else range(1, grid_w)
+        path.extend(gy * grid_w + gx for gx in xs)
+    path.extend(gy * grid_w for gy in range(grid_h - 1, 0, -1))
+    return path
+
+
+def lay_snake(eng, length):
+    """
+    把蛇沿环路摆成 length 节（蛇尾在环路起点），返回 格子 → 下一步方向 的表；
+    照表走蛇头永远进入环路上的空格，不会死亡，每步的耗时只随蛇长变化。
+    """
+    grid = eng.grid
+    grid_w = eng.grid_w
+    path = cycle_cells(grid_w, eng.grid_h)
+    if length >= len(path):
+        raise ValueError(f'棋盘放不下长度为 {length} 的蛇')
+    body = eng.snake_body
+    for idx in body.cells():
+        grid.set(idx, EMPTY)
+    body.clear()
+    for idx in path[:length]:
+        body.push_head(idx)
+        grid.set(idx, BODY)
+    head = path[length - 1]
+    eng.snake_position = [head % grid_w * CELL, head // grid_w * CELL]
+    steps = {1: 'RIGHT', -1: 'LEFT', grid_w: 'DOWN', -grid_w: 'UP'}
+    turns = {a: steps[b - a] for a, b in zip(path, path[1:] + path[:1])}
+    eng.direction = turns[path[length - 2]]
+    return turns
+
+
+def cycle_engine(length):
+    # 不生成果实：蛇长保持不变
+    eng = make_engine(CYCLE_BOARD, max_fruits=0)
+    return eng, lay_snake(eng, length)
+
+
+def step_cycle(eng, turns):
+    pos = eng.snake_position
+    eng.step(turns[eng.cell_of(pos[0], pos[1])])
+
+
+def step_square(eng):
+    """绕边长 SQUARE_SIDE 的正方形兜圈；意外死亡（吃果实长得过长）时以同一种子重开。"""
+    if eng.step(engine.DIRECTIONS[(3, 1, 2, 0)[eng.move_count // SQUARE_SIDE % 4]]) is not None:
+        eng.reset(SEED)
+
+
+def fill_board(eng, ratio):
+    """随机取当前空闲格中 ratio 比例的格子放上障碍物（固定种子）。"""
+    free = list(eng.grid.free.items)
+    for idx in random.Random(SEED).sample(free, int(len(free) * ratio)):
+        eng.grid.set(idx, OBSTACLE)
+
+
+# ---------------------------------------------------------------------------
+# 用例：每个构造函数返回 (op, undo, close)。op 为被计时的调用；
+# undo 不为 None 时每次调用后执行以复原状态（不计时）；close 在用例结束后释放资源。
+
+def case_hit_self(length):
+    # 旧的列表扫描：蛇头不在蛇身上，每次都扫完整条蛇
+    body = [[i % 512 * CELL, i // 512 * CELL] for i in range(length)]
+    return partial(collision.hit_self, [-CELL, -CELL], body), None, None
+
+
+def case_hit_self_grid(length):
+    eng, turns = cycle_engine(length)
+    pos = eng.snake_position
+    return partial(collision.hit_self_grid, eng.grid, eng.cell_of(pos[0], pos[1]) + 1), None, None
+
+
+def case_hit_obstacle(count):
+    obstacles = [[i % 512 * CELL, i // 512 * CELL] for i in range(count)]
+    return partial(collision.hit_obstacle, [-CELL, -CELL], obstacles), None, None
+
+
+def case_step(length):
+    eng, turns = cycle_engine(length)
+    return partial(step_cycle, eng, turns), None, None
+
+
+def case_spawn_fruit(ratio):
+    eng = make_engine(max_fruits=1 << 30)
+    clear_fruits(eng)
+    fill_board(eng, ratio)
+    return eng.spawn_fruit, partial(clear_fruits, eng), None
+
+
+def case_spawn_fruit_huge():
+    eng = make_engine(HUGE_BOARD, max_fruits=1 << 30)
+    clear_fruits(eng)
+    return eng.spawn_fruit, partial(clear_fruits, eng), None
+
+
+def case_spawn_obstacles(count):
+    eng = make_engine()
+    clear_fruits(eng)
+    return partial(eng.spawn_obstacles, count), partial(clear_obstacles, eng), None
+
+
+def case_spawn_large_obstacles(count):
+    eng = make_engine()
+    clear_fruits(eng)
+    op = partial(eng.spawn_large_obstacles, count, engine.OBSTACLE_W, engine.OBSTACLE_H)
+    return op, partial(clear_obstacles, eng), None
+
+
+def case_expire(count):
+    """count 个果实的生成时刻在一个寿命内均匀错开，每步约有 count * TICK_MS / FRUIT_LIFETIME_MS 个过期并补充。"""
+    eng = make_engine(max_fruits=count, fruit_lifetime_ms=FRUIT_LIFETIME_MS)
+    clear_fruits(eng)
+    for i in range(count):
+        eng.now_ms = i * FRUIT_LIFETIME_MS // count
+        eng.spawn_fruit()
+
+    def op():
+        eng.now_ms += TICK_MS
+        eng.fruits.expire(eng.now_ms)
+    return op, None, None
+
+
+def _leaderboard(backend, ext, history):
+    """
+    在临时目录里写入固定种子的 history 条历史作为模板，再复制一份工作副本接到排行榜上。
+    返回 (reset, close)：reset 丢弃工作副本并从模板重新复制（每次写入都从同一份历史开始），close 删除全部临时文件。
+    """
+    template = tempfile.mkdtemp(prefix='snake-bench-')
+    name = 'leaderboard' + ext
+    leaderboard.configure(os.path.join(template, name), backend=backend)
+    rng = random.Random(SEED)
+    for _ in range(history):
+        leaderboard.add_score(rng.randrange(0, 5000, 10), rng.choice(list(engine.DIFFICULTIES)))
+    leaderboard.configure(None)
+    work = [None]
+
+    def reset():
+        leaderboard.configure(None)
+        if work[0] is not None:
+            shutil.rmtree(work[0], ignore_errors=True)
+        work[0] = tempfile.mkdtemp(prefix='snake-bench-')
+        for entry in os.listdir(template):
+            shutil.copy2(os.path.join(template, entry), work[0])
+        leaderboard.configure(os.path.join(work[0], name), backend=backend)
+
+    def close():
+        leaderboard.configure(None)
+        for directory in (template, work[0]):
+            if directory is not None:
+                shutil.rmtree(directory, ignore_errors=True)
+    reset()
+    return reset, close
+
+
+def case_add_score(backend, ext, history):
+    # 每次写入后复原为同一份历史：否则排行榜随迭代次数增长，各规模的结果与基线都不可比
+    reset, close = _leaderboard(backend, ext, history)
+    return partial(leaderboard.add_score_to_leaderboard, 1230, 'normal'), reset, close
+
+
+def case_percentile(backend, ext, history):
+    _, close = _leaderboard(backend, ext, history)
+    return partial(leaderboard.percentile, 1230, 'normal'), None, close
+
+
+def _frame(renderer, eng, step):
+    if step is not None:
+        step()
+    rects = renderer.draw(None)
+    if rects is None:
+        pygame.display.update()
+    elif rects:
+        pygame.display.update(rects)
+
+
+def case_render_full(length):
+    """整屏重画一帧（开局、读档或从菜单返回时的代价）。"""
+    eng, turns = cycle_engine(length)
+    renderer = make_renderer(pygame.display.set_mode((eng.window_x, eng.window_y)), eng, PALETTE)
+
+    def op():
+        renderer.invalidate()
+        _frame(renderer, eng, None)
+    return op, None, None
+
+
+def case_render_frame(length):
+    """局中的一帧：推进一步后增量重画。"""
+    eng, turns = cycle_engine(length)
+    renderer = make_renderer(pygame.display.set_mode((eng.window_x, eng.window_y)), eng, PALETTE)
+    return partial(_frame, renderer, eng, partial(step_cycle, eng, turns)), None, None
+
+
+def case_render_viewport():
+    """分块大棋盘：推进一步后按跟随蛇头的视口重画。"""
+    eng = make_engine(HUGE_BOARD, difficulty='hard', obstacle_count=HUGE_OBSTACLES)
+    renderer = make_renderer(pygame.display.set_mode((engine.WINDOW_X, engine.WINDOW_Y)), eng, PALETTE)
+    return partial(_frame, renderer, eng, partial(step_square, eng)), None, None
+
+
+def build_cases():
+    """[(用例名, 构造函数)]；构造在运行到该用例时才执行，--filter 跳过的用例不做准备工作。"""
+    cases = []
+    for n in SNAKE_LENGTHS:
+        cases.append((f'collision.hit_self/length={n}', partial(case_hit_self, n)))
+        cases.append((f'collision.hit_self_grid/length={n}', partial(case_hit_self_grid, n)))
+    for n in OBSTACLE_COUNTS:
+        cases.append((f'collision.hit_obstacle/obstacles={n}', partial(case_hit_obstacle, n)))
+    for n in SNAKE_LENGTHS:
+        cases.append((f'engine.step/length={n}', partial(case_step, n)))
+    for r in FILL_RATIOS:
+        cases.append((f'spawn_fruit/fill={r:g}', partial(case_spawn_fruit, r)))
+    cases.append((f'spawn_fruit/board={HUGE_BOARD[0]}x{HUGE_BOARD[1]}', case_spawn_fruit_huge))
+    for n in OBSTACLE_COUNTS:
+        cases.append((f'spawn_obstacles/obstacles={n}', partial(case_spawn_obstacles, n)))
+    for n in LARGE_OBSTACLE_COUNTS:
+        cases.append((f'spawn_large_obstacles/obstacles={n}', partial(case_spawn_large_obstacles, n)))
+    for n in FRUIT_COUNTS:
+        cases.append((f'fruits.expire/fruits={n}', partial(case_expire, n)))
+    for backend, ext in LEADERBOARD_BACKENDS:
+        for n in HISTORY_SIZES:
+            cases.append((f'leaderboard.add_score_to_leaderboard/{backend},history={n}',
+                          partial(case_add_score, backend, ext, n)))
+            cases.append((f'leaderboard.percentile/{backend},history={n}', partial(case_percentile, backend, ext, n)))
+    for n in SNAKE_LENGTHS:
+        cases.append((f'render.full/length={n}', partial(case_render_full, n)))
+        cases.append((f'render.frame/length={n}', partial(case_render_frame, n)))
+    cases.append((f'render.viewport/board={HUGE_BOARD[0]}x{HUGE_BOARD[1]}', case_render_viewport))
+    return cases
+
+
+# ---------------------------------------------------------------------------
+
+def measure(op, undo=None, repeat=REPEAT):
+    """
+    返回 (单次耗时最小值, 中位数, 样本数, 每批调用次数)，单位纳秒。
+    无 undo 时先把每批的调用次数校准到约 BATCH_NS，再计时 repeat 批；有 undo 时逐次计时，undo 不计入。
+    """
+    op()
+    if undo is not None:
+        undo()
+        samples = []
+        spent = 0
+        while len(samples) < repeat * UNDO_SAMPLES and (len(samples) < repeat or spent < UNDO_BUDGET_NS):
+            start = now_ns()
+            op()
+            elapsed = now_ns() - start
+            undo()
+            samples.append(elapsed)
+            spent += elapsed
+        return min(samples), statistics.median(samples), len(samples), 1
+    number = 1
+    while True:
+        start = now_ns()
+        for _ in range(number):
+            op()
+        elapsed = now_ns() - start
+        if elapsed >= BATCH_NS // 4:
+            break
+        number *= 2
+    number = max(1, number * BATCH_NS // max(elapsed, 1))
+    samples = []
+    for _ in range(repeat):
+        start = now_ns()
+        for _ in range(number):
+            op()
+        samples.append((now_ns() - start) / number)
+    return min(samples), statistics.median(samples), repeat, number
+
+
+def run(cases, repeat=REPEAT, log=sys.stderr):
+    pygame.display.init()
+    results = {}
+    try:
+        for name, make in cases:
+            op, undo, close = make()
+            try:
+                best, median, runs, number = measure(op, undo, repeat)
+            finally:
+                if close is not None:
+                    close()
+            results[name] = {'best_ns': round(best, 1), 'median_ns': round(median, 1), 'runs': runs, 'number': number}
+            print(f'{name:<58} {format_ns(best):>10}  (中位数 {format_ns(median)})', file=log)
+    finally:
+        pygame.display.quit()
+    return results
+
+
+def format_ns(ns):
+    if ns >= 1e6:
+        return f'{ns / 1e6:.2f} ms'
+    if ns >= 1e3:
+        return f'{ns / 1e3:.2f} us'
+    return f'{ns:.0f} ns'
+
+
+def environment():
+    return {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'video_driver': os.environ.get('SDL_VIDEODRIVER'),
+    }
+
+
+def compare(baseline, results, threshold, metric='best_ns'):
+    """逐个用例与基线比较，打印变化并返回退步（慢于基线 threshold 以上）的用例名列表。"""
+    base_cases = baseline.get('cases', {})
+    regressions = []
+    for name, res in results.items():
+        base = base_cases.get(name)
+        if base is None:
+            print(f'{name:<58} {format_ns(res[metric]):>10}  （基线中没有）')
+            continue
+        change = res[metric] / base[metric] - 1 if base[metric] else 0.0
+        flag = ''
+        if change > threshold:
+            regressions.append(name)
+            flag = '  << 退步'
+        print(f'{name:<58} {format_ns(base[metric]):>10} -> {format_ns(res[metric]):>10}  {change:+7.1%}{flag}')
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='热点路径性能基准（无界面、固定种子）')
+    parser.add_argument('--out', help='把本次结果保存为 JSON 基线')
+    parser.add_argument('--compare', metavar='BASELINE', help='与 JSON 基线比较，有退步时退出码为 1')
+    parser.add_argument('--threshold', type=float, default=THRESHOLD, help='退步阈值（相对基线的比例，默认 0.2）')
+    parser.add_argument('--metric', choices=('best_ns', 'median_ns'), default='best_ns', help='比较所用的统计量')
+    parser.add_argument('--filter', nargs='+', help='只运行名字包含任一子串的用例')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='每个用例的计时批数')
+    parser.add_argument('--list', action='store_true', help='只列出用例名')
+    args = parser.parse_args(argv)
+
+    cases = build_cases()
+    if args.filter:
+        cases = [(name, make) for name, make in cases if any(s in name for s in args.filter)]
+    if args.list:
+        for name, _ in cases:
+            print(name)
+        return 0
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = run(cases, args.repeat)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'version': BENCH_VERSION, 'time': datetime.utcnow().isoformat() + 'Z', 'seed': SEED,
+                       'repeat': args.repeat, 'environment': environment(), 'cases': results}, f, indent=1)
+    if baseline is None:
+        return 0
+    if baseline.get('environment') != environment():
+        print('注意：基线的运行环境与本次不同，结果仅供参考', file=sys.stderr)
+    regressions = compare(baseline, results, args.threshold, args.metric)
+    if regressions:
+        print(f'{len(regressions)} 个用例慢于基线 {args.threshold:.0%} 以上', file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
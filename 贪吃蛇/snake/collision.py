@@ -1,4 +1,6 @@
 # 碰撞逻辑
+import occupancy
+
 def in_center_block(px: int, py: int, center_x: int, center_y: int, half: int) -> bool:
     return abs(px - center_x) < half and abs(py - center_y) < half
 
@@ -12,4 +14,11 @@ def hit_self(snake_position: list[int], snake_body: list[list[int]]) -> bool:
     return False
 
 def hit_obstacle(snake_position: list[int], obstacles: list[list[int]]) -> bool:
-    return any(snake_position[0] == o[0] and snake_position[1] == o[1] for o in obstacles)
\ No newline at end of file
+    return any(snake_position[0] == o[0] and snake_position[1] == o[1] for o in obstacles)
+
+# 基于占用网格的 O(1) 判定（idx 为格子下标，见 occupancy.OccupancyGrid）
+def hit_self_grid(grid, idx: int) -> bool:
+    return grid.cells[idx] == occupancy.BODY
+
+def hit_obstacle_grid(grid, idx: int) -> bool:
+    return grid.cells[idx] == occupancy.OBSTACLE
@@ -0,0 +1,318 @@
+# -*- coding: utf-8 -*-
+# 无界面模拟引擎：与 SnakeGame.py 主循环相同的规则，不依赖 pygame、窗口或帧率时钟
+import random
+import collision
+import occupancy
+import levelgen
+from occupancy import EMPTY, BODY, OBSTACLE, FRUIT_RED, OccupancyGrid
+from fruits import FruitManager
+from snakebody import SnakeBody
+from world import ChunkedGrid
+
+# 默认配置（与 SnakeGame.py 保持一致）
+WINDOW_X = 720
+WINDOW_Y = 480
+CELL = 10
+SNAKE_SPEED = 30
+RED_PROBABILITY = 0.2
+MAX_FRUITS = 20
+FRUIT_LIFETIME_MS = 30 * 1000
+CENTER_BLOCK_HALF = 100
+# 困难模式障碍物：数量与矩形尺寸（格）
+OBSTACLE_COUNT = 6
+OBSTACLE_W = 3
+OBSTACLE_H = 3
+# 格子数超过该值的棋盘默认使用分块存储（world.ChunkedGrid），不再按全盘分配网格与掩码
+CHUNKED_MIN_CELLS = 1 << 20
+# 棋盘边长上限（格）：录像头部以 16 位保存棋盘像素尺寸
+MAX_BOARD = 65535 // CELL
+
+# 难度预设：名称 -> (snake_speed, RED_PROBABILITY)，难度选择页面与批量调参共用
+DIFFICULTIES = {
+    'easy': (20, 0.3),
+    'normal': (30, 0.2),
+    'hard': (40, 0.2),
+}
+
+DIRECTIONS = ('UP', 'DOWN', 'LEFT', 'RIGHT')
+OPPOSITE = {'UP': 'DOWN', 'DOWN': 'UP', 'LEFT': 'RIGHT', 'RIGHT': 'LEFT'}
+STEP = {'UP': (0, -CELL), 'DOWN': (0, CELL), 'LEFT': (-CELL, 0), 'RIGHT': (CELL, 0)}
+
+# 死亡原因
+DEATH_WALL = 'wall'
+DEATH_OBSTACLE = 'obstacle'
+DEATH_SELF = 'self'
+
+
+def board_size(text):
+    """解析命令行的棋盘尺寸 '宽x高'（格），不小于默认窗口、不超过 MAX_BOARD。"""
+    w, h = (int(v) for v in text.lower().split('x'))
+    if not (WINDOW_X // CELL <= w <= MAX_BOARD and WINDOW_Y // CELL <= h <= MAX_BOARD):
+        raise ValueError(text)
+    return w, h
+
+
+class SnakeEngine:
+    """
+    单局贪吃蛇的纯逻辑状态机。
+    时间以步数推算（每步 1000 / snake_speed 毫秒），因此同一种子与同一输入序列总能复现同一局。
+    window_x / window_y 是棋盘的像素尺寸，可以大于实际窗口（由渲染器的视口跟随蛇头）。
+    chunked 为 None 时按棋盘格子数自动选择；分块棋盘上果实用拒绝采样生成，同一种子的结果与全盘网格不同。
+    """
+
+    def __init__(self, window_x=WINDOW_X, window_y=WINDOW_Y, difficulty=None, snake_speed=SNAKE_SPEED,
+                 red_probability=RED_PROBABILITY, max_fruits=MAX_FRUITS, fruit_lifetime_ms=FRUIT_LIFETIME_MS,
+                 center_block_half=CENTER_BLOCK_HALF, obstacle_count=OBSTACLE_COUNT, obstacle_w=OBSTACLE_W,
+                 obstacle_h=OBSTACLE_H, chunked=None):
+        self.window_x = window_x
+        self.window_y = window_y
+        self.difficulty = difficulty
+        self.snake_speed = snake_speed
+        self.red_probability = red_probability
+        self.max_fruits = max_fruits
+        self.fruit_lifetime_ms = fruit_lifetime_ms
+        self.center_block_half = center_block_half
+        self.obstacle_count = obstacle_count
+        self.obstacle_w = obstacle_w
+        self.obstacle_h = obstacle_h
+        self.center_x = window_x // 2
+        self.center_y = window_y // 2
+        self.grid_w = window_x // CELL
+        self.grid_h = window_y // CELL
+        self.chunked = self.grid_w * self.grid_h > CHUNKED_MIN_CELLS if chunked is None else chunked
+        if self.chunked:
+            # 大棋盘不构建全盘掩码：安全区与可生成格都按坐标计算
+            self.safe_zone = None
+            self.grid = ChunkedGrid(self.grid_w, self.grid_h, self.is_spawnable, self.count_spawnable())
+        else:
+            # 中心安全区掩码：1 表示该格在中心区域内，不能放果实或障碍物
+            self.safe_zone = bytes(1 if self.in_center_block(gx * CELL, gy * CELL) else 0
+                                   for gy in range(self.grid_h) for gx in range(self.grid_w))
+            # 果实可出现的格子：不在安全区，且不在第 0 行 / 第 0 列（与原 randrange(1, ...) 一致）
+            spawnable = bytearray(1 if gx >= 1 and gy >= 1 and not self.safe_zone[gy * self.grid_w + gx] else 0
+                                  for gy in range(self.grid_h) for gx in range(self.grid_w))
+            self.grid = OccupancyGrid(self.grid_w, self.grid_h, spawnable)
+        # 蛇身：环形缓冲中的格子下标，从蛇头到蛇尾
+        self.snake_body = SnakeBody()
+        # 果实表：过期最小堆 + 格子下标 → 果实的映射
+        self.fruits = FruitManager(self)
+        self.seed = None
+        self.rng = random.Random()
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is None:
+            seed = random.getrandbits(32)
+        self.seed = seed
+        self.rng.seed(seed)
+        cx = (self.window_x // 2 // CELL) * CELL
+        cy = (self.window_y // 2 // CELL) * CELL
+        self.snake_position = [cx, cy]
+        self.fruits.clear()
+        self.obstacles = []
+        self.move_count = 0
+        self.now_ms = 0
+        self.pending_growth = 0
+        self.direction = 'RIGHT'
+        self.score = 0
+        self.fruits_eaten = 0
+        self.death = None
+        # 生成失败次数：棋盘已满导致果实生成失败，或障碍物未能全部放下
+        self.spawn_failures = 0
+        grid = self.grid
+        grid.clear()
+        body = self.snake_body
+        body.clear()
+        for px in (cx - 30, cx - 20, cx - 10, cx):
+            idx = self.cell_of(px, cy)
+            body.push_head(idx)
+            grid.set(idx, BODY)
+        # 只在困难模式下生成障碍物；先放障碍物，布局只取决于种子与棋盘，不受果实位置影响
+        if self.difficulty == 'hard':
+            placed = self.spawn_large_obstacles(self.obstacle_count, w=self.obstacle_w, h=self.obstacle_h)
+            self.spawn_failures += self.obstacle_count - placed
+        self.spawn_fruit('white')
+
+    def in_center_block(self, px, py):
+        return collision.in_center_block(px, py, self.center_x, self.center_y, self.center_block_half)
+
+    def is_safe(self, idx):
+        return self.in_center_block(idx % self.grid_w * CELL, idx // self.grid_w * CELL)
+
+    def is_spawnable(self, idx):
+        return idx % self.grid_w >= 1 and idx >= self.grid_w and not self.is_safe(idx)
+
+    def count_spawnable(self):
+        """空盘时可生成果实的格子数：第 0 行 / 第 0 列之外的格子减去其中的安全区格子。"""
+        safe_x = sum(1 for gx in range(1, self.grid_w)
+                     if abs(gx * CELL - self.center_x) < self.center_block_half)
+        safe_y = sum(1 for gy in range(1, self.grid_h)
+                     if abs(gy * CELL - self.center_y) < self.center_block_half)
+        return (self.grid_w - 1) * (self.grid_h - 1) - safe_x * safe_y
+
+    def cell_of(self, px, py):
+        return (py // CELL) * self.grid_w + px // CELL
+
+    def spawn_fruit(self, fruit_type=None):
+        return self.fruits.spawn(fruit_type)
+
+    def spawn_obstacles(self, count):
+        rng = self.rng
+        grid_w = self.window_x // CELL
+        grid_h = self.window_y // CELL
+        attempts = 0
+        created = 0
+        cells = self.grid.cells
+        while created < count and attempts < count * 200:
+            attempts += 1
+            gx = rng.randrange(0, grid_w)
+            gy = rng.randrange(0, grid_h)
+            idx = gy * grid_w + gx
+            if cells[idx] != EMPTY or self.is_safe(idx):
+                continue
+            self.grid.set(idx, OBSTACLE)
+            self.obstacles.append([gx * CELL, gy * CELL])
+            created += 1
+        return created
+
+    def spawn_large_obstacles(self, num, w=3, h=3):
+        grid = self.grid
+        grid_w = self.grid_w
+        w = max(1, min(w, grid_w))
+        h = max(1, min(h, self.grid_h))
+        if self.chunked:
+            corners = self.scatter_corners(num, w, h)
+        else:
+            start = self.cell_of(self.snake_position[0], self.snake_position[1])
+            corners = levelgen.generate_layout(self.seed, grid_w, self.grid_h, num, w, h, self.safe_zone, start)
+        created = 0
+        for tl_x, tl_y in corners:
+            block = [gy * grid_w + gx for gx in range(tl_x, tl_x + w) for gy in range(tl_y, tl_y + h)]
+            # 局中调用时跳过与蛇身、果实或已有障碍物重叠的矩形
+            if any(grid.cells[idx] != EMPTY for idx in block):
+                continue
+            for idx in block:
+                grid.set(idx, OBSTACLE)
+                self.obstacles.append([idx % grid_w * CELL, idx // grid_w * CELL])
+            created += 1
+        return created
+
+    def scatter_corners(self, num, w, h):
+        """
+        大棋盘的障碍物布局：随机抽取左上角，跳过压到安全区或已占用格子的位置。
+        levelgen 的连通性检查需要遍历全盘，这里不做；空旷的大棋盘上少量矩形不会隔断蛇头所在区域。
+        """
+        rng = self.rng
+        grid_w = self.grid_w
+        cells = self.grid.cells
+        corners = []
+        taken = set()
+        for _ in range(num * 200):
+            if len(corners) >= num:
+                break
+            tl_x = rng.randrange(0, grid_w - w + 1)
+            tl_y = rng.randrange(0, self.grid_h - h + 1)
+            block = [gy * grid_w + gx for gx in range(tl_x, tl_x + w) for gy in range(tl_y, tl_y + h)]
+            if any(idx in taken or cells[idx] != EMPTY or self.is_safe(idx) for idx in block):
+                continue
+            taken.update(block)
+            corners.append((tl_x, tl_y))
+        return corners
+
+    # 局面中需要拷贝的标量字段（配置 + 逐步变化的状态）
+    STATE_FIELDS = ('difficulty', 'snake_speed', 'red_probability', 'seed', 'move_count', 'now_ms',
+                    'pending_growth', 'direction', 'score', 'fruits_eaten', 'death', 'spawn_failures')
+
+    def get_state(self):
+        """
+        当前局面的完整拷贝：标量、网格、蛇身、果实、障碍物，以及随机数状态与空闲格集合的顺序
+        （空闲格抽取依赖其顺序），set_state 恢复后继续推进与不中断时逐步一致。
+        """
+        state = {name: getattr(self, name) for name in self.STATE_FIELDS}
+        state['rng'] = self.rng.getstate()
+        state['snake_position'] = list(self.snake_position)
+        state['cells'] = self.grid.save_cells()
+        state['free'] = self.grid.free.copy()
+        state['body'] = self.snake_body.cells()
+        state['fruits'] = self.fruits.items()
+        state['obstacles'] = [list(o) for o in self.obstacles]
+        return state
+
+    def set_state(self, state):
+        """恢复 get_state 的结果；渲染器需要整屏重画。"""
+        for name in self.STATE_FIELDS:
+            setattr(self, name, state[name])
+        self.rng.setstate(state['rng'])
+        self.snake_position = list(state['snake_position'])
+        self.grid.restore_cells(state['cells'])
+        self.grid.free = state['free'].copy()
+        body = self.snake_body
+        body.clear()
+        for idx in reversed(state['body']):
+            body.push_head(idx)
+        self.fruits.restore(state['fruits'])
+        self.obstacles = [list(o) for o in state['obstacles']]
+
+    def step(self, action=None):
+        """
+        推进一步。action 为 'UP' / 'DOWN' / 'LEFT' / 'RIGHT' 或 None（保持当前方向）。
+        返回死亡原因（'wall' / 'obstacle' / 'self'），存活时返回 None。
+        """
+        if self.death is not None:
+            return self.death
+        self.now_ms = self.move_count * 1000 // self.snake_speed
+        now_ms = self.now_ms
+
+        # 移除过期果实并补充
+        fruits = self.fruits
+        grid = self.grid
+        cells = grid.cells
+        fruits.expire(now_ms)
+
+        # 防止反向
+        if action in STEP and action != OPPOSITE[self.direction]:
+            self.direction = action
+
+        # 移动蛇头
+        dx, dy = STEP[self.direction]
+        snake_position = self.snake_position
+        snake_position[0] += dx
+        snake_position[1] += dy
+
+        self.move_count += 1
+        fruits.periodic(self.move_count)
+
+        out_of_bounds = collision.hit_wall(snake_position, self.window_x, self.window_y)
+        idx = -1 if out_of_bounds else self.cell_of(snake_position[0], snake_position[1])
+        if not out_of_bounds and occupancy.is_fruit(cells[idx]):
+            tag = fruits.take(idx)
+            self.snake_body.push_head(idx)
+            grid.set(idx, BODY)
+            self.fruits_eaten += 1
+            if tag == FRUIT_RED:
+                self.score += 20
+                self.pending_growth += 2
+            else:
+                self.score += 10
+                self.pending_growth += 1
+            if len(fruits) == 0:
+                self.spawn_fruit()
+            # 果实格不可能是墙、障碍或蛇身，无需再做碰撞判定
+            return self.death
+        else:
+            if self.pending_growth > 0:
+                self.pending_growth -= 1
+            else:
+                grid.set(self.snake_body.pop_tail(), EMPTY)
+
+        # 撞墙 / 障碍 / 自身：蛇头尚未写入网格与蛇身，此时该格若为蛇身即撞到自己
+        if out_of_bounds:
+            self.death = DEATH_WALL
+        elif collision.hit_obstacle_grid(self.grid, idx):
+            self.death = DEATH_OBSTACLE
+        elif collision.hit_self_grid(self.grid, idx):
+            self.death = DEATH_SELF
+        else:
+            self.snake_body.push_head(idx)
+            grid.set(idx, BODY)
+        return self.death
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# 字体与文字缓存：字体对象按 (路径, 字号, 粗体) 只加载一次，渲染好的文字表面按 LRU 复用
+import json
+import os
+from collections import OrderedDict
+from functools import lru_cache
+import pygame
+
+# 文字表面缓存的最大条目数
+TEXT_CACHE_SIZE = 256
+# 字体查找结果的磁盘缓存（位于程序目录）；match_font 在 Linux 上要扫描 fontconfig，冷启动可能要数秒
+FONT_CACHE_FILE = '.font_cache.json'
+# 未找到字体时，用这些目录的修改时间判断是否新装了字体
+SYSTEM_FONT_DIRS = ('/usr/share/fonts', '/usr/local/share/fonts', os.path.expanduser('~/.fonts'),
+                    os.path.expanduser('~/.local/share/fonts'), '/Library/Fonts', '/System/Library/Fonts',
+                    os.path.join(os.environ.get('WINDIR', 'C:\\Windows'), 'Fonts'))
+
+
+def find_chinese_font(base_dir):
+    candidates = ['msyh', 'msyhui', 'simhei', 'simsun', 'noto', 'noto sans cjk', 'arialunicode', 'wqy-zenhei', 'wqy-microhei']
+    for name in candidates:
+        f = pygame.font.match_font(name)
+        if f:
+            return f
+    fonts_dir = os.path.join(base_dir, 'fonts')
+    if os.path.isdir(fonts_dir):
+        for fname in os.listdir(fonts_dir):
+            if fname.lower().endswith(('.ttf', '.ttc', '.otf')):
+                return os.path.join(fonts_dir, fname)
+    return None
+
+
+def _mtime(path):
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _font_dirs(base_dir):
+    return [os.path.join(base_dir, 'fonts')] + list(SYSTEM_FONT_DIRS)
+
+
+def find_chinese_font_cached(base_dir, cache_path=None):
+    """
+    带磁盘缓存的 find_chinese_font。缓存记录找到的字体文件及其修改时间：文件仍在且修改时间不变时直接使用。
+    上次未找到字体时记录各字体目录的修改时间，目录没有变化（没有新装字体）就不再重新扫描。
+    """
+    cache_path = cache_path or os.path.join(base_dir, FONT_CACHE_FILE)
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            cached = json.load(f)
+        path = cached.get('path')
+        if path is not None and _mtime(path) == cached.get('mtime'):
+            return path
+        if path is None and cached.get('dirs') == [_mtime(d) for d in _font_dirs(base_dir)]:
+            return None
+    except (OSError, ValueError, AttributeError):
+        pass
+
+    path = find_chinese_font(base_dir)
+    entry = {'path': path, 'mtime': _mtime(path) if path else None}
+    if path is None:
+        entry['dirs'] = [_mtime(d) for d in _font_dirs(base_dir)]
+    try:
+        tmp = cache_path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(entry, f)
+        os.replace(tmp, cache_path)
+    except OSError:
+        pass
+    return path
+
+
+@lru_cache(maxsize=None)
+def load_font(path, size, bold=False):
+    try:
+        if path:
+            return pygame.font.Font(path, size)
+    except Exception:
+        pass
+    return pygame.font.SysFont('arial', size, bold=bold)
+
+
+_text_cache = OrderedDict()
+
+
+def render_text(get_font, text, size, color, bold=False):
+    """返回 get_font(size) 渲染出的抗锯齿文字表面；同样的 (文字, 字号, 颜色) 直接复用缓存。"""
+    key = (get_font, text, size, tuple(color), bold)
+    surf = _text_cache.get(key)
+    if surf is not None:
+        _text_cache.move_to_end(key)
+        return surf
+    font = get_font(size, bold) if bold else get_font(size)
+    surf = font.render(text, True, color)
+    _text_cache[key] = surf
+    if len(_text_cache) > TEXT_CACHE_SIZE:
+        _text_cache.popitem(last=False)
+    return surf
+
+
+def clear_text_cache():
+    _text_cache.clear()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+# 果实管理：结构数组存放果实，过期用最小堆，按格子下标 O(1) 找到蛇头下的果实
+import heapq
+from array import array
+from occupancy import EMPTY, FRUIT_WHITE, FRUIT_RED, FRUIT_TAGS
+
+# 每隔多少步补一个果实
+SPAWN_EVERY = 20
+
+
+class FruitManager:
+    """
+    果实表（结构数组）：每个槽位保存格子下标、标记（FRUIT_WHITE / FRUIT_RED）、生成时刻与生成序号，
+    另有格子下标 → 槽位的字典（只含有果实的格子，与棋盘大小无关）。过期时间放在最小堆 (过期时刻, 序号, 槽位) 中；被吃掉的果实只把槽位序号作废，
+    堆中的旧条目在弹出时跳过（惰性删除）。
+
+    生成时刻随序号单调不减，因此同一步内过期的果实按序号（生成先后）弹出，
+    随机数的使用顺序与原来逐个扫描列表时相同，同一种子的对局与录像保持一致。
+    配置（max_fruits、red_probability、fruit_lifetime_ms）与随机数、占用网格都从所属引擎读取。
+    """
+    __slots__ = ('engine', 'cell', 'kind', 'spawn_time', 'seq', 'slot_at', 'free_slots', 'heap', 'next_seq', 'count')
+
+    def __init__(self, eng):
+        self.engine = eng
+        self.cell = array('i')
+        self.kind = bytearray()
+        self.spawn_time = array('q')
+        self.seq = array('q')
+        self.slot_at = {}
+        self.free_slots = []
+        self.heap = []
+        self.next_seq = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def clear(self):
+        self.slot_at.clear()
+        del self.cell[:]
+        del self.kind[:]
+        del self.spawn_time[:]
+        del self.seq[:]
+        self.free_slots.clear()
+        self.heap.clear()
+        self.next_seq = 0
+        self.count = 0
+
+    def add(self, idx, tag, spawn_time):
+        """登记一个果实（网格由调用方写入）。"""
+        if self.free_slots:
+            slot = self.free_slots.pop()
+            self.cell[slot] = idx
+            self.kind[slot] = tag
+            self.spawn_time[slot] = spawn_time
+            self.seq[slot] = self.next_seq
+        else:
+            slot = len(self.seq)
+            self.cell.append(idx)
+            self.kind.append(tag)
+            self.spawn_time.append(spawn_time)
+            self.seq.append(self.next_seq)
+        self.slot_at[idx] = slot
+        heapq.heappush(self.heap, (spawn_time + self.engine.fruit_lifetime_ms, self.next_seq, slot))
+        self.next_seq += 1
+        self.count += 1
+
+    def _remove(self, slot):
+        del self.slot_at[self.cell[slot]]
+        self.seq[slot] = -1
+        self.free_slots.append(slot)
+        self.count -= 1
+        # 被吃掉的果实在堆中留下的旧条目过多时整体重建
+        if len(self.heap) > 4 * self.count + 64:
+            seq = self.seq
+            self.heap[:] = [e for e in self.heap if seq[e[2]] == e[1]]
+            heapq.heapify(self.heap)
+
+    def tag_at(self, idx):
+        slot = self.slot_at.get(idx)
+        return self.kind[slot] if slot is not None else None
+
+    def expires_at(self, idx):
+        """格子 idx 上果实的过期时刻（毫秒）；该格没有果实时返回 None。"""
+        slot = self.slot_at.get(idx)
+        return self.spawn_time[slot] + self.engine.fruit_lifetime_ms if slot is not None else None
+
+    def take(self, idx):
+        """移除格子 idx 上的果实并返回其标记；该格没有果实时返回 None。网格由调用方更新。"""
+        slot = self.slot_at.get(idx)
+        if slot is None:
+            return None
+        tag = self.kind[slot]
+        self._remove(slot)
+        return tag
+
+    def spawn(self, fruit_type=None):
+        """从空闲格中均匀抽取一格生成果实（fruit_type 为 'white' / 'red'，省略时按 red_probability 抽取）。"""
+        eng = self.engine
+        if self.count >= eng.max_fruits:
+            return False
+        free = eng.grid.free
+        if not len(free):
+            eng.spawn_failures += 1
+            return False
+        rng = eng.rng
+        idx = free.choice(rng)
+        if fruit_type is not None:
+            tag = FRUIT_TAGS[fruit_type]
+        else:
+            tag = FRUIT_RED if rng.random() < eng.red_probability else FRUIT_WHITE
+        eng.grid.set(idx, tag)
+        self.add(idx, tag, eng.now_ms)
+        return True
+
+    def expire(self, now_ms):
+        """移除所有到期的果实并按移除的数量补充；返回移除的数量。"""
+        heap = self.heap
+        seq = self.seq
+        grid = self.engine.grid
+        removed = 0
+        while heap and heap[0][0] <= now_ms:
+            _, s, slot = heapq.heappop(heap)
+            if seq[slot] != s:
+                continue
+            grid.set(self.cell[slot], EMPTY)
+            self._remove(slot)
+            removed += 1
+        for _ in range(removed):
+            self.spawn()
+        return removed
+
+    def periodic(self, move_count):
+        """每 SPAWN_EVERY 步补一个果实（未达上限时）。"""
+        if move_count % SPAWN_EVERY == 0:
+            self.spawn()
+
+    def items(self):
+        """按生成先后返回 [(格子下标, 标记, 生成时刻)]，供存档与关键帧使用。"""
+        seq = self.seq
+        live = sorted((seq[slot], slot) for slot in range(len(seq)) if seq[slot] >= 0)
+        return [(self.cell[slot], self.kind[slot], self.spawn_time[slot]) for _, slot in live]
+
+    def cells(self):
+        """全部果实所在的格子下标（顺序不定）。"""
+        seq = self.seq
+        return [self.cell[slot] for slot in range(len(seq)) if seq[slot] >= 0]
+
+    def restore(self, items):
+        """按 items() 的结果重建果实表（网格由调用方恢复）。"""
+        self.clear()
+        for idx, tag, spawn_time in items:
+            self.add(idx, tag, spawn_time)
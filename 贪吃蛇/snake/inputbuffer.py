@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+# 方向输入缓冲：一步之内的多次按键按顺序排队，每步只消费一个有效转向
+from collections import deque
+from engine import OPPOSITE
+
+# 最多缓冲的转向数；再多的按键多半是误触，丢弃以免蛇在松手后还继续转
+TURN_BUFFER_SIZE = 3
+
+
+class TurnBuffer:
+    """
+    入队时以“上一个排队方向（队列为空时为蛇当前方向）”判断：相同或相反的方向不会形成有效转向，直接丢弃。
+    这样 UP 紧接 LEFT 这类拐角操作在同一步内按下时，两个转向会分别在相邻的两步生效。
+    """
+
+    def __init__(self, size=TURN_BUFFER_SIZE):
+        self.turns = deque()
+        self.size = size
+
+    def __len__(self):
+        return len(self.turns)
+
+    def clear(self):
+        self.turns.clear()
+
+    def push(self, direction, current):
+        last = self.turns[-1] if self.turns else current
+        if direction == last or direction == OPPOSITE[last] or len(self.turns) >= self.size:
+            return False
+        self.turns.append(direction)
+        return True
+
+    def pop(self, current):
+        """取出下一个相对 current 有效的转向；没有时返回 None（保持当前方向）。"""
+        turns = self.turns
+        while turns:
+            direction = turns.popleft()
+            if direction != current and direction != OPPOSITE[current]:
+                return direction
+        return None
@@ -1,56 +1,582 @@
 # 排行榜持久化模块
+# 存储后端可插拔：json（旧格式，只保留前 N 名）、log（追加日志 + 定期压缩）、sqlite（按 (difficulty, score) 建索引）
 import json
+import mmap
 import os
+import re
+import sqlite3
+import tempfile
+import threading
+from bisect import bisect_right
 from datetime import datetime
+from functools import wraps
+from itertools import chain
 
 LEADERBOARD_FILE = None
 LEADERBOARD_SIZE = 10
+# 追加日志累计多少条后合并进快照文件
+LOG_COMPACT_EVERY = 256
+# 名次索引的分桶宽度（分数都是 10 的倍数，桶宽 10 时名次精确）
+RANK_BUCKET = 10
 
-def configure(path: str, size: int = 10):
-    global LEADERBOARD_FILE, LEADERBOARD_SIZE
+_backend = None
+_index = None
+# 写入可能来自后台线程（见 persist 模块），模块级函数统一持锁访问后端与索引
+_lock = threading.RLock()
+
+
+def _locked(func):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        with _lock:
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def _atomic_write(path, lines):
+    """先写临时文件并 fsync，再用 os.replace 原子替换，崩溃时不会留下半截文件。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix=os.path.basename(path))
+    try:
+        os.chmod(tmp, os.stat(path).st_mode & 0o777 if os.path.exists(path) else 0o644)
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            for line in lines:
+                f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def _make_entry(score_value, diff):
+    return {
+        "score": int(score_value),
+        "difficulty": diff if diff is not None else "unknown",
+        "time": datetime.utcnow().isoformat() + "Z"
+    }
+
+
+class _SortedEntries:
+    """按分数降序保存的条目；同分时先到的排在前面（与原来的稳定排序一致）。"""
+
+    def __init__(self, entries=()):
+        self.entries = sorted(entries, key=lambda e: e.get("score", 0), reverse=True)
+        self.keys = [-e.get("score", 0) for e in self.entries]
+
+    def insert(self, entry) -> int:
+        key = -entry["score"]
+        rank = bisect_right(self.keys, key)
+        self.keys.insert(rank, key)
+        self.entries.insert(rank, entry)
+        return rank
+
+    def top(self, k, difficulty=None):
+        return self.page(0, k, difficulty)
+
+    def page(self, offset, limit, difficulty=None):
+        if difficulty is None:
+            return [dict(e) for e in self.entries[offset:offset + limit]]
+        out = []
+        for e in self.entries:
+            if e.get("difficulty") == difficulty:
+                if offset:
+                    offset -= 1
+                    continue
+                out.append(dict(e))
+                if len(out) >= limit:
+                    break
+        return out
+
+
+class FenwickFile:
+    """
+    存在文件里、通过 mmap 读写的 int64 树状数组：第 0 格为总数，第 i 格为树状数组节点。
+    单次加计数与前缀查询都是 O(log n) 次内存读写，冷启动只需映射文件，无需重读或重排历史记录。
+    容量为 2 的幂，分桶越界时翻倍重建。
+    """
+
+    def __init__(self, path, capacity=1024):
+        self.path = path
+        new = not os.path.exists(path) or os.path.getsize(path) < 16
+        if new:
+            with open(path, 'wb') as f:
+                f.truncate((capacity + 1) * 8)
+        self._open()
+
+    def _open(self):
+        self.file = open(self.path, 'r+b')
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.tree = memoryview(self.mm).cast('q')
+        self.capacity = len(self.tree) - 1
+
+    def close(self):
+        self.tree.release()
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
+
+    def total(self) -> int:
+        return self.tree[0]
+
+    def prefix(self, bucket) -> int:
+        """分桶 [0, bucket] 内的计数之和。"""
+        tree = self.tree
+        i = min(bucket + 1, self.capacity)
+        acc = 0
+        while i > 0:
+            acc += tree[i]
+            i -= i & -i
+        return acc
+
+    def add(self, bucket, delta=1):
+        if bucket >= self.capacity:
+            self._grow(bucket + 1)
+        tree = self.tree
+        n = self.capacity
+        i = bucket + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+        tree[0] += delta
+
+    def kth(self, k) -> int:
+        """第 k 个（1-based，从小到大）计数所在的分桶。"""
+        tree = self.tree
+        pos = 0
+        step = self.capacity
+        while step:
+            nxt = pos + step
+            if nxt <= self.capacity and tree[nxt] < k:
+                pos = nxt
+                k -= tree[nxt]
+            step >>= 1
+        return pos
+
+    def clear(self):
+        self.mm[:] = bytes(len(self.mm))
+
+    def _grow(self, needed):
+        capacity = self.capacity
+        while capacity < needed:
+            capacity *= 2
+        counts = [self.prefix(b) - self.prefix(b - 1) if b else self.prefix(0) for b in range(self.capacity)]
+        self.close()
+        with open(self.path, 'r+b') as f:
+            f.truncate((capacity + 1) * 8)
+        self._open()
+        self.clear()
+        for b, c in enumerate(counts):
+            if c:
+                self.add(b, c)
+
+
+class ScoreIndex:
+    """
+    每个难度一棵 FenwickFile（另有 'all' 汇总全部难度），文件为 <base>.rank.<难度>。
+    提供按分数求名次、百分位，以及按名次定位分数段（用于分页）。
+    """
+
+    def __init__(self, base_path):
+        self.base_path = base_path
+        self.trees = {}
+
+    def tree(self, difficulty=None) -> FenwickFile:
+        key = difficulty or 'all'
+        t = self.trees.get(key)
+        if t is None:
+            safe = re.sub(r'[^0-9A-Za-z_-]', '_', key)
+            t = self.trees[key] = FenwickFile(f'{self.base_path}.rank.{safe}')
+        return t
+
+    def add(self, score, difficulty):
+        bucket = max(0, int(score)) // RANK_BUCKET
+        self.tree(None).add(bucket)
+        self.tree(difficulty).add(bucket)
+
+    def count(self, difficulty=None) -> int:
+        return self.tree(difficulty).total()
+
+    def count_above(self, score, difficulty=None) -> int:
+        """严格高于 score 的记录数。"""
+        t = self.tree(difficulty)
+        return t.total() - t.prefix(max(0, int(score)) // RANK_BUCKET)
+
+    def count_at_least(self, score, difficulty=None) -> int:
+        t = self.tree(difficulty)
+        return t.total() - t.prefix(max(0, int(score)) // RANK_BUCKET - 1)
+
+    def bucket_at(self, offset, difficulty=None) -> int:
+        """按分数降序的第 offset 条（0-based）记录所在的分桶。"""
+        t = self.tree(difficulty)
+        return t.kth(t.total() - offset)
+
+    def open_all(self):
+        directory = os.path.dirname(os.path.abspath(self.base_path))
+        prefix = os.path.basename(self.base_path) + '.rank.'
+        for name in os.listdir(directory):
+            if name.startswith(prefix):
+                self.tree(name[len(prefix):])
+
+    def consistent(self, total) -> bool:
+        """汇总树与各难度树之和都等于历史记录总数。"""
+        self.open_all()
+        per_difficulty = sum(t.total() for key, t in self.trees.items() if key != 'all')
+        return self.count() == total == per_difficulty
+
+    def rebuild(self, scores):
+        """索引与历史记录不一致时（如首次启用或异常退出）从完整历史重建。"""
+        self.open_all()
+        for t in self.trees.values():
+            t.clear()
+        for score, difficulty in scores:
+            self.add(score, difficulty)
+
+    def close(self):
+        for t in self.trees.values():
+            t.close()
+        self.trees.clear()
+
+
+class JsonBackend:
+    """旧格式：单个 JSON 数组，只保留前 size 名；写入改为原子替换。"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+
+    def load_all(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+                if isinstance(data, list):
+                    return data
+        except Exception:
+            pass
+        return []
+
+    def save(self, entries):
+        _atomic_write(self.path, [json.dumps(entries, ensure_ascii=False, indent=2)])
+
+    def add(self, entry) -> int:
+        board = _SortedEntries(self.load_all())
+        rank = board.insert(entry)
+        self.save(board.entries[:self.size])
+        return rank
+
+    def top(self, k, difficulty=None):
+        return _SortedEntries(self.load_all()).top(k, difficulty)
+
+    def page(self, offset, limit, difficulty=None):
+        return self.top(offset + limit, difficulty)[offset:]
+
+    def count(self):
+        return None  # 只保留前 size 名，无法校验名次索引
+
+    def scores(self):
+        return ((e.get("score", 0), e.get("difficulty", "unknown")) for e in self.load_all())
+
+    def close(self):
+        pass
+
+
+class LogBackend:
+    """
+    追加日志：每局一行 JSON（带递增的序号 seq）追加到 path + '.log' 并 fsync；
+    累计 LOG_COMPACT_EVERY 条后把全部历史按名次写成快照 path（原子替换，首行记下已并入的最大序号）并清空日志。
+    冷启动读取已排好序的快照，再重放序号大于快照所记序号的日志；写完快照、清空日志之前崩溃时不会重复计入。
+    保留全部历史。
+    """
+
+    def __init__(self, path, size):
+        self.path = path
+        self.log_path = path + '.log'
+        self.size = size
+        entries = self._read_lines(self.path)
+        # 快照首行 {"log_seq": N}：序号不超过 N 的日志已并入快照（旧快照没有这一行）
+        snapshot_seq = entries.pop(0)["log_seq"] if entries and "log_seq" in entries[0] else 0
+        self.seq = snapshot_seq
+        log_entries = []
+        for e in self._read_lines(self.log_path):
+            seq = e.pop("seq", None)
+            if seq is None or seq > snapshot_seq:
+                log_entries.append(e)
+            if seq is not None:
+                self.seq = max(self.seq, seq)
+        self.board = _SortedEntries(entries)
+        self.by_difficulty = {}
+        for e in self.board.entries:
+            self.by_difficulty.setdefault(e.get("difficulty", "unknown"), []).append(e)
+        self.by_difficulty = {d: _SortedEntries(es) for d, es in self.by_difficulty.items()}
+        for e in log_entries:
+            self._insert(e)
+        self.log_count = len(log_entries)
+        self.log = open(self.log_path, 'a', encoding='utf-8')
+
+    @staticmethod
+    def _read_lines(path):
+        entries = []
+        if not os.path.exists(path):
+            return entries
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entries.append(json.loads(line))
+                except ValueError:
+                    # 崩溃时可能留下半行，跳过即可
+                    continue
+        return entries
+
+    def add(self, entry) -> int:
+        self.seq += 1
+        self.log.write(json.dumps(dict(entry, seq=self.seq), ensure_ascii=False) + '\n')
+        self.log.flush()
+        os.fsync(self.log.fileno())
+        rank = self._insert(entry)
+        self.log_count += 1
+        if self.log_count >= LOG_COMPACT_EVERY:
+            self.compact()
+        return rank
+
+    def _insert(self, entry) -> int:
+        board = self.by_difficulty.get(entry.get("difficulty", "unknown"))
+        if board is None:
+            board = self.by_difficulty[entry.get("difficulty", "unknown")] = _SortedEntries()
+        board.insert(entry)
+        return self.board.insert(entry)
+
+    def compact(self):
+        header = json.dumps({"log_seq": self.seq}) + '\n'
+        lines = (json.dumps(e, ensure_ascii=False) + '\n' for e in self.board.entries)
+        _atomic_write(self.path, chain((header,), lines))
+        # 快照已记下序号：此后崩溃、日志未清空时，重放会跳过这些已并入的记录
+        self._truncate_log()
+
+    def _truncate_log(self):
+        self.log.close()
+        self.log = open(self.log_path, 'w', encoding='utf-8')
+        self.log_count = 0
+
+    def top(self, k, difficulty=None):
+        return self.page(0, k, difficulty)
+
+    def page(self, offset, limit, difficulty=None):
+        if difficulty is None:
+            return self.board.page(offset, limit)
+        board = self.by_difficulty.get(difficulty)
+        return board.page(offset, limit) if board is not None else []
+
+    def count(self):
+        return len(self.board.entries)
+
+    def scores(self):
+        return ((e.get("score", 0), e.get("difficulty", "unknown")) for e in self.board.entries)
+
+    def close(self):
+        self.log.close()
+
+
+class SqliteBackend:
+    """SQLite 存储：全部历史，(difficulty, score) 与 score 上建索引，插入 O(log n)，前 K 名按索引读取。"""
+
+    def __init__(self, path, size):
+        self.path = path
+        self.size = size
+        # 可选的名次索引：有索引时分页先定位分数段，再从索引上的该分数段开始读取
+        self.index = None
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute('CREATE TABLE IF NOT EXISTS scores ('
+                          'id INTEGER PRIMARY KEY, score INTEGER NOT NULL, difficulty TEXT NOT NULL, time TEXT NOT NULL)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS scores_by_diff ON scores (difficulty, score DESC, id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS scores_by_score ON scores (score DESC, id)')
+        self.conn.commit()
+
+    def insert(self, entry):
+        with self.conn:
+            cur = self.conn.execute('INSERT INTO scores (score, difficulty, time) VALUES (?, ?, ?)',
+                                    (entry["score"], entry["difficulty"], entry["time"]))
+        return cur.lastrowid
+
+    def add(self, entry) -> int:
+        row_id = self.insert(entry)
+        if self.index is not None:
+            # 名次索引在本条写入成功后才由调用方登记：名次为索引中不低于该分数的记录数
+            return self.index.count_at_least(entry["score"])
+        # 同分时先到的排在前面：比它高的分数 + 同分中更早插入的
+        (rank,) = self.conn.execute('SELECT COUNT(*) FROM scores WHERE score > ? OR (score = ? AND id < ?)',
+                                    (entry["score"], entry["score"], row_id)).fetchone()
+        return rank
+
+    def top(self, k, difficulty=None):
+        if difficulty is None:
+            rows = self.conn.execute('SELECT score, difficulty, time FROM scores ORDER BY score DESC, id LIMIT ?', (k,))
+        else:
+            rows = self.conn.execute('SELECT score, difficulty, time FROM scores WHERE difficulty = ? '
+                                     'ORDER BY score DESC, id LIMIT ?', (difficulty, k))
+        return [{"score": s, "difficulty": d, "time": t} for s, d, t in rows]
+
+    def page(self, offset, limit, difficulty=None):
+        below = None
+        if self.index is not None and 0 < offset < self.index.count(difficulty):
+            # 先用名次索引找到第 offset 名所在的分数段，SQL 只需从该段起跳过段内的少量记录
+            bucket = self.index.bucket_at(offset, difficulty)
+            below = (bucket + 1) * RANK_BUCKET
+            offset -= self.index.count_at_least(below, difficulty)
+        where, args = [], []
+        if difficulty is not None:
+            where.append('difficulty = ?')
+            args.append(difficulty)
+        if below is not None:
+            where.append('score < ?')
+            args.append(below)
+        sql = 'SELECT score, difficulty, time FROM scores'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        sql += ' ORDER BY score DESC, id LIMIT ? OFFSET ?'
+        rows = self.conn.execute(sql, args + [limit, offset])
+        return [{"score": s, "difficulty": d, "time": t} for s, d, t in rows]
+
+    def count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM scores').fetchone()[0]
+
+    def scores(self):
+        return self.conn.execute('SELECT score, difficulty FROM scores')
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {
+    'json': JsonBackend,
+    'log': LogBackend,
+    'sqlite': SqliteBackend,
+}
+
+
+def _guess_backend(path):
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.db', '.sqlite', '.sqlite3'):
+        return 'sqlite'
+    if ext in ('.jsonl', '.log'):
+        return 'log'
+    return 'json'
+
+
+@_locked
+def configure(path: str, size: int = 10, backend: str = None):
+    """
+    backend 为 'json' / 'log' / 'sqlite'，省略时按扩展名推断（.db → sqlite，.jsonl → log，其余 json）。
+    log / sqlite 后端另带持久化的名次索引（<path>.rank.*），启动时只比对总数，不一致才从历史重建。
+    """
+    global LEADERBOARD_FILE, LEADERBOARD_SIZE, _backend, _index
+    if _backend is not None:
+        _backend.close()
+    if _index is not None:
+        _index.close()
     LEADERBOARD_FILE = path
     LEADERBOARD_SIZE = size
+    _backend = BACKENDS[backend or _guess_backend(path)](path, size) if path else None
+    _index = None
+    if _backend is not None and _backend.count() is not None:
+        _index = ScoreIndex(path)
+        if not _index.consistent(_backend.count()):
+            _index.rebuild(_backend.scores())
+        if isinstance(_backend, SqliteBackend):
+            _backend.index = _index
+    return _backend
 
-def load_leaderboard():
-    if not LEADERBOARD_FILE:
-        return []
-    if not os.path.exists(LEADERBOARD_FILE):
+def _add_entry(entry) -> int:
+    # 先写后端：写入失败（磁盘满、数据库被锁）时名次索引保持不变，不会与后端差一条
+    rank = _backend.add(entry)
+    if _index is not None:
+        _index.add(entry["score"], entry["difficulty"])
+    return rank
+
+@_locked
+def import_legacy_json(json_path):
+    """当前后端为空时导入旧的 leaderboard.json，便于从 json 后端迁移。"""
+    if _backend is None or isinstance(_backend, JsonBackend) or not os.path.exists(json_path):
+        return 0
+    if _backend.top(1):
+        return 0
+    entries = JsonBackend(json_path, LEADERBOARD_SIZE).load_all()
+    for e in sorted(entries, key=lambda e: e.get("time", "")):
+        _add_entry({"score": int(e.get("score", 0)), "difficulty": e.get("difficulty", "unknown"), "time": e.get("time", "")})
+    return len(entries)
+
+@_locked
+def load_leaderboard(difficulty=None):
+    if _backend is None:
         return []
     try:
-        with open(LEADERBOARD_FILE, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
+        return _backend.top(LEADERBOARD_SIZE, difficulty)
     except Exception:
-        pass
-    return []
+        return []
 
+@_locked
 def save_leaderboard(entries):
-    if not LEADERBOARD_FILE:
-        return
-    try:
-        with open(LEADERBOARD_FILE, 'w', encoding='utf-8') as f:
-            json.dump(entries, f, ensure_ascii=False, indent=2)
-    except Exception:
-        pass
+    # 仅旧 json 后端支持整表覆盖写入
+    if isinstance(_backend, JsonBackend):
+        try:
+            _backend.save(entries)
+        except Exception:
+            pass
+
+@_locked
+def add_score(score_value, diff):
+    """写入一条记录，返回它在全部记录中的名次（0-based，同分时先到的在前）；未配置后端时返回 None。"""
+    if _backend is None:
+        return None
+    return _add_entry(_make_entry(score_value, diff))
 
 def add_score_to_leaderboard(score_value, diff):
     """
-    将分数添加到排行榜，并确保排行榜最多包含 LEADERBOARD_SIZE 条记录，
-    如果新分数在排序后的排行榜中，返回其排名（0-based index），否则返回 None。
+    将分数写入排行榜后端，后端直接返回新条目在全部记录中的名次（0-based）。
+    名次在前 LEADERBOARD_SIZE 内时返回该名次，否则返回 None。
     """
-    entries = load_leaderboard()
-    entry = {
-        "score": int(score_value),
-        "difficulty": diff if diff is not None else "unknown",
-        "time": datetime.utcnow().isoformat() + "Z"
-    }
-    entries.append(entry)
-    entries.sort(key=lambda e: e.get("score", 0), reverse=True)
-    entries = entries[:LEADERBOARD_SIZE]
-    save_leaderboard(entries)
-    # 在排序后的列表中查找新添加的条目
-    for idx, e in enumerate(entries):
-        if e.get("time") == entry["time"] and e.get("score") == entry["score"]:
-            return idx
-    return None
\ No newline at end of file
+    rank = add_score(score_value, diff)
+    return rank if rank is not None and rank < LEADERBOARD_SIZE else None
+
+@_locked
+def count(difficulty=None) -> int:
+    if _index is not None:
+        return _index.count(difficulty)
+    return len(load_leaderboard(difficulty))
+
+@_locked
+def rank_of(score_value, difficulty=None):
+    """score_value 在全部（或某难度）记录中的名次（1-based，并列取最好名次）。"""
+    if _index is not None:
+        return _index.count_above(score_value, difficulty) + 1
+    return sum(1 for e in load_leaderboard(difficulty) if e.get("score", 0) > score_value) + 1
+
+@_locked
+def percentile(score_value, difficulty=None):
+    """不高于 score_value 的记录所占百分比（0~100）；没有记录时返回 None。"""
+    total = count(difficulty)
+    if not total:
+        return None
+    if _index is not None:
+        above = _index.count_above(score_value, difficulty)
+    else:
+        above = rank_of(score_value, difficulty) - 1
+    return 100.0 * (total - above) / total
+
+@_locked
+def page(offset, limit, difficulty=None):
+    """按分数降序的第 offset 条起（0-based）最多 limit 条记录。"""
+    if _backend is None or limit <= 0:
+        return []
+    try:
+        return _backend.page(max(0, offset), limit, difficulty)
+    except Exception:
+        return []
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+# 障碍物布局生成：二维前缀和 O(1) 判断矩形是否落在禁止区域内，只在合法左上角中抽样；
+# 与已放置障碍物是否重叠查左上角掩码，同样是 O(1)
+import random
+from collections import deque
+from functools import lru_cache
+
+
+def summed_area(blocked: bytes, grid_w: int, grid_h: int) -> list[int]:
+    """返回 (grid_h + 1) × (grid_w + 1) 的前缀和表，sat[y][x] 为 [0, x) × [0, y) 内被占格数。"""
+    stride = grid_w + 1
+    sat = [0] * (stride * (grid_h + 1))
+    for gy in range(grid_h):
+        row_sum = 0
+        base = gy * grid_w
+        prev = gy * stride
+        cur = prev + stride
+        for gx in range(grid_w):
+            row_sum += blocked[base + gx]
+            sat[cur + gx + 1] = sat[prev + gx + 1] + row_sum
+    return sat
+
+
+def all_reachable(obstacle: bytearray, grid_w: int, grid_h: int, start: int) -> bool:
+    """从 start 出发四连通泛洪，检查所有非障碍格是否都可达。"""
+    if obstacle[start]:
+        return False
+    total = len(obstacle) - sum(obstacle)
+    seen = bytearray(obstacle)
+    seen[start] = 1
+    queue = deque((start,))
+    reached = 1
+    while queue:
+        idx = queue.popleft()
+        gx = idx % grid_w
+        for n, ok in ((idx - grid_w, idx >= grid_w), (idx + grid_w, idx < len(seen) - grid_w),
+                      (idx - 1, gx > 0), (idx + 1, gx < grid_w - 1)):
+            if ok and not seen[n]:
+                seen[n] = 1
+                reached += 1
+                queue.append(n)
+    return reached == total
+
+
+def ring_is_open(obstacle: bytearray, grid_w: int, grid_h: int, tl_x: int, tl_y: int, w: int, h: int) -> bool:
+    """矩形外围一圈都在棋盘内且没有障碍物时，放置该矩形不可能切断连通性。"""
+    if tl_x == 0 or tl_y == 0 or tl_x + w >= grid_w or tl_y + h >= grid_h:
+        return False
+    top = (tl_y - 1) * grid_w
+    bottom = (tl_y + h) * grid_w
+    for gx in range(tl_x - 1, tl_x + w + 1):
+        if obstacle[top + gx] or obstacle[bottom + gx]:
+            return False
+    for gy in range(tl_y, tl_y + h):
+        if obstacle[gy * grid_w + tl_x - 1] or obstacle[gy * grid_w + tl_x + w]:
+            return False
+    return True
+
+
+@lru_cache(maxsize=16)
+def valid_corners(grid_w: int, grid_h: int, w: int, h: int, forbidden: bytes) -> tuple[int, ...]:
+    """矩形内没有禁止格的全部左上角（下标 gy * grid_w + gx），与种子无关，按棋盘缓存。"""
+    sat = summed_area(forbidden, grid_w, grid_h)
+    stride = grid_w + 1
+    return tuple(tl_y * grid_w + tl_x
+                 for tl_y in range(grid_h - h + 1)
+                 for tl_x in range(grid_w - w + 1)
+                 if sat[(tl_y + h) * stride + tl_x + w] - sat[tl_y * stride + tl_x + w]
+                 - sat[(tl_y + h) * stride + tl_x] + sat[tl_y * stride + tl_x] == 0)
+
+
+def generate_layout(seed, grid_w: int, grid_h: int, count: int, w: int, h: int, forbidden: bytes, start: int) -> tuple:
+    """
+    生成最多 count 个 w × h 的矩形障碍物，返回左上角 (gx, gy) 元组。
+    forbidden 为不可放置的格子掩码（如中心安全区），放置后从 start 出发整张棋盘必须仍然连通。
+    所有障碍物同样大小：左上角 (x, y) 的矩形与已放置的 (px, py) 重叠当且仅当 |x - px| < w 且 |y - py| < h，
+    每放置一个就在 overlaps 掩码中标出这些左上角，之后每个候选只需查一次。
+    """
+    w = max(1, min(w, grid_w))
+    h = max(1, min(h, grid_h))
+    rng = random.Random(seed)
+    candidates = list(valid_corners(grid_w, grid_h, w, h, forbidden))
+    obstacle = bytearray(grid_w * grid_h)
+    overlaps = bytearray(grid_w * grid_h)
+    corners = []
+    while len(corners) < count and candidates:
+        # 均匀抽取并交换删除；与已放置障碍物重叠的候选在抽到时再淘汰
+        i = rng.randrange(len(candidates))
+        corner = candidates[i]
+        candidates[i] = candidates[-1]
+        candidates.pop()
+        if overlaps[corner]:
+            continue
+        tl_x, tl_y = corner % grid_w, corner // grid_w
+        block = [gy * grid_w + gx for gx in range(tl_x, tl_x + w) for gy in range(tl_y, tl_y + h)]
+        open_ring = ring_is_open(obstacle, grid_w, grid_h, tl_x, tl_y, w, h)
+        for idx in block:
+            obstacle[idx] = 1
+        if not open_ring and not all_reachable(obstacle, grid_w, grid_h, start):
+            for idx in block:
+                obstacle[idx] = 0
+            continue
+        x0, x1 = max(0, tl_x - w + 1), min(grid_w, tl_x + w)
+        for gy in range(max(0, tl_y - h + 1), min(grid_h, tl_y + h)):
+            overlaps[gy * grid_w + x0:gy * grid_w + x1] = b'\x01' * (x1 - x0)
+        corners.append((tl_x, tl_y))
+    return tuple(corners)
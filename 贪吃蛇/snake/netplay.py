@@ -0,0 +1,500 @@
+# -*- coding: utf-8 -*-
+# 联机：asyncio 权威服务器持有唯一的引擎并按固定步长推进，客户端只发送方向输入、接收状态。
+# 每步只广播占用网格中变化的格子（蛇头进入、蛇尾弹出、果实生成 / 过期 / 被吃都是网格写入），
+# 另外定期与在新客户端加入时发送关键帧（全部非空格子）。
+#
+# 协议（TCP，小端）：
+#   客户端 → 服务器：HELLO（魔数、版本、角色），之后每个字节是一个动作编码（replay.ACTIONS）
+#   服务器 → 客户端：若干帧，每帧 u32 长度 + 消息；消息首字节为类型
+#     CONFIG   棋盘宽高（格）、蛇速
+#     KEYFRAME / DELTA   步号、分数、死亡原因、蛇头像素坐标、格子数 n，其后 n 个 u32 格子下标与 n 个 u8 标记
+#
+# 用法示例：
+#   python netplay.py serve --port 7777 --difficulty hard --autopilot
+#   python netplay.py bench --clients 300 --seconds 10
+#   python SnakeGame.py --connect localhost:7777
+import argparse
+import asyncio
+import socket
+import struct
+import sys
+import time
+from collections import deque
+
+import engine
+from autopilot import Autopilot
+from engine import SnakeEngine, board_size
+from inputbuffer import TurnBuffer
+from occupancy import OccupancyGrid
+from replay import ACTIONS, ACTION_CODES, DEATHS, DEATH_CODES
+from world import ChunkedGrid
+
+MAGIC = b'SNKN'
+VERSION = 1
+HELLO = struct.Struct('<4sHB')
+ROLE_PLAYER = 0
+ROLE_SPECTATOR = 1
+
+FRAME = struct.Struct('<I')
+MSG_CONFIG = 0
+MSG_KEYFRAME = 1
+MSG_DELTA = 2
+CONFIG = struct.Struct('<BHHH')
+TICK = struct.Struct('<BIIBiiI')
+
+DEFAULT_PORT = 7777
+# 关键帧间隔（步）：丢包重同步之外，也让刚连上的旁观者在几秒内看到完整局面
+KEYFRAME_EVERY = 200
+# 每个客户端最多排队的帧数；超过时丢弃排队的增量与关键帧（保留配置消息），改发一个关键帧重新同步
+CLIENT_QUEUE = 64
+# 每个连接的发送缓冲上限（字节），超过后 drain() 等待，由上面的队列吸收积压
+WRITE_BUFFER_HIGH = 64 * 1024
+# 死亡后停留多少步再开新局
+RESTART_TICKS = 60
+# 服务器落后超过这么多步时不再追赶
+MAX_CATCHUP_TICKS = 5
+HELLO_TIMEOUT = 5.0
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def frame(payload: bytes) -> bytes:
+    return FRAME.pack(len(payload)) + payload
+
+
+def encode_config(board_w, board_h, snake_speed) -> bytes:
+    return frame(CONFIG.pack(MSG_CONFIG, board_w, board_h, snake_speed))
+
+
+def encode_tick(kind, tick, eng, idx, tags) -> bytes:
+    n = len(idx)
+    return frame(TICK.pack(kind, tick, eng.score, DEATH_CODES[eng.death], eng.snake_position[0],
+                           eng.snake_position[1], n) + struct.pack(f'<{n}I', *idx) + tags)
+
+
+class FrameReader:
+    """按长度前缀切分字节流：feed() 追加收到的数据，返回其中完整的消息。"""
+
+    def __init__(self):
+        self.buf = bytearray()
+
+    def feed(self, data) -> list[bytes]:
+        buf = self.buf
+        buf += data
+        frames = []
+        pos = 0
+        while len(buf) - pos >= FRAME.size:
+            (size,) = FRAME.unpack_from(buf, pos)
+            end = pos + FRAME.size + size
+            if end > len(buf):
+                break
+            frames.append(bytes(buf[pos + FRAME.size:end]))
+            pos = end
+        del buf[:pos]
+        return frames
+
+
+class RemoteGame:
+    """
+    客户端的镜像局面：只有网格、蛇头、分数与死亡原因，按服务器的消息更新。
+    字段名与引擎一致（grid / chunked / snake_position），可直接交给 renderer.make_renderer。
+    """
+
+    def __init__(self, board_w, board_h, snake_speed):
+        self.board_w = board_w
+        self.board_h = board_h
+        self.snake_speed = snake_speed
+        self.chunked = board_w * board_h > engine.CHUNKED_MIN_CELLS
+        if self.chunked:
+            self.grid = ChunkedGrid(board_w, board_h, lambda idx: False, 0)
+        else:
+            self.grid = OccupancyGrid(board_w, board_h)
+        self.snake_position = [0, 0]
+        self.score = 0
+        self.death = None
+        self.tick = -1
+        # 收到第一个关键帧之前的增量没有基准，直接忽略
+        self.synced = False
+
+    def apply(self, payload) -> int:
+        """应用一条 KEYFRAME / DELTA 消息，返回消息类型；关键帧之后渲染器需要整屏重画。"""
+        kind, tick, score, death, hx, hy, n = TICK.unpack_from(payload)
+        if kind == MSG_DELTA and not self.synced:
+            return kind
+        offset = TICK.size
+        idx = struct.unpack_from(f'<{n}I', payload, offset)
+        tags = payload[offset + 4 * n:offset + 5 * n]
+        if len(tags) != n:
+            raise ProtocolError('消息已截断')
+        grid = self.grid
+        if kind == MSG_KEYFRAME:
+            grid.clear()
+            self.synced = True
+        for i, tag in zip(idx, tags):
+            grid.set(i, tag)
+        self.tick = tick
+        self.score = score
+        self.death = DEATHS[death]
+        self.snake_position = [hx, hy]
+        return kind
+
+
+def _parse_config(payload):
+    kind, board_w, board_h, snake_speed = CONFIG.unpack_from(payload)
+    if kind != MSG_CONFIG:
+        raise ProtocolError('缺少配置消息')
+    return RemoteGame(board_w, board_h, snake_speed)
+
+
+class _Client:
+    __slots__ = ('writer', 'role', 'queue', 'ready', 'sender')
+
+    def __init__(self, writer, role):
+        self.writer = writer
+        self.role = role
+        self.queue = deque()
+        self.ready = asyncio.Event()
+        self.sender = None
+
+
+class GameServer:
+    """
+    权威服务器：唯一的引擎按 snake_speed 固定步长推进，所有玩家的方向输入按到达顺序进入同一个转向缓冲。
+    引擎只有一条蛇，因此多个玩家共同操控这条蛇，旁观者只接收状态；给出 pilot 时没有玩家在线的局由它操控。
+    每步的消息只编码一次，广播时按客户端放入各自的有界队列，由每个连接自己的发送任务写出。
+    """
+
+    def __init__(self, eng, keyframe_every=KEYFRAME_EVERY, queue_size=CLIENT_QUEUE, pilot=None):
+        self.engine = eng
+        eng.grid.dirty = []
+        self.turns = TurnBuffer()
+        self.pilot = pilot
+        self.players = 0
+        self.keyframe_every = keyframe_every
+        self.queue_size = queue_size
+        self.clients = set()
+        self.handlers = set()
+        self.tick = 0
+        self.restart_at = None
+        self.server = None
+        self._keyframe = None
+        # 统计：因积压而重新同步的次数、已写出的字节数
+        self.resyncs = 0
+        self.bytes_sent = 0
+
+    def keyframe(self) -> bytes:
+        """当前步的关键帧；同一步内多次请求（新客户端加入、积压重同步）只编码一次。"""
+        if self._keyframe is None or self._keyframe[0] != self.tick:
+            idx, tags = self.engine.grid.occupied()
+            self._keyframe = (self.tick, encode_tick(MSG_KEYFRAME, self.tick, self.engine, idx, tags))
+        return self._keyframe[1]
+
+    def broadcast(self, data):
+        limit = self.queue_size
+        for client in self.clients:
+            queue = client.queue
+            if len(queue) >= limit:
+                # 发送跟不上：积压的增量已无意义，换成当前局面的关键帧；
+                # 还没发出的配置消息要保留，否则客户端无法解码之后的帧
+                pending = [f for f in queue if f[FRAME.size] == MSG_CONFIG]
+                queue.clear()
+                queue.extend(pending)
+                queue.append(self.keyframe())
+                self.resyncs += 1
+            else:
+                queue.append(data)
+            client.ready.set()
+
+    def step(self):
+        """推进一步并广播；死亡后停留 RESTART_TICKS 步（期间广播空增量，客户端的步号照常前进）再开新局。"""
+        eng = self.engine
+        grid = eng.grid
+        self.tick += 1
+        if eng.death is not None and self.tick >= self.restart_at:
+            eng.reset()
+            self.turns.clear()
+            grid.dirty.clear()
+            self.broadcast(self.keyframe())
+            return
+        if eng.death is None:
+            eng.step(self.pilot() if self.pilot is not None and not self.players else self.turns.pop(eng.direction))
+            if eng.death is not None:
+                self.restart_at = self.tick + RESTART_TICKS
+        # 同一步内多次写入的格子只发最终标记
+        changed = list(dict.fromkeys(grid.dirty))
+        grid.dirty.clear()
+        if self.tick % self.keyframe_every == 0:
+            self.broadcast(self.keyframe())
+        else:
+            self.broadcast(encode_tick(MSG_DELTA, self.tick, eng, changed, bytes(grid.get(i) for i in changed)))
+
+    async def start(self, host='127.0.0.1', port=DEFAULT_PORT) -> int:
+        """开始监听，返回实际端口（port 为 0 时由系统分配）。"""
+        self.server = await asyncio.start_server(self._handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def run(self, ticks=None):
+        """固定步长推进 ticks 步（默认一直运行）。"""
+        loop = asyncio.get_running_loop()
+        dt = 1.0 / self.engine.snake_speed
+        next_t = loop.time()
+        done = 0
+        while ticks is None or done < ticks:
+            self.step()
+            done += 1
+            next_t += dt
+            delay = next_t - loop.time()
+            if delay < -dt * MAX_CATCHUP_TICKS:
+                next_t = loop.time()
+            await asyncio.sleep(max(0.0, delay))
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+        for client in list(self.clients):
+            client.writer.close()
+        if self.handlers:
+            await asyncio.gather(*self.handlers, return_exceptions=True)
+        if self.server is not None:
+            await self.server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        try:
+            await self._serve_client(reader, writer)
+        finally:
+            self.handlers.discard(task)
+
+    async def _serve_client(self, reader, writer):
+        try:
+            magic, version, role = HELLO.unpack(await asyncio.wait_for(reader.readexactly(HELLO.size), HELLO_TIMEOUT))
+        except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+            writer.close()
+            return
+        if magic != MAGIC or version != VERSION:
+            writer.close()
+            return
+        sock = writer.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        eng = self.engine
+        client = _Client(writer, role)
+        client.queue.append(encode_config(eng.grid_w, eng.grid_h, eng.snake_speed))
+        client.queue.append(self.keyframe())
+        client.ready.set()
+        client.sender = asyncio.create_task(self._send_loop(client))
+        self.clients.add(client)
+        self.players += role == ROLE_PLAYER
+        try:
+            while True:
+                data = await reader.read(256)
+                if not data:
+                    break
+                if role != ROLE_PLAYER:
+                    continue
+                for code in data:
+                    if 0 < code < len(ACTIONS):
+                        self.turns.push(ACTIONS[code], eng.direction)
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            self.players -= role == ROLE_PLAYER
+            client.sender.cancel()
+            writer.close()
+
+    async def _send_loop(self, client):
+        writer = client.writer
+        queue = client.queue
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                while queue:
+                    data = b''.join(queue)
+                    queue.clear()
+                    writer.write(data)
+                    self.bytes_sent += len(data)
+                    await writer.drain()
+        except ConnectionError:
+            writer.close()
+
+
+class NetClient:
+    """
+    阻塞 socket 的客户端（供 pygame 前端在主循环中轮询）：连接时等到配置消息，之后非阻塞地收取。
+    game 为 RemoteGame 镜像。
+    """
+
+    def __init__(self, host, port, role=ROLE_PLAYER, timeout=HELLO_TIMEOUT):
+        self.sock = socket.create_connection((host, port), timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.sendall(HELLO.pack(MAGIC, VERSION, role))
+        self.reader = FrameReader()
+        self.game = None
+        pending = []
+        while self.game is None:
+            data = self.sock.recv(65536)
+            if not data:
+                raise ConnectionError('服务器已断开')
+            pending += self.reader.feed(data)
+            if pending:
+                self.game = _parse_config(pending.pop(0))
+        for payload in pending:
+            self.game.apply(payload)
+        self.sock.setblocking(False)
+
+    def send_action(self, direction):
+        try:
+            self.sock.send(bytes((ACTION_CODES[direction],)))
+        except BlockingIOError:
+            pass
+
+    def poll(self) -> bool:
+        """收取并应用所有已到达的消息；其中有关键帧时返回 True。服务器断开时抛出 ConnectionError。"""
+        keyframe = False
+        while True:
+            try:
+                data = self.sock.recv(65536)
+            except BlockingIOError:
+                return keyframe
+            if not data:
+                raise ConnectionError('服务器已断开')
+            for payload in self.reader.feed(data):
+                keyframe |= self.game.apply(payload) == MSG_KEYFRAME
+
+    def close(self):
+        self.sock.close()
+
+
+class AsyncClient:
+    """asyncio 客户端：用于本机回环测试与压测，也可作为旁观者。"""
+
+    def __init__(self, reader, writer, game):
+        self.reader = reader
+        self.writer = writer
+        self.game = game
+        self.frames = 0
+
+    @classmethod
+    async def connect(cls, host, port, role=ROLE_SPECTATOR):
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(HELLO.pack(MAGIC, VERSION, role))
+        game = _parse_config(await cls._read_frame(reader))
+        return cls(reader, writer, game)
+
+    @staticmethod
+    async def _read_frame(reader):
+        (size,) = FRAME.unpack(await reader.readexactly(FRAME.size))
+        return await reader.readexactly(size)
+
+    async def recv(self) -> int:
+        """读取并应用一条消息，返回其类型。"""
+        kind = self.game.apply(await self._read_frame(self.reader))
+        self.frames += 1
+        return kind
+
+    def send_action(self, direction):
+        self.writer.write(bytes((ACTION_CODES[direction],)))
+
+    async def close(self):
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+def make_engine(difficulty=None, board=None):
+    speed, red_probability = engine.DIFFICULTIES.get(difficulty, (engine.SNAKE_SPEED, engine.RED_PROBABILITY))
+    board_w, board_h = board or (engine.WINDOW_X // engine.CELL, engine.WINDOW_Y // engine.CELL)
+    return SnakeEngine(board_w * engine.CELL, board_h * engine.CELL, difficulty, speed, red_probability)
+
+
+async def serve(host, port, difficulty=None, board=None, autopilot=False):
+    eng = make_engine(difficulty, board)
+    server = GameServer(eng, pilot=Autopilot(eng) if autopilot else None)
+    port = await server.start(host, port)
+    print(f'监听 {host}:{port}，{server.engine.snake_speed} 步/秒', file=sys.stderr)
+    try:
+        await server.run()
+    finally:
+        await server.close()
+
+
+async def bench(clients, seconds, difficulty='hard', slow=0):
+    """
+    本机回环压测：clients 个旁观者跟随服务器 seconds 秒，其中 slow 个客户端故意读得很慢以触发重同步。
+    蛇由自动驾驶操控，增量大小接近真实对局。最后核对每个正常客户端的镜像与服务器网格一致。
+    """
+    eng = make_engine(difficulty)
+    server = GameServer(eng, pilot=Autopilot(eng))
+    port = await server.start('127.0.0.1', 0)
+    conns = [await AsyncClient.connect('127.0.0.1', port) for _ in range(clients)]
+    stop = asyncio.Event()
+
+    async def follow(conn, delay):
+        try:
+            while not stop.is_set():
+                await conn.recv()
+                if delay:
+                    await asyncio.sleep(delay)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    tasks = [asyncio.create_task(follow(c, 0.5 if i < slow else 0)) for i, c in enumerate(conns)]
+    ticks = int(seconds * server.engine.snake_speed)
+    start = time.perf_counter()
+    await server.run(ticks)
+    elapsed = time.perf_counter() - start
+    # 等正常客户端收完最后一步
+    for _ in range(200):
+        if all(c.game.tick == server.tick for c in conns[slow:]):
+            break
+        await asyncio.sleep(0.01)
+    expected = server.engine.grid.occupied()
+    in_sync = sum(c.game.tick == server.tick and c.game.grid.occupied() == expected for c in conns[slow:])
+    stop.set()
+    for c in conns:
+        await c.close()
+    for t in tasks:
+        t.cancel()
+    await server.close()
+    return {'clients': clients, 'ticks': ticks, 'tick_rate': ticks / elapsed, 'in_sync': in_sync,
+            'resyncs': server.resyncs, 'bytes_per_client_tick': server.bytes_sent / max(1, clients * ticks)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇联机服务器')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_serve = sub.add_parser('serve', help='运行权威服务器')
+    p_serve.add_argument('--host', default='127.0.0.1')
+    p_serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    p_serve.add_argument('--difficulty', choices=sorted(engine.DIFFICULTIES))
+    p_serve.add_argument('--board', type=board_size, help='棋盘尺寸（格），如 5000x5000')
+    p_serve.add_argument('--autopilot', action='store_true', help='没有玩家在线时由自动驾驶操控')
+    p_bench = sub.add_parser('bench', help='本机回环压测')
+    p_bench.add_argument('--clients', type=int, default=300)
+    p_bench.add_argument('--seconds', type=float, default=5.0)
+    p_bench.add_argument('--slow', type=int, default=0, help='其中故意读得很慢的客户端数')
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        try:
+            asyncio.run(serve(args.host, args.port, args.difficulty, args.board, args.autopilot))
+        except KeyboardInterrupt:
+            pass
+        return 0
+    result = asyncio.run(bench(args.clients, args.seconds, slow=args.slow))
+    print(f"{result['clients']} 个客户端，{result['ticks']} 步，{result['tick_rate']:.1f} 步/秒，"
+          f"同步 {result['in_sync']}/{result['clients'] - args.slow}，重同步 {result['resyncs']} 次，"
+          f"每客户端每步 {result['bytes_per_client_tick']:.1f} 字节")
+    return 0 if result['in_sync'] == result['clients'] - args.slow else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
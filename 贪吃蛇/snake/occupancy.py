@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+# 占用网格：每个格子一个字节，记录该格是空地、蛇身、障碍物还是果实，供碰撞判定与生成器 O(1) 查询
+from array import array
+
+# 格子标记
+EMPTY = 0
+BODY = 1
+OBSTACLE = 2
+FRUIT_WHITE = 3
+FRUIT_RED = 4
+
+FRUIT_TAGS = {'white': FRUIT_WHITE, 'red': FRUIT_RED}
+
+
+def is_fruit(tag: int) -> bool:
+    return tag >= FRUIT_WHITE
+
+
+class FreeCells:
+    """
+    空闲格集合：紧凑数组 + 位置→下标映射，删除时与末尾元素交换。
+    add / discard / 均匀随机抽取都是 O(1)。
+    """
+    __slots__ = ('items', 'where')
+
+    def __init__(self, size: int):
+        self.items = array('i')
+        self.where = array('i', [-1]) * size
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, idx: int) -> bool:
+        return self.where[idx] >= 0
+
+    def add(self, idx: int):
+        if self.where[idx] < 0:
+            self.where[idx] = len(self.items)
+            self.items.append(idx)
+
+    def discard(self, idx: int):
+        pos = self.where[idx]
+        if pos < 0:
+            return
+        last = self.items.pop()
+        if last != idx:
+            self.items[pos] = last
+            self.where[last] = pos
+        self.where[idx] = -1
+
+    def copy(self) -> 'FreeCells':
+        other = FreeCells(0)
+        other.items = array('i', self.items)
+        other.where = array('i', self.where)
+        return other
+
+    def choice(self, rng) -> int:
+        return self.items[rng.randrange(len(self.items))]
+
+
+class OccupancyGrid:
+    """
+    以 bytearray 存储的 width × height 网格，格子下标为 gy * width + gx。
+    所有状态变更（蛇头前进、蛇尾弹出、果实生成/被吃/过期、障碍物放置）都应通过 set() 增量更新。
+    若给出 spawnable 掩码，网格会同步维护其中为空的格子集合 free（FreeCells）。
+    dirty 为 None 时不记录变更；设为列表后每次 set() 都会追加格子下标，供增量渲染消费。
+    """
+    __slots__ = ('width', 'height', 'cells', 'spawnable', 'free', '_all_free', 'dirty')
+
+    def __init__(self, width: int, height: int, spawnable: bytearray = None):
+        self.width = width
+        self.height = height
+        self.cells = bytearray(width * height)
+        self.spawnable = spawnable
+        self.dirty = None
+        self.free = None
+        self._all_free = None
+        if spawnable is not None:
+            # 空网格时的空闲格集合只构建一次，clear() 时整体复制
+            self._all_free = FreeCells(width * height)
+            for idx, ok in enumerate(spawnable):
+                if ok:
+                    self._all_free.add(idx)
+            self.free = self._all_free.copy()
+
+    def clear(self):
+        self.cells[:] = bytes(len(self.cells))
+        if self._all_free is not None:
+            self.free = self._all_free.copy()
+
+    def index(self, gx: int, gy: int) -> int:
+        return gy * self.width + gx
+
+    def coords(self, idx: int) -> tuple[int, int]:
+        return idx % self.width, idx // self.width
+
+    def in_bounds(self, gx: int, gy: int) -> bool:
+        return 0 <= gx < self.width and 0 <= gy < self.height
+
+    def get(self, idx: int) -> int:
+        return self.cells[idx]
+
+    def set(self, idx: int, tag: int):
+        self.cells[idx] = tag
+        if self.dirty is not None:
+            self.dirty.append(idx)
+        if self.free is not None and self.spawnable[idx]:
+            if tag == EMPTY:
+                self.free.add(idx)
+            else:
+                self.free.discard(idx)
+
+    def is_empty(self, idx: int) -> bool:
+        return self.cells[idx] == EMPTY
+
+    def occupied(self) -> tuple[list[int], bytes]:
+        """全部非空格子的下标与对应标记（联机关键帧使用）。"""
+        cells = self.cells
+        idx = [i for i, tag in enumerate(cells) if tag]
+        return idx, bytes(cells[i] for i in idx)
+
+    def save_cells(self) -> bytes:
+        """网格内容的拷贝，供 restore_cells 恢复（引擎的 get_state / set_state 使用）。"""
+        return bytes(self.cells)
+
+    def restore_cells(self, saved: bytes):
+        # 沿用同一个 bytearray：共享其内存的渲染表面不需要重建
+        self.cells[:] = saved
@@ -1,6 +1,8 @@
 # 页面（UI）功能模块：接收所需资源与回调，由主程序传入以避免循环依赖
 import pygame
 from typing import Callable
+from engine import DIFFICULTIES
+from fonts import render_text
 
 # 难度名映射
 DIFF_MAP = {
@@ -10,95 +12,154 @@ DIFF_MAP = {
     'unknown': '未知'
 }
 
+# 新成绩不在前 N 名时，排行榜额外显示的邻近名次行数
+NEIGHBOR_ROWS = 3
+# 游戏结束页面与排行榜页面等待后台写入 / 查询结果时的轮询间隔（毫秒）
+GAME_OVER_POLL_MS = 100
+
 def draw_center_text(game_window, get_font: Callable, text: str, size: int = 36, color=None, y_offset: int = 0, window_x: int = 720, window_y: int = 480):
-    font = get_font(size)
-    surf = font.render(text, True, color)
+    surf = render_text(get_font, text, size, color)
     rect = surf.get_rect(center=(window_x // 2, window_y // 2 + y_offset))
     game_window.blit(surf, rect)
 
+def _quit():
+    pygame.quit()
+    raise SystemExit
+
+def _wait_events(timeout_ms=None):
+    """
+    阻塞等待事件（timeout_ms 为 None 时一直等），返回本次取到的全部事件；超时返回空列表。
+    页面不再按帧率空转：没有输入、也没有需要更新的内容时进程处于休眠状态。
+    """
+    event = pygame.event.wait() if timeout_ms is None else pygame.event.wait(max(1, int(timeout_ms)))
+    if event.type == pygame.NOEVENT:
+        return []
+    return [event] + pygame.event.get()
+
+def _is_expose(event):
+    # 窗口被遮挡后重新露出时需要把缓存的画面重新提交
+    return event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED)
+
+def _static_surface(game_window):
+    return pygame.Surface(game_window.get_size()).convert(game_window)
+
 def show_start_screen(game_window, get_font, fps, window_x, window_y):
+    # 页面内容固定：只渲染一次到缓存表面，之后阻塞等待按键
+    page = _static_surface(game_window)
+    page.fill((0,0,0))
+    draw_center_text(page, get_font, '贪吃蛇', size=64, color=pygame.Color(255,0,0), y_offset=-50, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '按 空格 开始', size=28, color=pygame.Color(255,0,0), y_offset=30, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '使用方向键移动', size=20, color=pygame.Color(255,255,255), y_offset=60, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '按 ESC 退出', size=18, color=pygame.Color(255,255,255), y_offset=100, window_x=window_x, window_y=window_y)
+    dirty = True
     while True:
-        game_window.fill((0,0,0))
-        draw_center_text(game_window, get_font, '贪吃蛇', size=64, color=pygame.Color(255,0,0), y_offset=-50, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, '按 空格 开始', size=28, color=pygame.Color(255,0,0), y_offset=30, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, '使用方向键移动', size=20, color=pygame.Color(255,255,255), y_offset=60, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, '按 ESC 退出', size=18, color=pygame.Color(255,255,255), y_offset=100, window_x=window_x, window_y=window_y)
-        pygame.display.update()
-        for event in pygame.event.get():
+        if dirty:
+            game_window.blit(page, (0, 0))
+            pygame.display.update()
+            dirty = False
+        for event in _wait_events():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                raise SystemExit
+                _quit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
                     return
                 if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    raise SystemExit
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE]:
-            return
-        if keys[pygame.K_ESCAPE]:
-            pygame.quit()
-            raise SystemExit
-        fps.tick(10)
+                    _quit()
+            if _is_expose(event):
+                dirty = True
 
 def show_difficulty_screen(game_window, get_font, fps, window_x, window_y):
     btn_w, btn_h = 360, 60
     center_x = window_x // 2
     start_y = window_y // 2 - 10
-    easy_rect = pygame.Rect(center_x - btn_w // 2, start_y - 70, btn_w, btn_h)
-    normal_rect = pygame.Rect(center_x - btn_w // 2, start_y, btn_w, btn_h)
-    hard_rect = pygame.Rect(center_x - btn_w // 2, start_y + 70, btn_w, btn_h)
+    buttons = [
+        ('easy', '简单（点击）', pygame.Rect(center_x - btn_w // 2, start_y - 70, btn_w, btn_h)),
+        ('normal', '普通（点击）', pygame.Rect(center_x - btn_w // 2, start_y, btn_w, btn_h)),
+        ('hard', '困难（点击）', pygame.Rect(center_x - btn_w // 2, start_y + 70, btn_w, btn_h)),
+    ]
 
     def draw_button(rect, text, hover=False):
         color = pygame.Color(170,170,170) if hover else pygame.Color(100,100,100)
         pygame.draw.rect(game_window, color, rect, border_radius=6)
-        font = get_font(24)
-        surf = font.render(text, True, pygame.Color(255,255,255))
+        surf = render_text(get_font, text, 24, pygame.Color(255,255,255))
         srect = surf.get_rect(center=rect.center)
         game_window.blit(surf, srect)
 
+    def hovered_at(pos):
+        for i, (_, _, rect) in enumerate(buttons):
+            if rect.collidepoint(pos):
+                return i
+        return None
+
+    # 标题与提示只渲染一次；按钮只在悬停状态变化时重画
+    page = _static_surface(game_window)
+    page.fill((0,0,0))
+    draw_center_text(page, get_font, '选择难度', size=48, color=pygame.Color(255,255,255), y_offset=-120, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '点击选择难度', size=18, color=pygame.Color(255,255,255), y_offset=150, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '按 ESC 退出', size=14, color=pygame.Color(255,255,255), y_offset=180, window_x=window_x, window_y=window_y)
+    hovered = hovered_at(pygame.mouse.get_pos())
+    dirty = True
     while True:
-        mouse_pos = pygame.mouse.get_pos()
-        game_window.fill((0,0,0))
-        draw_center_text(game_window, get_font, '选择难度', size=48, color=pygame.Color(255,255,255), y_offset=-120, window_x=window_x, window_y=window_y)
-        draw_button(easy_rect, '简单（点击）', easy_rect.collidepoint(mouse_pos))
-        draw_button(normal_rect, '普通（点击）', normal_rect.collidepoint(mouse_pos))
-        draw_button(hard_rect, '困难（点击）', hard_rect.collidepoint(mouse_pos))
-        draw_center_text(game_window, get_font, '点击选择难度', size=18, color=pygame.Color(255,255,255), y_offset=150, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, '按 ESC 退出', size=14, color=pygame.Color(255,255,255), y_offset=180, window_x=window_x, window_y=window_y)
-        pygame.display.update()
-
-        for event in pygame.event.get():
+        if dirty:
+            game_window.blit(page, (0, 0))
+            for i, (_, text, rect) in enumerate(buttons):
+                draw_button(rect, text, i == hovered)
+            pygame.display.update()
+            dirty = False
+
+        for event in _wait_events():
             if event.type == pygame.QUIT:
-                pygame.quit()
-                raise SystemExit
+                _quit()
+            if event.type == pygame.MOUSEMOTION:
+                now_hovered = hovered_at(event.pos)
+                if now_hovered != hovered:
+                    hovered = now_hovered
+                    dirty = True
             if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-                if easy_rect.collidepoint(event.pos):
-                    return 'easy', 20, 0.3
-                if normal_rect.collidepoint(event.pos):
-                    return 'normal', 30, 0.2
-                if hard_rect.collidepoint(event.pos):
-                    return 'hard', 40, 0.2
+                i = hovered_at(event.pos)
+                if i is not None:
+                    name = buttons[i][0]
+                    return (name,) + DIFFICULTIES[name]
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    raise SystemExit
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_ESCAPE]:
-            pygame.quit()
-            raise SystemExit
+                    _quit()
+            if _is_expose(event):
+                dirty = True
 
-        fps.tick(30)
-
-def show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, load_leaderboard_cb, highlight_index=None, lock_seconds=1.0):
-    # 加载并排序
+def query_leaderboard(load_leaderboard_cb, highlight_index=None, page_cb=None, summary_cb=None):
+    """
+    读取排行榜页面需要的全部数据（可交给后台写入线程执行，界面线程不访问存储后端）。
+    highlight_index 为新成绩在全部记录中的名次（0-based），也可以是尚未取回的名次 Future。
+    名次在前 N 名之外且提供了 page_cb(offset, limit) 时，另取新成绩附近的几名；
+    summary_cb() 给出显示在列表下方的一行说明（如名次与百分位）。
+    """
+    highlight_index = _rank_result(highlight_index)
     entries = load_leaderboard_cb() or []
     entries.sort(key=lambda e: e.get('score', 0), reverse=True)
+    first, nearby = None, []
+    if highlight_index is not None and highlight_index >= len(entries) and page_cb is not None and entries:
+        first = max(0, highlight_index - NEIGHBOR_ROWS // 2)
+        try:
+            nearby = page_cb(first, NEIGHBOR_ROWS) or []
+        except Exception:
+            nearby = []
+    try:
+        summary = summary_cb() if summary_cb is not None else None
+    except Exception:
+        summary = None
+    return {'entries': entries, 'highlight': highlight_index, 'first': first, 'nearby': nearby, 'summary': summary}
+
+def _render_leaderboard(get_font, window_x, board):
+    """排行榜内容在页面内不会变化：所有行只渲染一次，返回 (表面, 位置) 列表。"""
+    entries, highlight_index, first, nearby = board['entries'], board['highlight'], board['first'], board['nearby']
+    ranked = list(enumerate(entries))
+    gap_after = None
+    if nearby:
+        keep = max(1, len(entries) - len(nearby) - 1)
+        ranked = ranked[:keep] + [(first + i, e) for i, e in enumerate(nearby) if first + i >= keep]
+        if first > keep:
+            gap_after = keep
 
-    lock_end = pygame.time.get_ticks() + int(lock_seconds * 1000)
-    font = get_font(22)
     start_y = 110
     center_x = window_x // 2
     start_x = center_x - 220
@@ -108,61 +169,95 @@ def show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, load
     col_time_x = start_x + 240
     col_tag_x = start_x + 460
 
+    rows = []
+    if not entries:
+        no_surf = render_text(get_font, "暂无分数。", 22, pygame.Color(255,255,255))
+        rows.append((no_surf, (center_x - no_surf.get_width() // 2, start_y)))
+    else:
+        row = 0
+        for i, e in ranked:
+            if row == gap_after:
+                rows.append((render_text(get_font, "…", 22, pygame.Color(255,255,255)), (col_rank_x, start_y + row * 28)))
+                row += 1
+            y = start_y + row * 28
+            row += 1
+            is_highlight = (highlight_index is not None and i == highlight_index)
+            color = pygame.Color(255,0,0) if is_highlight else pygame.Color(255,255,255)
+            diff_text = DIFF_MAP.get(e.get('difficulty', 'unknown'), '未知')
+            time_text = e.get('time', '')[:19].replace('T', ' ')
+            rows.append((render_text(get_font, f"{i+1}.", 22, color), (col_rank_x, y)))
+            rows.append((render_text(get_font, str(e.get('score', 0)), 22, color), (col_score_x, y)))
+            rows.append((render_text(get_font, diff_text, 22, color), (col_diff_x, y)))
+            rows.append((render_text(get_font, time_text, 22, color), (col_time_x, y)))
+            if is_highlight:
+                rows.append((render_text(get_font, "（NEW）", 18, pygame.Color(255,0,0)), (col_tag_x, y)))
+    return rows
+
+def show_leaderboard_screen(game_window, get_font, fps, window_x, window_y, board, lock_seconds=1.0):
+    """
+    board 为 query_leaderboard 的结果，或在后台线程中计算它的 Future。
+    结果到达之前页面显示“排名中…”并按 GAME_OVER_POLL_MS 轮询，不阻塞等待磁盘；解锁倒计时从进入页面时开始。
+    """
+    lock_end = pygame.time.get_ticks() + int(lock_seconds * 1000)
+    page = None
+    shown = None
     while True:
-        game_window.fill((0,0,0))
-        draw_center_text(game_window, get_font, '排行榜', size=48, color=pygame.Color(255,255,255), y_offset=-180, window_x=window_x, window_y=window_y)
-        if not entries:
-            no_surf = font.render("暂无分数。", True, pygame.Color(255,255,255))
-            game_window.blit(no_surf, (center_x - no_surf.get_width() // 2, start_y))
-        else:
-            for i, e in enumerate(entries):
-                y = start_y + i * 28
-                is_highlight = (highlight_index is not None and i == highlight_index)
-                color = pygame.Color(255,0,0) if is_highlight else pygame.Color(255,255,255)
-                rank_surf = font.render(f"{i+1}.", True, color)
-                score_surf = font.render(str(e.get('score', 0)), True, color)
-                diff_text = DIFF_MAP.get(e.get('difficulty', 'unknown'), '未知')
-                diff_surf = font.render(diff_text, True, color)
-                time_text = e.get('time', '')[:19].replace('T', ' ')
-                time_surf = font.render(time_text, True, color)
-                game_window.blit(rank_surf, (col_rank_x, y))
-                game_window.blit(score_surf, (col_score_x, y))
-                game_window.blit(diff_surf, (col_diff_x, y))
-                game_window.blit(time_surf, (col_time_x, y))
-                if is_highlight:
-                    tag = get_font(18).render("（NEW）", True, pygame.Color(255,0,0))
-                    game_window.blit(tag, (col_tag_x, y))
+        pending = hasattr(board, 'done') and not board.done()
+        if page is None and not pending:
+            try:
+                data = board.result() if hasattr(board, 'result') else board
+            except Exception:
+                data = query_leaderboard(lambda: [])
+            page = _static_surface(game_window)
+            page.fill((0,0,0))
+            draw_center_text(page, get_font, '排行榜', size=48, color=pygame.Color(255,255,255), y_offset=-180, window_x=window_x, window_y=window_y)
+            page.blits(_render_leaderboard(get_font, window_x, data), doreturn=False)
+            if data['summary']:
+                draw_center_text(page, get_font, data['summary'], size=18, color=pygame.Color(255,255,0), y_offset=170, window_x=window_x, window_y=window_y)
+            shown = None
 
+        # 只有解锁倒计时每秒变化一次：锁定期间按秒超时等待，解锁后一直阻塞到有按键
         now = pygame.time.get_ticks()
-        if now < lock_end:
-            remaining = max(0, (lock_end - now) // 1000)
-            hint = f'按 空格 返回（{remaining+1}秒后可返回），按 ESC 退出'
-        else:
-            hint = '按 空格 返回，按 ESC 退出'
-        draw_center_text(game_window, get_font, hint, size=18, color=pygame.Color(255,255,255), y_offset=200, window_x=window_x, window_y=window_y)
-        pygame.display.update()
-
-        for event in pygame.event.get():
+        remaining = (lock_end - now + 999) // 1000 if now < lock_end else 0
+        state = (remaining, page is None)
+        if state != shown:
+            shown = state
+            if remaining:
+                hint = f'按 空格 返回（{remaining}秒后可返回），按 ESC 退出'
+            else:
+                hint = '按 空格 返回，按 ESC 退出'
+            if page is None:
+                game_window.fill((0,0,0))
+                draw_center_text(game_window, get_font, '排名中…', size=24, color=pygame.Color(255,255,255), window_x=window_x, window_y=window_y)
+            else:
+                game_window.blit(page, (0, 0))
+            draw_center_text(game_window, get_font, hint, size=18, color=pygame.Color(255,255,255), y_offset=200, window_x=window_x, window_y=window_y)
+            pygame.display.update()
+
+        timeout = ((lock_end - now) % 1000 or 1000) if remaining else None
+        if pending:
+            timeout = min(timeout, GAME_OVER_POLL_MS) if timeout is not None else GAME_OVER_POLL_MS
+        for event in _wait_events(timeout):
             if event.type == pygame.QUIT:
-                pygame.quit()
-                raise SystemExit
+                _quit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE and pygame.time.get_ticks() >= lock_end:
-                    pygame.time.wait(150)
                     return
                 if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    raise SystemExit
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE] and pygame.time.get_ticks() >= lock_end:
-            pygame.time.wait(150)
-            return
-        if keys[pygame.K_ESCAPE]:
-            pygame.quit()
-            raise SystemExit
+                    _quit()
+            if _is_expose(event):
+                shown = None
 
-        fps.tick(15)
+def _rank_result(rank, wait=True):
+    """add_score_cb 可以直接返回名次，也可以返回后台写入的 Future；wait=False 时未完成返回 None。"""
+    if not hasattr(rank, 'result'):
+        return rank
+    if not wait and not rank.done():
+        return None
+    try:
+        return rank.result()
+    except Exception:
+        return None
 
 def show_game_over_screen(game_window, get_font, fps, window_x, window_y, add_score_cb, show_leaderboard_cb: Callable, show_difficulty_cb: Callable, reset_game_cb: Callable, score, difficulty):
     try:
@@ -170,37 +265,37 @@ def show_game_over_screen(game_window, get_font, fps, window_x, window_y, add_sc
     except Exception:
         new_rank = None
 
+    page = _static_surface(game_window)
+    page.fill((0,0,0))
+    draw_center_text(page, get_font, '游戏结束', size=64, color=pygame.Color(255,0,0), y_offset=-60, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, f'分数：{score}', size=32, color=pygame.Color(255,0,0), y_offset=0, window_x=window_x, window_y=window_y)
+    draw_center_text(page, get_font, '按 空格 查看排行榜    按 ESC 退出', size=18, color=pygame.Color(255,255,255), y_offset=60, window_x=window_x, window_y=window_y)
+
+    shown = None
     while True:
-        game_window.fill((0,0,0))
-        draw_center_text(game_window, get_font, '游戏结束', size=64, color=pygame.Color(255,0,0), y_offset=-60, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, f'分数：{score}', size=32, color=pygame.Color(255,0,0), y_offset=0, window_x=window_x, window_y=window_y)
-        draw_center_text(game_window, get_font, '按 空格 查看排行榜    按 ESC 退出', size=18, color=pygame.Color(255,255,255), y_offset=60, window_x=window_x, window_y=window_y)
-        pygame.display.update()
+        # 名次由后台线程写入后返回，写完之前先显示“保存中”，不等待磁盘；结果到达时重画一次
+        pending = hasattr(new_rank, 'done') and not new_rank.done()
+        rank = _rank_result(new_rank, wait=False)
+        rank_text = f'总排名第 {rank + 1} 名' if rank is not None else ('保存中…' if pending else '')
+        if rank_text != shown:
+            shown = rank_text
+            game_window.blit(page, (0, 0))
+            if rank_text:
+                draw_center_text(game_window, get_font, rank_text, size=20, color=pygame.Color(255,255,255), y_offset=30, window_x=window_x, window_y=window_y)
+            pygame.display.update()
 
-        for event in pygame.event.get():
+        for event in _wait_events(GAME_OVER_POLL_MS if pending else None):
             if event.type == pygame.QUIT:
-                pygame.quit()
-                raise SystemExit
+                _quit()
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
+                    # 名次可能仍在后台写入：把 Future 交给排行榜页面，由页面轮询，不在这里等待
                     show_leaderboard_cb(new_rank)
                     # 重新选择难度并重置（页面函数返回新设置）
                     show_difficulty_cb()
                     reset_game_cb()
                     return
                 if event.key == pygame.K_ESCAPE:
-                    pygame.quit()
-                    raise SystemExit
-
-        keys = pygame.key.get_pressed()
-        if keys[pygame.K_SPACE]:
-            pygame.time.wait(150)
-            show_leaderboard_cb(new_rank)
-            show_difficulty_cb()
-            reset_game_cb()
-            return
-        if keys[pygame.K_ESCAPE]:
-            pygame.quit()
-            raise SystemExit
-
-        fps.tick(10)
\ No newline at end of file
+                    _quit()
+            if _is_expose(event):
+                shown = None
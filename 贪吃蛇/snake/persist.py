@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+# 后台持久化：排行榜写入与逐局统计都交给一个后台线程，界面线程只入队，不等待磁盘
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+import leaderboard
+
+# 队列容量：正常情况下每局只有两条任务，积压到这个数量说明磁盘长时间无响应
+QUEUE_SIZE = 256
+# 统计日志的 fsync 间隔（秒）；排行榜后端自行保证每条记录的持久性
+FSYNC_INTERVAL = 2.0
+
+
+def _write_file(path, data):
+    """整文件写入：先写临时文件并 fsync，再原子替换，覆盖已有文件（如存档）时不会留下半截内容。"""
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class TelemetryLog:
+    """逐局统计：每局一行 JSON 追加到文件，写入走缓冲，由后台线程定期 fsync。"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'a', encoding='utf-8')
+        self.unsynced = 0
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.unsynced += 1
+
+    def sync(self):
+        if self.unsynced:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.unsynced = 0
+
+    def close(self):
+        self.sync()
+        self.file.close()
+
+
+class BackgroundWriter:
+    """
+    单个后台线程串行处理有界队列中的任务：
+    submit_score 返回 Future，结果为 leaderboard.add_score 给出的名次；
+    submit_query 在后台线程中执行只读查询并返回 Future，排在此前提交的写入之后，界面线程不必持有排行榜的锁；
+    submit_telemetry 只入队，队列满时丢弃并计数，绝不阻塞调用方；submit_file 写出整个文件（如录像）。
+    每轮取出队列中的全部任务一起处理，统计日志按 FSYNC_INTERVAL 批量 fsync。
+    close() 处理完剩余任务、fsync 后退出；创建时已用 atexit 注册，QUIT / ESC 退出时自动落盘。
+    """
+
+    def __init__(self, telemetry_path=None, maxsize=QUEUE_SIZE, fsync_interval=FSYNC_INTERVAL):
+        self.queue = queue.Queue(maxsize)
+        self.telemetry = TelemetryLog(telemetry_path) if telemetry_path else None
+        self.fsync_interval = fsync_interval
+        self.dropped = 0
+        self.closed = False
+        self._last_sync = time.monotonic()
+        self.thread = threading.Thread(target=self._run, name='persist-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def submit_score(self, score_value, diff) -> Future:
+        fut = Future()
+        if self.closed:
+            self._run_call(leaderboard.add_score, (score_value, diff), fut)
+            return fut
+        # 名次结果不能丢：队列满时等待后台线程腾出位置（只会发生在磁盘长时间卡住时）
+        self.queue.put(('score', (score_value, diff), fut))
+        return fut
+
+    def submit_query(self, fn, *args) -> Future:
+        fut = Future()
+        if self.closed:
+            self._run_call(fn, args, fut)
+            return fut
+        self.queue.put(('query', (fn, args), fut))
+        return fut
+
+    def submit_telemetry(self, record):
+        if self.closed:
+            return
+        try:
+            self.queue.put_nowait(('telemetry', record, None))
+        except queue.Full:
+            self.dropped += 1
+
+    def submit_file(self, path, data):
+        if self.closed:
+            _write_file(path, data)
+            return
+        self.queue.put(('file', (path, data), None))
+
+    def flush(self, timeout=None):
+        """等待此前入队的任务全部处理完并 fsync。"""
+        if self.closed:
+            return
+        fut = Future()
+        self.queue.put(('flush', None, fut))
+        fut.result(timeout)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(('stop', None, None))
+        self.thread.join()
+        if self.telemetry is not None:
+            self.telemetry.close()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        q = self.queue
+        while True:
+            try:
+                batch = [q.get(timeout=self.fsync_interval)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(q.get_nowait())
+                except queue.Empty:
+                    break
+            stop = False
+            waiters = []
+            for kind, payload, fut in batch:
+                if kind == 'score':
+                    self._run_call(leaderboard.add_score, payload, fut)
+                elif kind == 'query':
+                    self._run_call(payload[0], payload[1], fut)
+                elif kind == 'telemetry':
+                    if self.telemetry is not None:
+                        try:
+                            self.telemetry.write(payload)
+                        except OSError:
+                            self.dropped += 1
+                elif kind == 'file':
+                    try:
+                        _write_file(*payload)
+                    except OSError:
+                        pass
+                elif kind == 'flush':
+                    waiters.append(fut)
+                elif kind == 'stop':
+                    stop = True
+            if waiters or stop or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            for fut in waiters:
+                fut.set_result(None)
+            if stop:
+                return
+
+    def _run_call(self, fn, args, fut):
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(fn(*args))
+        except Exception as e:
+            fut.set_exception(e)
+
+    def _sync(self):
+        if self.telemetry is not None:
+            try:
+                self.telemetry.sync()
+            except OSError:
+                pass
+        self._last_sync = time.monotonic()
@@ -0,0 +1,278 @@
+# -*- coding: utf-8 -*-
+# 逐帧性能剖析：主循环各阶段、引擎内的果实过期 / 生成 / 碰撞判定与排行榜调用的耗时（perf_counter_ns），
+# 写入预先分配的环形缓冲；可在游戏中叠加显示帧耗时 p50 / p99 与最慢阶段，退出时导出 CSV 或 Chrome trace JSON。
+#
+# 未开启时主循环持有的剖析器为 None，引擎与排行榜的函数也不会被替换，没有任何额外开销。
+# 开启后用 instrument() 把被测函数替换为计时包装，uninstrument() 恢复原函数。
+# 计时区间按线程分别记录（后台写入线程上的排行榜调用不计入界面的帧耗时）；
+# 被包装函数嵌套调用时，内层区间作为外层的子区间只出现在时间线上，阶段累计只算最外层，避免重复计时；
+# 主循环阶段的累计也扣除其中被包装调用的耗时，CSV 中各阶段相加等于帧总耗时。
+import json
+import threading
+import time
+from array import array
+
+import collision
+import leaderboard
+from fruits import FruitManager
+
+# 环形缓冲容量：最近多少帧、多少个计时区间
+FRAME_CAPACITY = 1024
+EVENT_CAPACITY = 16384
+# 主循环各阶段（按每帧的执行顺序）；其余阶段是被包装函数的调用，可嵌套在这些阶段之内或发生在其他线程
+FRAME_PHASES = ('events', 'tick', 'score', 'draw', 'present', 'wait')
+EVENTS, TICK, SCORE, DRAW, PRESENT, WAIT = range(len(FRAME_PHASES))
+# 统计最慢阶段时不计入的阶段（等待下一帧的空闲时间）
+IDLE_PHASES = ('wait',)
+# 被包装的排行榜函数
+LEADERBOARD_CALLS = ('add_score', 'rank_of', 'percentile', 'page', 'load_leaderboard', 'count')
+# 碰撞判定函数（合并计入 collision 阶段）
+COLLISION_CALLS = ('hit_wall', 'hit_obstacle_grid', 'hit_self_grid')
+
+now_ns = time.perf_counter_ns
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    return sorted_values[min(len(sorted_values) - 1, len(sorted_values) * q // 100)]
+
+
+class _Track:
+    """一个线程的计时区间环形缓冲（阶段、起点、时长、外层被包装调用的阶段），以及正在进行的被包装调用栈。"""
+
+    def __init__(self, tid, name, events):
+        self.tid = tid
+        self.name = name
+        self.events = events
+        self.ev_phase = array('H', bytes(2 * events))
+        self.ev_start = array('q', bytes(8 * events))
+        self.ev_dur = array('q', bytes(8 * events))
+        self.ev_parent = array('h', b'\xff' * (2 * events))
+        self.ev_count = 0
+        self.stack = []
+
+    def record(self, pid, start, dur, parent):
+        slot = self.ev_count % self.events
+        self.ev_phase[slot] = pid
+        self.ev_start[slot] = start
+        self.ev_dur[slot] = dur
+        self.ev_parent[slot] = parent
+        self.ev_count += 1
+
+    def recent(self):
+        """最近的区间：[(阶段, 起点, 时长, 外层阶段)]，按记录顺序。"""
+        n = min(self.ev_count, self.events)
+        first = self.ev_count - n
+        return [(self.ev_phase[i % self.events], self.ev_start[i % self.events], self.ev_dur[i % self.events],
+                 self.ev_parent[i % self.events]) for i in range(first, first + n)]
+
+
+class Profiler:
+    """
+    每个阶段一条 FRAME_CAPACITY 帧的 int64 环形缓冲（该帧内此阶段的累计纳秒），外加帧起点与帧总耗时；
+    帧内累计只来自主线程，且互不重叠：主循环阶段扣除其中被包装调用的耗时（nested）。另外每个线程各有 EVENT_CAPACITY 个计时区间的环形缓冲（_Track，经 threading.local 取得），
+    用于导出时间线；其他线程写入与导出时持有 lock。阶段在第一次使用时分配缓冲，之后每帧只做数组写入。
+    """
+
+    def __init__(self, frames=FRAME_CAPACITY, events=EVENT_CAPACITY):
+        self.frames = frames
+        self.events = events
+        self.names = []
+        self.ids = {}
+        self.per_phase = []
+        self.acc = []
+        # 当前主循环阶段开始以来，主线程上最外层被包装调用的累计耗时
+        self.nested = 0
+        self.frame_start = array('q', bytes(8 * frames))
+        self.frame_total = array('q', bytes(8 * frames))
+        self.frame_count = 0
+        self.current_start = None
+        self.origin = now_ns()
+        self.lock = threading.Lock()
+        self._local = threading.local()
+        self.main_track = self._local.track = _Track(1, threading.current_thread().name, events)
+        self.tracks = [self.main_track]
+        self._patched = []
+        for name in FRAME_PHASES:
+            self.phase(name)
+
+    def phase(self, name) -> int:
+        pid = self.ids.get(name)
+        if pid is None:
+            pid = self.ids[name] = len(self.names)
+            self.names.append(name)
+            self.per_phase.append(array('q', bytes(8 * self.frames)))
+            self.acc.append(0)
+        return pid
+
+    def begin_frame(self):
+        """结束上一帧（写入环形缓冲）并开始新的一帧。"""
+        now = now_ns()
+        if self.current_start is not None:
+            slot = self.frame_count % self.frames
+            self.frame_start[slot] = self.current_start
+            self.frame_total[slot] = now - self.current_start
+            acc = self.acc
+            for pid, buf in enumerate(self.per_phase):
+                buf[slot] = acc[pid]
+                acc[pid] = 0
+            self.frame_count += 1
+        else:
+            # 第一帧之前（开局生成等）的耗时不属于任何一帧
+            self.acc[:] = [0] * len(self.acc)
+        self.nested = 0
+        self.current_start = now
+        return now
+
+    def restart_frame(self):
+        """丢弃当前帧已累计的耗时并从现在重新开始（跳过停留在结算等页面上的时间）。"""
+        self.acc[:] = [0] * len(self.acc)
+        self.nested = 0
+        self.current_start = now_ns()
+        return self.current_start
+
+    def track(self):
+        """当前线程的 _Track，第一次使用时创建并登记。"""
+        track = getattr(self._local, 'track', None)
+        if track is None:
+            with self.lock:
+                track = self._local.track = _Track(len(self.tracks) + 1, threading.current_thread().name, self.events)
+                self.tracks.append(track)
+        return track
+
+    def span(self, pid, start, track=None):
+        """
+        记录从 start 到现在的一个区间，返回当前时刻（可作为下一阶段的起点）。
+        只有主线程上、不在其他被包装调用之内的区间计入当前帧的阶段累计；
+        主循环阶段只计入扣除其中被包装调用之后的耗时。
+        """
+        end = now_ns()
+        dur = end - start
+        if track is None:
+            track = self.track()
+        parent = track.stack[-1] if track.stack else -1
+        if track is self.main_track:
+            if parent < 0:
+                if pid < len(FRAME_PHASES):
+                    self.acc[pid] += dur - self.nested
+                    self.nested = 0
+                else:
+                    self.acc[pid] += dur
+                    self.nested += dur
+            track.record(pid, start, dur, parent)
+        else:
+            with self.lock:
+                track.record(pid, start, dur, parent)
+        return end
+
+    def wrap(self, fn, name):
+        pid = self.phase(name)
+        span = self.span
+        get_track = self.track
+
+        def timed(*args, **kwargs):
+            track = get_track()
+            stack = track.stack
+            start = now_ns()
+            stack.append(pid)
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stack.pop()
+                span(pid, start, track)
+        timed.__wrapped__ = fn
+        return timed
+
+    def _patch(self, owner, attr, name):
+        # 记下该属性原本是否在 owner 自身上：实例上的包装恢复时直接删除，露出类上的方法
+        own = attr in vars(owner)
+        original = getattr(owner, attr)
+        self._patched.append((owner, attr, vars(owner).get(attr) if own else None, own))
+        setattr(owner, attr, self.wrap(original, name))
+
+    def instrument(self, eng=None):
+        """包装引擎的生成函数、果实过期、碰撞判定与排行榜调用；eng 为要计时的引擎实例。"""
+        self._patch(FruitManager, 'expire', 'expire')
+        self._patch(FruitManager, 'spawn', 'spawn_fruit')
+        if eng is not None:
+            self._patch(eng, 'spawn_obstacles', 'spawn_obstacles')
+            self._patch(eng, 'spawn_large_obstacles', 'spawn_large_obstacles')
+        for attr in COLLISION_CALLS:
+            self._patch(collision, attr, 'collision')
+        for attr in LEADERBOARD_CALLS:
+            self._patch(leaderboard, attr, 'leaderboard.' + attr)
+
+    def uninstrument(self):
+        while self._patched:
+            owner, attr, original, own = self._patched.pop()
+            if own:
+                setattr(owner, attr, original)
+            else:
+                delattr(owner, attr)
+
+    def _recent(self, buf):
+        n = min(self.frame_count, self.frames)
+        return sorted(buf[:n]) if self.frame_count <= self.frames else sorted(buf)
+
+    def stats(self):
+        """
+        最近 FRAME_CAPACITY 帧的统计：(帧耗时 p50, p99, {阶段: (p50, p99)}, 最慢阶段)，单位纳秒。
+        各阶段的耗时互不重叠，最慢阶段按 p99 在全部阶段中比较，不含等待下一帧的空闲时间。
+        """
+        totals = self._recent(self.frame_total)
+        phases = {}
+        for pid, name in enumerate(self.names):
+            values = self._recent(self.per_phase[pid])
+            if values and values[-1]:
+                phases[name] = (_percentile(values, 50), _percentile(values, 99))
+        busy = [(p99, name) for name, (_, p99) in phases.items() if name not in IDLE_PHASES]
+        slowest = max(busy)[1] if busy else None
+        return _percentile(totals, 50), _percentile(totals, 99), phases, slowest
+
+    def _frame_slots(self):
+        n = min(self.frame_count, self.frames)
+        first = self.frame_count - n
+        return [(first + i, (first + i) % self.frames) for i in range(n)]
+
+    def export_csv(self, path):
+        """每帧一行：帧号、帧起点（相对剖析开始，纳秒）、帧总耗时与各阶段耗时（纳秒，互不重叠，相加即帧总耗时）。"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(','.join(['frame', 'start_ns', 'total_ns'] + self.names) + '\n')
+            for frame, slot in self._frame_slots():
+                row = [frame, self.frame_start[slot] - self.origin, self.frame_total[slot]]
+                row += [buf[slot] for buf in self.per_phase]
+                f.write(','.join(map(str, row)) + '\n')
+
+    def export_chrome_trace(self, path):
+        """
+        每个线程最近 EVENT_CAPACITY 个区间，Chrome trace 的完整事件格式（chrome://tracing 或 Perfetto 打开）。
+        tid 0 为帧，其余每个线程一条；嵌套的被包装调用在 args.parent 中注明外层阶段。
+        """
+        names = self.names
+        with self.lock:
+            recent = [(track, track.recent()) for track in self.tracks]
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': 0, 'args': {'name': 'frames'}}]
+        for track, spans in recent:
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': 1, 'tid': track.tid, 'args': {'name': track.name}})
+            for pid, start, dur, parent in spans:
+                event = {'name': names[pid], 'ph': 'X', 'pid': 1, 'tid': track.tid,
+                         'ts': (start - self.origin) / 1000, 'dur': dur / 1000}
+                if parent >= 0:
+                    event['args'] = {'parent': names[parent]}
+                events.append(event)
+        for frame, slot in self._frame_slots():
+            events.append({'name': 'frame', 'ph': 'X', 'pid': 1, 'tid': 0,
+                           'ts': (self.frame_start[slot] - self.origin) / 1000, 'dur': self.frame_total[slot] / 1000,
+                           'args': {'frame': frame}})
+        # 起点相同时较长的在前，即外层区间排在它的子区间之前
+        events.sort(key=lambda e: (e.get('ts', 0), -e.get('dur', 0)))
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    def export(self, path):
+        """按扩展名导出：.json 为 Chrome trace，其他为 CSV。"""
+        if path.endswith('.json'):
+            self.export_chrome_trace(path)
+        else:
+            self.export_csv(path)
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+# 增量渲染：保留一张已画好障碍物与蛇身的棋盘画布，每帧只重画发生变化的格子并只提交这些矩形
+# 大于窗口的分块棋盘改用视口渲染：视口跟随蛇头，只画与视口相交的块
+import pygame
+from occupancy import EMPTY
+from engine import CELL
+from world import CHUNK, CHUNK_SHIFT
+
+
+class BoardBlitter:
+    """
+    整盘绘制：8 位调色板表面直接共享占用网格的字节（每格一个像素、标记即调色板下标），
+    放大到窗口尺寸后一次 blit。整帧只有两次 C 调用，与蛇身、障碍物和果实的格子数无关。
+    """
+
+    def __init__(self, grid, palette, cell=10):
+        self.grid = grid
+        self.small = pygame.image.frombuffer(grid.cells, (grid.width, grid.height), 'P')
+        self.small.set_palette([palette.get(tag, palette[EMPTY]) for tag in range(256)])
+        self.scaled = pygame.transform.scale(self.small, (grid.width * cell, grid.height * cell))
+
+    def blit(self, target, dest=(0, 0)):
+        pygame.transform.scale(self.small, self.scaled.get_size(), self.scaled)
+        return target.blit(self.scaled, dest)
+
+
+class IncrementalRenderer:
+    """
+    消费占用网格的 dirty 列表（格子下标）：每个变化的格子在棋盘画布上重涂一次，再拷贝到窗口。
+    每帧的绘制量只与变化的格子数有关，与蛇长和障碍物数量无关。
+    重开一局或窗口被其他页面覆盖后调用 invalidate()，下一帧整屏重画。
+    """
+
+    def __init__(self, surface, grid, palette, cell=10):
+        self.surface = surface
+        self.grid = grid
+        self.palette = palette
+        self.cell = cell
+        self.board = pygame.Surface(surface.get_size()).convert(surface)
+        self.blitter = BoardBlitter(grid, palette, cell)
+        self.label_rect = None
+        self._label = None
+        self.needs_full = True
+        grid.dirty = []
+
+    def invalidate(self):
+        self.needs_full = True
+
+    def cell_rect(self, idx):
+        c = self.cell
+        return pygame.Rect(idx % self.grid.width * c, idx // self.grid.width * c, c, c)
+
+    def redraw_board(self):
+        self.board.fill(self.palette[EMPTY])
+        self.blitter.blit(self.board)
+
+    def draw(self, label=None):
+        """
+        把本帧的变化画到窗口上，label 为叠加在左上角的文字表面（如分数）。
+        返回需要提交的矩形列表；整屏重画时返回 None，调用方应提交整个窗口。
+        """
+        surface = self.surface
+        dirty = self.grid.dirty
+        if self.needs_full:
+            self.needs_full = False
+            dirty.clear()
+            self.redraw_board()
+            surface.blit(self.board, (0, 0))
+            self.label_rect = surface.blit(label, (0, 0)) if label is not None else None
+            self._label = label
+            return None
+
+        rects = []
+        board = self.board
+        cells = self.grid.cells
+        palette = self.palette
+        for idx in dirty:
+            rect = self.cell_rect(idx)
+            board.fill(palette[cells[idx]], rect)
+            surface.blit(board, rect, rect)
+            rects.append(rect)
+        dirty.clear()
+
+        # 文字在格子之上：格子变化压到文字、或文字本身变化时，先用画布恢复底图再重贴文字
+        old = self.label_rect
+        if label is not None:
+            new = label.get_rect()
+            if old is None or new.size != old.size or old.collidelist(rects) >= 0 or label is not self._label:
+                area = new.union(old) if old is not None else new
+                surface.blit(board, area, area)
+                surface.blit(label, new)
+                rects.append(area)
+            self.label_rect = new
+        elif old is not None:
+            surface.blit(board, old, old)
+            rects.append(old)
+            self.label_rect = None
+        self._label = label
+        return rects
+
+
+class ChunkViewRenderer:
+    """
+    大棋盘的视口渲染：视口（窗口大小对应的格子范围）跟随 focus() 给出的像素坐标（通常是蛇头），
+    夹在棋盘范围内，因此棋盘边界就是窗口边缘。每帧只把与视口相交且已分配的块拷到一张
+    每格一个像素的 8 位视口表面上，再放大到窗口；每帧的工作量只与视口大小有关，与棋盘大小无关。
+    """
+
+    def __init__(self, surface, grid, palette, focus, cell=10):
+        self.surface = surface
+        self.grid = grid
+        self.palette = palette
+        self.focus = focus
+        self.cell = cell
+        width, height = surface.get_size()
+        self.view_w = min(width // cell, grid.width)
+        self.view_h = min(height // cell, grid.height)
+        self.colors = [palette.get(tag, palette[EMPTY]) for tag in range(256)]
+        self.view = pygame.Surface((self.view_w, self.view_h), depth=8)
+        self.view.set_palette(self.colors)
+        self.scaled = pygame.Surface((self.view_w * cell, self.view_h * cell), depth=8)
+        self.scaled.set_palette(self.colors)
+        # 块编号 → (块的 bytearray, 共享其内存的 8 位表面)；块被释放或替换后重建
+        self.surfaces = {}
+        self.origin = (0, 0)
+
+    def invalidate(self):
+        # 每帧都整屏重画，无需额外处理
+        pass
+
+    def follow(self):
+        """视口左上角（格）：focus 居中，夹在棋盘范围内。"""
+        px, py = self.focus()
+        cell = self.cell
+        gx = min(max(px // cell - self.view_w // 2, 0), self.grid.width - self.view_w)
+        gy = min(max(py // cell - self.view_h // 2, 0), self.grid.height - self.view_h)
+        self.origin = (gx, gy)
+        return self.origin
+
+    def chunk_surface(self, cid, chunk):
+        cached = self.surfaces.get(cid)
+        if cached is None or cached[0] is not chunk:
+            surf = pygame.image.frombuffer(chunk, (CHUNK, CHUNK), 'P')
+            surf.set_palette(self.colors)
+            cached = self.surfaces[cid] = (chunk, surf)
+        return cached[1]
+
+    def draw(self, label=None):
+        """画出视口与左上角文字；总是整屏重画，返回 None。"""
+        grid = self.grid
+        chunks = grid.chunks
+        ox, oy = self.follow()
+        view = self.view
+        view.fill(self.colors[EMPTY])
+        for cy in range(oy >> CHUNK_SHIFT, ((oy + self.view_h - 1) >> CHUNK_SHIFT) + 1):
+            for cx in range(ox >> CHUNK_SHIFT, ((ox + self.view_w - 1) >> CHUNK_SHIFT) + 1):
+                cid = cy * grid.chunks_x + cx
+                chunk = chunks.get(cid)
+                if chunk is not None:
+                    view.blit(self.chunk_surface(cid, chunk), ((cx << CHUNK_SHIFT) - ox, (cy << CHUNK_SHIFT) - oy))
+        # 已释放的块不再持有其表面
+        if len(self.surfaces) > len(chunks):
+            for cid in [cid for cid, (chunk, _) in self.surfaces.items() if chunks.get(cid) is not chunk]:
+                del self.surfaces[cid]
+        pygame.transform.scale(view, self.scaled.get_size(), self.scaled)
+        self.surface.fill(self.palette[EMPTY])
+        self.surface.blit(self.scaled, (0, 0))
+        if label is not None:
+            self.surface.blit(label, (0, 0))
+        return None
+
+
+def make_renderer(surface, eng, palette):
+    """按引擎的网格类型选择渲染器：全盘网格用增量渲染，分块的大棋盘用跟随蛇头的视口渲染。"""
+    if eng.chunked:
+        return ChunkViewRenderer(surface, eng.grid, palette, lambda: eng.snake_position, CELL)
+    return IncrementalRenderer(surface, eng.grid, palette, CELL)
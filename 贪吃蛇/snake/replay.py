@@ -0,0 +1,289 @@
+# -*- coding: utf-8 -*-
+# 对局录像：种子 + 每步一个字节的输入，紧凑二进制格式。
+# 无界面引擎可全速重放以校验分数，也可定位到任意一步，或在窗口中按倍速回放。
+#
+# 用法示例：
+#   python replay.py verify replays/*.snkr
+#   python replay.py play replays/20261018-102244_120.snkr --speed 4
+import argparse
+import struct
+import sys
+
+import engine
+
+MAGIC = b'SNKR'
+VERSION = 1
+# 头部：魔数、版本、种子、难度、RED_PROBABILITY、窗口宽高、蛇速、果实上限、果实寿命（毫秒）、
+# 中心安全区半径、障碍物数量与宽高、步数、最终分数、死亡原因；其后每步一个字节的动作编码
+HEADER = struct.Struct('<4sHQ8sdHHHHIHBBBIIB')
+
+# 动作编码：0 保持当前方向，1..4 对应 engine.DIRECTIONS
+ACTIONS = (None,) + engine.DIRECTIONS
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+DEATHS = (None, engine.DEATH_WALL, engine.DEATH_OBSTACLE, engine.DEATH_SELF)
+DEATH_CODES = {d: i for i, d in enumerate(DEATHS)}
+
+# 定位用关键帧的间隔（步）
+KEYFRAME_EVERY = 256
+
+
+class ReplayError(ValueError):
+    pass
+
+
+class Replay:
+    """一局录像：复现对局所需的全部配置、逐步动作编码，以及录制时的最终分数与死亡原因。"""
+
+    def __init__(self, seed, difficulty, red_probability, window_x, window_y, snake_speed, max_fruits,
+                 fruit_lifetime_ms, center_block_half, obstacle_count, obstacle_w, obstacle_h,
+                 actions=b'', score=0, death=None):
+        self.seed = seed
+        self.difficulty = difficulty
+        self.red_probability = red_probability
+        self.window_x = window_x
+        self.window_y = window_y
+        self.snake_speed = snake_speed
+        self.max_fruits = max_fruits
+        self.fruit_lifetime_ms = fruit_lifetime_ms
+        self.center_block_half = center_block_half
+        self.obstacle_count = obstacle_count
+        self.obstacle_w = obstacle_w
+        self.obstacle_h = obstacle_h
+        self.actions = actions
+        self.score = score
+        self.death = death
+
+    def __len__(self):
+        return len(self.actions)
+
+    @classmethod
+    def for_engine(cls, eng, actions=b''):
+        return cls(eng.seed, eng.difficulty, eng.red_probability, eng.window_x, eng.window_y, eng.snake_speed,
+                   eng.max_fruits, eng.fruit_lifetime_ms, eng.center_block_half, eng.obstacle_count,
+                   eng.obstacle_w, eng.obstacle_h, actions, eng.score, eng.death)
+
+    def make_engine(self) -> engine.SnakeEngine:
+        """按录像配置构造并开局的引擎，此时处于第 0 步。"""
+        eng = engine.SnakeEngine(self.window_x, self.window_y, self.difficulty, self.snake_speed,
+                                 self.red_probability, self.max_fruits, self.fruit_lifetime_ms,
+                                 self.center_block_half, self.obstacle_count, self.obstacle_w, self.obstacle_h)
+        eng.reset(self.seed)
+        return eng
+
+    def to_bytes(self) -> bytes:
+        header = HEADER.pack(MAGIC, VERSION, self.seed, (self.difficulty or '').encode('ascii'),
+                             self.red_probability, self.window_x, self.window_y, self.snake_speed,
+                             self.max_fruits, self.fruit_lifetime_ms, self.center_block_half,
+                             self.obstacle_count, self.obstacle_w, self.obstacle_h,
+                             len(self.actions), self.score, DEATH_CODES[self.death])
+        return header + bytes(self.actions)
+
+    @classmethod
+    def from_bytes(cls, data):
+        view = memoryview(data)
+        if len(view) < HEADER.size:
+            raise ReplayError('录像文件过短')
+        (magic, version, seed, difficulty, red_probability, window_x, window_y, snake_speed, max_fruits,
+         fruit_lifetime_ms, center_block_half, obstacle_count, obstacle_w, obstacle_h,
+         ticks, score, death) = HEADER.unpack_from(view)
+        if magic != MAGIC:
+            raise ReplayError('不是录像文件')
+        if version != VERSION:
+            raise ReplayError(f'不支持的录像版本 {version}')
+        actions = view[HEADER.size:HEADER.size + ticks]
+        if len(actions) != ticks or death >= len(DEATHS):
+            raise ReplayError('录像文件已损坏')
+        try:
+            difficulty = difficulty.rstrip(b'\0').decode('ascii') or None
+        except UnicodeDecodeError:
+            raise ReplayError('录像文件已损坏') from None
+        return cls(seed, difficulty, red_probability, window_x, window_y,
+                   snake_speed, max_fruits, fruit_lifetime_ms, center_block_half, obstacle_count, obstacle_w,
+                   obstacle_h, actions, score, DEATHS[death])
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.from_bytes(f.read())
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+
+class ReplayRecorder:
+    """录制当前局：engine.reset 之后调用 start()，每次 engine.step 前调用 record(action)。"""
+
+    def __init__(self, eng):
+        self.engine = eng
+        self.actions = bytearray()
+
+    def start(self):
+        self.actions.clear()
+
+    def record(self, action):
+        self.actions.append(ACTION_CODES.get(action, 0))
+
+    def finish(self) -> Replay:
+        return Replay.for_engine(self.engine, bytes(self.actions))
+
+
+def run(replay, until=None) -> engine.SnakeEngine:
+    """无界面全速重放到第 until 步（默认到结尾），返回引擎。"""
+    eng = replay.make_engine()
+    step = eng.step
+    for code in replay.actions[:until]:
+        if step(ACTIONS[code]) is not None:
+            break
+    return eng
+
+
+def verify(replay):
+    """重放整局，返回 (是否与录像声明一致, 重放出的分数, 步数, 死亡原因)。"""
+    eng = run(replay)
+    ok = eng.score == replay.score and eng.move_count == len(replay) and eng.death == replay.death
+    return ok, eng.score, eng.move_count, eng.death
+
+
+class ReplayPlayer:
+    """
+    可定位的回放：每 keyframe_every 步在经过时保存一次引擎局面（engine.get_state），
+    seek 到任意一步时从不晚于目标的最近关键帧恢复，再最多重放 keyframe_every - 1 步。
+    """
+
+    def __init__(self, replay, keyframe_every=KEYFRAME_EVERY):
+        self.replay = replay
+        self.engine = replay.make_engine()
+        self.keyframe_every = keyframe_every
+        self.keyframes = {0: self.engine.get_state()}
+        self.tick = 0
+
+    @property
+    def finished(self):
+        return self.tick >= len(self.replay) or self.engine.death is not None
+
+    def step(self):
+        if self.finished:
+            return False
+        self.engine.step(ACTIONS[self.replay.actions[self.tick]])
+        self.tick += 1
+        if self.tick % self.keyframe_every == 0 and self.tick not in self.keyframes:
+            self.keyframes[self.tick] = self.engine.get_state()
+        return True
+
+    def seek(self, tick):
+        tick = max(0, min(tick, len(self.replay)))
+        base = tick - tick % self.keyframe_every
+        while base not in self.keyframes:
+            base -= self.keyframe_every
+        # 目标在当前位置之后且不跨过更近的关键帧时直接向前推进
+        if not self.tick <= tick or self.tick < base:
+            self.engine.set_state(self.keyframes[base])
+            self.tick = base
+        while self.tick < tick and self.step():
+            pass
+
+    def build_keyframes(self):
+        """全速走完一遍以生成全部关键帧，之后任意位置的 seek 都是有界的。"""
+        tick = self.tick
+        while self.step():
+            pass
+        self.seek(tick)
+
+
+def play_window(replay, speed=1.0):
+    """在窗口中回放：↑/↓ 调整倍速，←/→ 后退/前进 5 秒，空格暂停，ESC 退出。"""
+    import os
+    import pygame
+    import fonts
+    import occupancy
+    from renderer import make_renderer
+
+    pygame.init()
+    pygame.display.set_caption('贪吃蛇 - 录像回放')
+    # 大棋盘的录像在默认窗口大小的视口中回放
+    window = pygame.display.set_mode((min(replay.window_x, engine.WINDOW_X), min(replay.window_y, engine.WINDOW_Y)))
+    font_path = fonts.find_chinese_font(os.path.dirname(os.path.abspath(__file__)))
+
+    def get_font(size, bold=False):
+        return fonts.load_font(font_path, size, bold)
+
+    player = ReplayPlayer(replay)
+    renderer = make_renderer(window, player.engine, {
+        occupancy.EMPTY: pygame.Color(0, 0, 0),
+        occupancy.BODY: pygame.Color(0, 255, 0),
+        occupancy.OBSTACLE: pygame.Color(255, 255, 0),
+        occupancy.FRUIT_WHITE: pygame.Color(255, 255, 255),
+        occupancy.FRUIT_RED: pygame.Color(255, 0, 0),
+    })
+    clock = pygame.time.Clock()
+    frame_rate = 60
+    seek_ticks = replay.snake_speed * 5
+    paused = False
+    budget = 0.0
+    while True:
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                pygame.quit()
+                return
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_SPACE:
+                    paused = not paused
+                elif event.key == pygame.K_UP:
+                    speed = min(speed * 2, 256)
+                elif event.key == pygame.K_DOWN:
+                    speed = max(speed / 2, 0.125)
+                elif event.key in (pygame.K_LEFT, pygame.K_RIGHT):
+                    delta = seek_ticks if event.key == pygame.K_RIGHT else -seek_ticks
+                    player.seek(player.tick + delta)
+                    renderer.invalidate()
+                    budget = 0.0
+
+        if not paused and not player.finished:
+            # 每帧按倍速累计应推进的步数，高倍速时一帧推进多步
+            budget += replay.snake_speed * speed / frame_rate
+            while budget >= 1 and player.step():
+                budget -= 1
+
+        eng = player.engine
+        status = '暂停' if paused else ('结束' if player.finished else f'x{speed:g}')
+        label = fonts.render_text(get_font, f'分数：{eng.score}  {player.tick}/{len(replay)}  {status}', 20,
+                                  pygame.Color(255, 255, 255))
+        rects = renderer.draw(label)
+        if rects is None:
+            pygame.display.update()
+        elif rects:
+            pygame.display.update(rects)
+        clock.tick(frame_rate)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='贪吃蛇录像校验与回放')
+    sub = parser.add_subparsers(dest='command', required=True)
+    p_verify = sub.add_parser('verify', help='无界面重放并核对录像声明的分数')
+    p_verify.add_argument('files', nargs='+')
+    p_play = sub.add_parser('play', help='在窗口中回放')
+    p_play.add_argument('file')
+    p_play.add_argument('--speed', type=float, default=1.0, help='回放倍速')
+    args = parser.parse_args(argv)
+
+    if args.command == 'play':
+        play_window(Replay.load(args.file), args.speed)
+        return 0
+    bad = 0
+    for path in args.files:
+        try:
+            replay = Replay.load(path)
+        except (OSError, ReplayError) as e:
+            print(f'{path}: {e}', file=sys.stderr)
+            bad += 1
+            continue
+        ok, score, ticks, death = verify(replay)
+        bad += not ok
+        print(f"{path}: {'OK' if ok else 'MISMATCH'} claimed={replay.score} replayed={score} "
+              f"ticks={ticks}/{len(replay)} death={death}")
+    return 1 if bad else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+# 蛇身环形缓冲：用 array('i') 保存打包后的格子下标（gy * grid_w + gx），头部压入、尾部弹出均为 O(1)
+from array import array
+
+
+class SnakeBody:
+    """
+    容量为 2 的幂的环形缓冲，从蛇头到蛇尾迭代。
+    缓冲满时容量翻倍（摊还 O(1)），正常游戏中只在蛇变长越过容量时发生。
+    """
+    __slots__ = ('buf', 'mask', 'head_pos', 'length')
+
+    def __init__(self, capacity: int = 64):
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.buf = array('i', bytes(4 * size))
+        self.mask = size - 1
+        self.head_pos = 0
+        self.length = 0
+
+    def clear(self):
+        self.head_pos = 0
+        self.length = 0
+
+    def __len__(self):
+        return self.length
+
+    def _grow(self):
+        cells = self.cells()
+        size = len(self.buf) * 2
+        self.buf = array('i', bytes(4 * size))
+        self.buf[:len(cells)] = cells
+        self.mask = size - 1
+        self.head_pos = 0
+
+    def push_head(self, idx: int):
+        if self.length == len(self.buf):
+            self._grow()
+        self.head_pos = (self.head_pos - 1) & self.mask
+        self.buf[self.head_pos] = idx
+        self.length += 1
+
+    def pop_tail(self) -> int:
+        self.length -= 1
+        return self.buf[(self.head_pos + self.length) & self.mask]
+
+    def head(self) -> int:
+        return self.buf[self.head_pos]
+
+    def tail(self) -> int:
+        return self.buf[(self.head_pos + self.length - 1) & self.mask]
+
+    def __getitem__(self, i: int) -> int:
+        if i < 0:
+            i += self.length
+        if not 0 <= i < self.length:
+            raise IndexError(i)
+        return self.buf[(self.head_pos + i) & self.mask]
+
+    def cells(self) -> array:
+        """从蛇头到蛇尾的连续拷贝（最多两次切片，供渲染与碰撞代码批量读取）。"""
+        end = self.head_pos + self.length
+        if end <= len(self.buf):
+            return self.buf[self.head_pos:end]
+        return self.buf[self.head_pos:] + self.buf[:end - len(self.buf)]
+
+    def __iter__(self):
+        return iter(self.cells())
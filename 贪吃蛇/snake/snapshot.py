@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+# 局面存档：struct 打包的定长头部 + 若干 array 数据段，保存 / 恢复整局状态（含随机数状态与果实已存在时间）
+#
+# 布局（小端）：HEADER | 随机数状态 625×u32 | 网格 cells | 空闲格 where | 空闲格 items | 蛇身 | 障碍物 | 果实格 | 果实年龄 | 果实类型
+# 读取时各数据段都是同一块缓冲上的 memoryview 切片，直接拷进引擎已有的数组，不经过中间对象。
+import struct
+import sys
+from array import array
+
+import engine
+from occupancy import FreeCells, FRUIT_WHITE, FRUIT_RED
+
+MAGIC = b'SNKS'
+VERSION = 1
+# 魔数、版本；配置：难度、RED_PROBABILITY、窗口宽高、蛇速、果实上限、果实寿命、安全区半径、障碍物数量与宽高；
+# 状态：种子、步数、当前毫秒、待生长、方向、分数、已吃果实、死亡原因、生成失败次数、蛇头像素坐标；
+# 随机数：gauss_next 是否存在及其值；各数据段长度：空闲格、蛇身、障碍物格、果实
+HEADER = struct.Struct('<4sH8sdHHHHIHHBB' 'QIIIBIIBIii' 'Bd' 'IIII')
+RNG_WORDS = 625
+
+DIRECTION_CODES = {d: i for i, d in enumerate(engine.DIRECTIONS)}
+DEATHS = (None, engine.DEATH_WALL, engine.DEATH_OBSTACLE, engine.DEATH_SELF)
+DEATH_CODES = {d: i for i, d in enumerate(DEATHS)}
+# 果实类型编码：0 白、1 红
+FRUIT_TYPE_TAGS = (FRUIT_WHITE, FRUIT_RED)
+
+_SWAP = sys.byteorder != 'little'
+
+
+class SnapshotError(ValueError):
+    pass
+
+
+def _pack(typecode, values):
+    arr = array(typecode, values)
+    if _SWAP:
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _view(buf, offset, count, typecode):
+    """buf 上从 offset 开始的 count 个元素；小端机器上为零拷贝的 memoryview。"""
+    size = array(typecode).itemsize
+    part = buf[offset:offset + count * size]
+    if len(part) != count * size:
+        raise SnapshotError('存档已截断')
+    if _SWAP:
+        arr = array(typecode, part.tobytes())
+        arr.byteswap()
+        return memoryview(arr), offset + count * size
+    return part.cast(typecode), offset + count * size
+
+
+def _array(typecode, view):
+    """从 memoryview 整块拷贝出 array（frombytes 为一次内存拷贝，不逐元素迭代）。"""
+    arr = array(typecode)
+    arr.frombytes(view.cast('B'))
+    return arr
+
+
+def _cells_in_range(view, num_cells):
+    return not len(view) or (min(view) >= 0 and max(view) < num_cells)
+
+
+def dumps(eng) -> bytes:
+    if eng.chunked:
+        # 存档格式按全盘保存网格与空闲格映射，分块的大棋盘不适用
+        raise SnapshotError('分块存储的大棋盘不支持存档')
+    grid = eng.grid
+    version, rng_words, gauss = eng.rng.getstate()
+    if version != 3 or len(rng_words) != RNG_WORDS:
+        raise SnapshotError('不支持的随机数状态')
+    body = eng.snake_body.cells()
+    obstacles = [eng.cell_of(o[0], o[1]) for o in eng.obstacles]
+    fruits = eng.fruits.items()
+    header = HEADER.pack(
+        MAGIC, VERSION, (eng.difficulty or '').encode('ascii'), eng.red_probability, eng.window_x, eng.window_y,
+        eng.snake_speed, eng.max_fruits, eng.fruit_lifetime_ms, eng.center_block_half,
+        eng.obstacle_count, eng.obstacle_w, eng.obstacle_h,
+        eng.seed, eng.move_count, eng.now_ms, eng.pending_growth, DIRECTION_CODES[eng.direction], eng.score,
+        eng.fruits_eaten, DEATH_CODES[eng.death], eng.spawn_failures, eng.snake_position[0], eng.snake_position[1],
+        gauss is not None, gauss or 0.0,
+        len(grid.free), len(body), len(obstacles), len(fruits))
+    return b''.join((
+        header,
+        _pack('I', rng_words),
+        bytes(grid.cells),
+        _pack('i', grid.free.where),
+        _pack('i', grid.free.items),
+        _pack('i', body),
+        _pack('i', obstacles),
+        _pack('i', [idx for idx, _, _ in fruits]),
+        _pack('i', [eng.now_ms - spawn_time for _, _, spawn_time in fruits]),
+        bytes(FRUIT_TYPE_TAGS.index(tag) for _, tag, _ in fruits),
+    ))
+
+
+def _unpack_header(view):
+    if len(view) < HEADER.size:
+        raise SnapshotError('存档过短')
+    fields = HEADER.unpack_from(view)
+    if fields[0] != MAGIC:
+        raise SnapshotError('不是存档文件')
+    if fields[1] != VERSION:
+        raise SnapshotError(f'不支持的存档版本 {fields[1]}')
+    return fields
+
+
+def _difficulty(raw):
+    try:
+        name = raw.rstrip(b'\0').decode('ascii') or None
+    except UnicodeDecodeError:
+        raise SnapshotError('存档已损坏') from None
+    if name is not None and name not in engine.DIFFICULTIES:
+        raise SnapshotError('存档已损坏')
+    return name
+
+
+def make_engine(data) -> engine.SnakeEngine:
+    """按存档中的配置构造引擎并恢复局面。"""
+    (_, _, difficulty, red_probability, window_x, window_y, snake_speed, max_fruits, fruit_lifetime_ms,
+     center_block_half, obstacle_count, obstacle_w, obstacle_h) = _unpack_header(memoryview(data))[:13]
+    eng = engine.SnakeEngine(window_x, window_y, _difficulty(difficulty), snake_speed,
+                             red_probability, max_fruits, fruit_lifetime_ms, center_block_half,
+                             obstacle_count, obstacle_w, obstacle_h)
+    return load_into(eng, data)
+
+
+def load_into(eng, data) -> engine.SnakeEngine:
+    """
+    把存档恢复到已有的引擎上（棋盘尺寸必须一致）。复用引擎自身的网格、空闲格与蛇身数组，
+    批量恢复多个存档时不需要重新构造引擎。渲染器需要整屏重画。
+    """
+    view = memoryview(data)
+    (_, _, difficulty, red_probability, window_x, window_y, snake_speed, max_fruits, fruit_lifetime_ms,
+     center_block_half, obstacle_count, obstacle_w, obstacle_h,
+     seed, move_count, now_ms, pending_growth, direction, score, fruits_eaten, death, spawn_failures, head_x, head_y,
+     has_gauss, gauss, free_len, body_len, obstacle_len, fruit_len) = _unpack_header(view)
+    if (window_x, window_y) != (eng.window_x, eng.window_y) or center_block_half != eng.center_block_half:
+        raise SnapshotError('存档的棋盘尺寸与引擎不一致')
+    if eng.chunked:
+        raise SnapshotError('分块存储的大棋盘不支持存档')
+    difficulty = _difficulty(difficulty)
+    num_cells = eng.grid_w * eng.grid_h
+    if (direction >= len(engine.DIRECTIONS) or death >= len(DEATHS) or snake_speed == 0
+            or max(free_len, body_len, obstacle_len, fruit_len) > num_cells):
+        raise SnapshotError('存档已损坏')
+    offset = HEADER.size
+    rng_words, offset = _view(view, offset, RNG_WORDS, 'I')
+    cells, offset = _view(view, offset, num_cells, 'B')
+    where, offset = _view(view, offset, num_cells, 'i')
+    items, offset = _view(view, offset, free_len, 'i')
+    body, offset = _view(view, offset, body_len, 'i')
+    obstacles, offset = _view(view, offset, obstacle_len, 'i')
+    fruit_cells, offset = _view(view, offset, fruit_len, 'i')
+    fruit_ages, offset = _view(view, offset, fruit_len, 'i')
+    fruit_types, offset = _view(view, offset, fruit_len, 'B')
+    if any(t >= len(FRUIT_TYPE_TAGS) for t in fruit_types) or rng_words[-1] > RNG_WORDS - 1:
+        raise SnapshotError('存档已损坏')
+    # 格子下标越界时在修改引擎之前报错，而不是在恢复途中抛出 IndexError
+    if not all(_cells_in_range(part, num_cells) for part in (items, body, obstacles, fruit_cells)):
+        raise SnapshotError('存档已损坏')
+
+    eng.difficulty = difficulty
+    eng.red_probability = red_probability
+    eng.snake_speed = snake_speed
+    eng.max_fruits = max_fruits
+    eng.fruit_lifetime_ms = fruit_lifetime_ms
+    eng.obstacle_count, eng.obstacle_w, eng.obstacle_h = obstacle_count, obstacle_w, obstacle_h
+    eng.seed = seed
+    eng.move_count = move_count
+    eng.now_ms = now_ms
+    eng.pending_growth = pending_growth
+    eng.direction = engine.DIRECTIONS[direction]
+    eng.score = score
+    eng.fruits_eaten = fruits_eaten
+    eng.death = DEATHS[death]
+    eng.spawn_failures = spawn_failures
+    eng.snake_position = [head_x, head_y]
+    eng.rng.setstate((3, tuple(rng_words), gauss if has_gauss else None))
+
+    grid = eng.grid
+    grid.cells[:] = cells
+    free = FreeCells(0)
+    free.where = _array('i', where)
+    free.items = _array('i', items)
+    grid.free = free
+    snake_body = eng.snake_body
+    snake_body.clear()
+    while len(snake_body.buf) < body_len:
+        snake_body._grow()
+    # 蛇身从缓冲起点连续存放：head_pos = 0，与 push_head 逐个压入的结果等价
+    memoryview(snake_body.buf)[:body_len] = body
+    snake_body.length = body_len
+    grid_w = eng.grid_w
+    cell = engine.CELL
+    eng.obstacles = [[idx % grid_w * cell, idx // grid_w * cell] for idx in obstacles]
+    eng.fruits.restore([(idx, FRUIT_TYPE_TAGS[t], now_ms - age) for idx, age, t in zip(fruit_cells, fruit_ages, fruit_types)])
+    return eng
+
+
+def save(eng, path):
+    data = dumps(eng)
+    with open(path, 'wb') as f:
+        f.write(data)
+    return len(data)
+
+
+def load(path, eng=None) -> engine.SnakeEngine:
+    """
+    读取存档文件并解析；给出 eng 时恢复到该引擎上。整个文件先读进 bytes 再解析，
+    解析出错时不会留下仍引用文件映射的切片；空文件与截断的文件抛出 SnapshotError。
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    return load_into(eng, data) if eng is not None else make_engine(data)
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+# 批量对局与参数扫描：多进程运行无界面对局，统计不同难度参数下的分数分布
+#
+# 用法示例：
+#   python sweep.py --games 2000 --difficulty easy normal hard --max-fruits 10 20 --out sweep.csv
+#   python sweep.py --policy mybot:policy --obstacles 4 6 8 --obstacle-size 2x2 3x3
+#   python sweep.py --difficulty hard --speed 30 40 50 --red-probability 0.1 0.2 0.4
+import argparse
+import csv
+import importlib
+import itertools
+import os
+import sys
+from array import array
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import engine
+from occupancy import BODY, OBSTACLE
+
+CSV_FIELDS = ['difficulty', 'snake_speed', 'red_probability', 'max_fruits', 'fruit_lifetime_ms',
+              'obstacle_count', 'obstacle_w', 'obstacle_h', 'games',
+              'score_mean', 'score_p10', 'score_p50', 'score_p90', 'score_p99', 'score_max',
+              'ticks_mean', 'ticks_p50', 'ticks_p90',
+              'death_wall', 'death_obstacle', 'death_self', 'death_timeout', 'spawn_failures']
+
+
+def greedy_policy(eng):
+    """脚本策略：在不立即撞死的方向中选离最近果实曼哈顿距离最小的一个。"""
+    grid = eng.grid
+    cells = grid.cells
+    hx, hy = eng.snake_position[0] // engine.CELL, eng.snake_position[1] // engine.CELL
+    targets = [(idx % grid.width, idx // grid.width) for idx in eng.fruits.cells()]
+    best, best_dist = None, None
+    for d in engine.DIRECTIONS:
+        if d == engine.OPPOSITE[eng.direction]:
+            continue
+        dx, dy = engine.STEP[d]
+        nx, ny = hx + dx // engine.CELL, hy + dy // engine.CELL
+        if not grid.in_bounds(nx, ny):
+            continue
+        tag = cells[ny * grid.width + nx]
+        if tag == BODY or tag == OBSTACLE:
+            continue
+        dist = min((abs(nx - tx) + abs(ny - ty) for tx, ty in targets), default=0)
+        if best_dist is None or dist < best_dist:
+            best, best_dist = d, dist
+    return best
+
+
+def load_policy(spec):
+    """'module:function' 形式的策略；function(engine) 每步返回方向或 None。"""
+    if spec in (None, '', 'greedy'):
+        return greedy_policy
+    module_name, _, attr = spec.partition(':')
+    return getattr(importlib.import_module(module_name), attr or 'policy')
+
+
+def run_games(config, seeds, policy_spec, max_ticks):
+    """
+    工作进程入口：按给定种子逐局运行，只返回逐局汇总（分数与存活步数的紧凑数组、死亡原因计数），
+    不回传任何逐帧数据。
+    """
+    policy = load_policy(policy_spec)
+    eng = engine.SnakeEngine(difficulty=config['difficulty'], snake_speed=config['snake_speed'],
+                             red_probability=config['red_probability'], max_fruits=config['max_fruits'],
+                             fruit_lifetime_ms=config['fruit_lifetime_ms'],
+                             obstacle_count=config['obstacle_count'],
+                             obstacle_w=config['obstacle_w'], obstacle_h=config['obstacle_h'])
+    scores = array('i')
+    ticks = array('i')
+    deaths = Counter()
+    spawn_failures = 0
+    for seed in seeds:
+        eng.reset(seed)
+        death = None
+        while death is None and eng.move_count < max_ticks:
+            death = eng.step(policy(eng))
+        scores.append(eng.score)
+        ticks.append(eng.move_count)
+        deaths[death or 'timeout'] += 1
+        spawn_failures += eng.spawn_failures
+    return scores.tobytes(), ticks.tobytes(), dict(deaths), spawn_failures
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0
+    k = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+def summarize(config, scores, ticks, deaths, spawn_failures):
+    scores = sorted(scores)
+    ticks = sorted(ticks)
+    n = len(scores)
+    row = dict(config)
+    row.update({
+        'games': n,
+        'score_mean': round(sum(scores) / n, 2) if n else 0,
+        'score_p10': percentile(scores, 10),
+        'score_p50': percentile(scores, 50),
+        'score_p90': percentile(scores, 90),
+        'score_p99': percentile(scores, 99),
+        'score_max': scores[-1] if n else 0,
+        'ticks_mean': round(sum(ticks) / n, 2) if n else 0,
+        'ticks_p50': percentile(ticks, 50),
+        'ticks_p90': percentile(ticks, 90),
+        'death_wall': deaths.get(engine.DEATH_WALL, 0),
+        'death_obstacle': deaths.get(engine.DEATH_OBSTACLE, 0),
+        'death_self': deaths.get(engine.DEATH_SELF, 0),
+        'death_timeout': deaths.get('timeout', 0),
+        'spawn_failures': spawn_failures,
+    })
+    return row
+
+
+def parse_size(text):
+    w, _, h = text.lower().partition('x')
+    return int(w), int(h or w)
+
+
+def build_configs(args):
+    """
+    难度 × 速度 × 红果概率 × 果实上限 × 果实寿命 ×（仅困难模式）障碍物数量 × 障碍物尺寸。
+    未指定速度或红果概率时取各难度的预设值。
+    简单与普通模式不生成障碍物，只各取一组，障碍物字段记为 0，避免同一配置按障碍物组合重复计入。
+    """
+    configs = []
+    for diff in args.difficulty:
+        preset_speed, preset_red = engine.DIFFICULTIES[diff]
+        speeds = args.speed or [preset_speed]
+        reds = args.red_probability or [preset_red]
+        obstacles = itertools.product(args.obstacles, args.obstacle_size) if diff == 'hard' else [(0, (0, 0))]
+        for speed, red, max_fruits, lifetime, (count, (w, h)) in itertools.product(
+                speeds, reds, args.max_fruits, args.lifetime, obstacles):
+            configs.append({
+                'difficulty': diff,
+                'snake_speed': speed,
+                'red_probability': red,
+                'max_fruits': max_fruits,
+                'fruit_lifetime_ms': lifetime,
+                'obstacle_count': count,
+                'obstacle_w': w,
+                'obstacle_h': h,
+            })
+    return configs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='多进程无界面对局与难度参数扫描')
+    parser.add_argument('--games', type=int, default=1000, help='每组参数的对局数')
+    parser.add_argument('--seed', type=int, default=0, help='基准种子；第 i 局使用 seed + i，各组参数共用同一批种子')
+    parser.add_argument('--difficulty', nargs='+', default=list(engine.DIFFICULTIES), choices=list(engine.DIFFICULTIES))
+    parser.add_argument('--speed', nargs='+', type=int, default=None, help='蛇速（步/秒），默认取各难度的预设值')
+    parser.add_argument('--red-probability', nargs='+', type=float, default=None,
+                        help='红色果实概率，默认取各难度的预设值')
+    parser.add_argument('--max-fruits', nargs='+', type=int, default=[engine.MAX_FRUITS])
+    parser.add_argument('--lifetime', nargs='+', type=int, default=[engine.FRUIT_LIFETIME_MS], help='果实存活时间（毫秒）')
+    parser.add_argument('--obstacles', nargs='+', type=int, default=[engine.OBSTACLE_COUNT], help='困难模式障碍物数量')
+    parser.add_argument('--obstacle-size', nargs='+', type=parse_size, default=[(engine.OBSTACLE_W, engine.OBSTACLE_H)],
+                        help='障碍物尺寸，如 3x3')
+    parser.add_argument('--policy', default='greedy', help="策略，'greedy' 或 'module:function'")
+    parser.add_argument('--max-ticks', type=int, default=20000, help='单局步数上限，超出记为 timeout')
+    parser.add_argument('--chunk', type=int, default=100, help='每个任务包含的对局数')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--out', default='sweep.csv', help='汇总结果 CSV 路径')
+    args = parser.parse_args(argv)
+
+    configs = build_configs(args)
+    seeds = list(range(args.seed, args.seed + args.games))
+    chunks = [seeds[i:i + args.chunk] for i in range(0, len(seeds), args.chunk)]
+    pending = {i: len(chunks) for i in range(len(configs))}
+    results = {i: (array('i'), array('i'), Counter(), [0]) for i in range(len(configs))}
+
+    with open(args.out, 'w', newline='', encoding='utf-8') as out, \
+            ProcessPoolExecutor(max_workers=args.workers) as pool:
+        writer = csv.DictWriter(out, fieldnames=CSV_FIELDS)
+        writer.writeheader()
+        futures = {pool.submit(run_games, configs[i], chunk, args.policy, args.max_ticks): i
+                   for i in range(len(configs)) for chunk in chunks}
+        for fut in as_completed(futures):
+            i = futures[fut]
+            score_bytes, tick_bytes, deaths, failures = fut.result()
+            scores, ticks, death_counts, spawn_failures = results[i]
+            scores.frombytes(score_bytes)
+            ticks.frombytes(tick_bytes)
+            death_counts.update(deaths)
+            spawn_failures[0] += failures
+            pending[i] -= 1
+            if pending[i] == 0:
+                # 一组参数全部完成即写出一行，避免结果积压在内存中
+                row = summarize(configs[i], scores, ticks, death_counts, spawn_failures[0])
+                writer.writerow(row)
+                out.flush()
+                del results[i]
+                print(f"{row['difficulty']:>6} fruits={row['max_fruits']} life={row['fruit_lifetime_ms']} "
+                      f"obst={row['obstacle_count']}@{row['obstacle_w']}x{row['obstacle_h']}: "
+                      f"p50={row['score_p50']} p90={row['score_p90']} ticks={row['ticks_p50']}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
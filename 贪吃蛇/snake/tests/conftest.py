@@ -0,0 +1,6 @@
+# -*- coding: utf-8 -*-
+# 游戏模块按同目录平铺导入（import engine），测试时把 snake 目录加入导入路径
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
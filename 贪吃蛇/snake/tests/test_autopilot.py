@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import autopilot
+import engine
+
+MAX_TICKS = 1500
+
+
+def make_engine(difficulty='hard', **kwargs):
+    speed, red_probability = engine.DIFFICULTIES[difficulty]
+    return engine.SnakeEngine(difficulty=difficulty, snake_speed=speed, red_probability=red_probability, **kwargs)
+
+
+def play(eng, pilot, seed, each_tick=None):
+    eng.reset(seed)
+    while eng.death is None and eng.move_count < MAX_TICKS:
+        eng.step(pilot())
+        if each_tick is not None:
+            each_tick()
+    return eng.score, eng.move_count
+
+
+@pytest.mark.parametrize('seed', range(3))
+def test_incremental_field_matches_rebuild(seed):
+    eng = make_engine(window_x=360, window_y=240)
+    pilot = autopilot.Autopilot(eng)
+    field = pilot.field
+
+    def check():
+        # sync 与 target 之后的增量结果应与按同一通行性、同一源点整体重建的结果一致
+        if not field.ready:
+            return
+        fresh = autopilot.DistanceField(field.width, field.height)
+        fresh.passable[:] = field.passable
+        fresh.sources = set(field.sources)
+        fresh.rebuild()
+        assert field.dist == fresh.dist
+        for src, basin in field.basins.items():
+            assert all(field.owner[idx] == src for idx in basin)
+        assert sum(len(basin) for basin in field.basins.values()) == sum(o >= 0 for o in field.owner)
+
+    play(eng, pilot, seed, check)
+    assert field.rebuilds < eng.move_count
+
+
+def test_same_seed_same_game():
+    results = []
+    for _ in range(2):
+        eng = make_engine()
+        results.append(play(eng, autopilot.Autopilot(eng), 7))
+    assert results[0] == results[1]
+
+
+def test_budget_cuts_flood_short():
+    eng = make_engine()
+    pilot = autopilot.Autopilot(eng, budget=1)
+    play(eng, pilot, 0)
+    # 只有最后无路可走的那一步不做任何处理
+    assert pilot.overruns >= pilot.decisions - 1
+
+
+def test_ignored_pruned_on_chunked_board():
+    eng = make_engine(chunked=True, fruit_lifetime_ms=1500)
+    pilot = autopilot.Autopilot(eng)
+    seen = set()
+
+    def check():
+        seen.update(pilot.ignored.items())
+        # 剪枝后只剩仍在棋盘上的同一个果实
+        pilot.prune_ignored()
+        assert all(eng.fruits.expires_at(idx) == expiry for idx, expiry in pilot.ignored.items())
+        assert len(pilot.ignored) <= len(eng.fruits)
+
+    play(eng, pilot, 3, check)
+    assert pilot.field is None
+    assert len(seen) > eng.max_fruits
+
+
+def test_large_board_spreads_rebuild():
+    eng = make_engine(window_x=6000, window_y=4000)
+    pilot = autopilot.Autopilot(eng)
+    field = pilot.field
+    eng.reset(0)
+    works = []
+    while True:
+        action = pilot()
+        if field.ready:
+            break
+        # 重建未完成时按曼哈顿距离选果实，每步的处理量不超过预算
+        works.append(pilot.last_work)
+        eng.step(action)
+        assert eng.death is None
+    assert len(works) >= eng.grid_w * eng.grid_h // pilot.budget
+    assert max(works) <= pilot.budget
+    fresh = autopilot.DistanceField(field.width, field.height)
+    fresh.passable[:] = field.passable
+    fresh.sources = set(field.sources)
+    fresh.rebuild()
+    assert field.dist == fresh.dist
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+from collections import Counter
+
+import pytest
+
+import engine
+from inputbuffer import TurnBuffer
+from occupancy import EMPTY, BODY, OBSTACLE, FRUIT_WHITE, FRUIT_RED
+from sweep import greedy_policy
+
+SEEDS = range(8)
+MAX_TICKS = 3000
+
+
+def check_invariants(eng):
+    """网格、蛇身、果实表、障碍物列表与空闲格集合互相一致。"""
+    grid = eng.grid
+    body = list(eng.snake_body.cells())
+    assert len(set(body)) == len(body)
+    assert all(grid.cells[idx] == BODY for idx in body)
+    counts = Counter(grid.cells)
+    assert counts[BODY] == len(body)
+    assert counts[OBSTACLE] == len(eng.obstacles)
+    fruits = eng.fruits.cells()
+    assert len(fruits) == len(eng.fruits) == counts[FRUIT_WHITE] + counts[FRUIT_RED]
+    assert all(grid.cells[idx] == eng.fruits.tag_at(idx) for idx in fruits)
+    free = {idx for idx in range(len(grid.cells)) if grid.spawnable[idx] and grid.cells[idx] == EMPTY}
+    assert set(grid.free.items) == free and len(grid.free) == len(free)
+    if eng.death is None:
+        assert eng.cell_of(*eng.snake_position) == body[0]
+
+
+def play(eng, seed, policy=greedy_policy, check=False):
+    eng.reset(seed)
+    trace = []
+    while eng.death is None and eng.move_count < MAX_TICKS:
+        before = (eng.score, eng.snake_body.length, eng.pending_growth)
+        action = policy(eng)
+        death = eng.step(action)
+        trace.append(action)
+        if check:
+            check_invariants(eng)
+            if eng.score > before[0]:
+                # 吃到果实的这一步蛇头进入果实格，不可能同时判定死亡
+                assert death is None
+                assert eng.snake_body.length == before[1] + 1
+    return trace
+
+
+@pytest.mark.parametrize('difficulty', list(engine.DIFFICULTIES))
+def test_step_invariants(difficulty):
+    eng = engine.SnakeEngine(difficulty=difficulty)
+    eaten = 0
+    for seed in SEEDS:
+        play(eng, seed, check=True)
+        eaten += eng.fruits_eaten
+    assert eaten > 0
+
+
+def test_same_seed_same_game():
+    a = engine.SnakeEngine(difficulty='hard')
+    b = engine.SnakeEngine(difficulty='hard')
+    for seed in SEEDS:
+        trace = play(a, seed)
+        b.reset(seed)
+        for action in trace:
+            b.step(action)
+        assert (b.score, b.move_count, b.death, bytes(b.grid.cells)) == (a.score, a.move_count, a.death, bytes(a.grid.cells))
+
+
+def test_state_round_trip_continues_identically():
+    eng = engine.SnakeEngine(difficulty='hard')
+    eng.reset(3)
+    for _ in range(100):
+        eng.step(greedy_policy(eng))
+    state = eng.get_state()
+    first = play_on(eng, 200)
+    eng.set_state(state)
+    check_invariants(eng)
+    assert play_on(eng, 200) == first
+
+
+def play_on(eng, ticks):
+    for _ in range(ticks):
+        if eng.step(greedy_policy(eng)) is not None:
+            break
+    return eng.score, eng.move_count, eng.death, bytes(eng.grid.cells)
+
+
+def test_wall_death_and_reverse_ignored():
+    eng = engine.SnakeEngine()
+    eng.reset(0)
+    # 反向输入被忽略，蛇继续向右直到撞墙
+    death = None
+    while death is None:
+        death = eng.step('LEFT')
+    assert death == engine.DEATH_WALL
+    assert eng.direction == 'RIGHT'
+    # 死亡后继续推进不改变局面
+    assert eng.step('UP') == engine.DEATH_WALL
+
+
+def test_hit_self_when_turning_into_body():
+    eng = engine.SnakeEngine(max_fruits=0)
+    eng.reset(0)
+    eng.pending_growth = 4
+    for action in ('RIGHT', 'RIGHT', 'UP', 'LEFT'):
+        assert eng.step(action) is None
+    assert eng.step('DOWN') == engine.DEATH_SELF
+
+
+def test_turn_buffer_queues_corner_turns():
+    turns = TurnBuffer()
+    assert turns.push('UP', 'RIGHT')
+    assert turns.push('LEFT', 'RIGHT')
+    # 与上一个排队方向相同或相反的按键被丢弃
+    assert not turns.push('RIGHT', 'RIGHT')
+    assert not turns.push('LEFT', 'RIGHT')
+    assert turns.pop('RIGHT') == 'UP'
+    assert turns.pop('UP') == 'LEFT'
+    assert turns.pop('LEFT') is None
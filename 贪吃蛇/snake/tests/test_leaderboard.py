@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+import leaderboard
+
+BACKENDS = [('log', '.jsonl'), ('sqlite', '.db')]
+
+
+@pytest.fixture(params=BACKENDS, ids=[b for b, _ in BACKENDS])
+def board(request, tmp_path):
+    backend, ext = request.param
+    path = str(tmp_path / ('leaderboard' + ext))
+    leaderboard.configure(path, size=10, backend=backend)
+    yield path, backend
+    leaderboard.configure(None)
+
+
+def fill(n, seed=0):
+    rng = random.Random(seed)
+    scores = []
+    for _ in range(n):
+        score, diff = rng.randrange(0, 2000, 10), rng.choice(('easy', 'normal', 'hard'))
+        leaderboard.add_score(score, diff)
+        scores.append((score, diff))
+    return scores
+
+
+def test_rank_and_percentile_match_brute_force(board):
+    scores = fill(300)
+    for probe in (0, 10, 500, 1230, 1990, 5000):
+        for diff in (None, 'easy', 'hard'):
+            values = [s for s, d in scores if diff is None or d == diff]
+            assert leaderboard.rank_of(probe, diff) == sum(1 for s in values if s > probe) + 1
+            expected = 100.0 * sum(1 for s in values if s <= probe) / len(values)
+            assert leaderboard.percentile(probe, diff) == pytest.approx(expected)
+    assert leaderboard.count() == 300
+    assert leaderboard.count('easy') == sum(1 for _, d in scores if d == 'easy')
+
+
+def test_pages_are_sorted_and_contiguous(board):
+    scores = fill(120)
+    ordered = sorted((s for s, _ in scores), reverse=True)
+    got = []
+    for offset in range(0, 130, 25):
+        got += [e['score'] for e in leaderboard.page(offset, 25)]
+    assert got == ordered
+    hard = sorted((s for s, d in scores if d == 'hard'), reverse=True)
+    assert [e['score'] for e in leaderboard.page(5, 10, 'hard')] == hard[5:15]
+
+
+def test_add_score_returns_rank(board):
+    fill(50)
+    top = leaderboard.load_leaderboard()[0]['score']
+    assert leaderboard.add_score(top + 10, 'easy') == 0
+    assert leaderboard.add_score_to_leaderboard(top + 10, 'easy') == 1
+    # 同分时先到的排在前面；排不进前 LEADERBOARD_SIZE 时返回 None
+    assert leaderboard.add_score_to_leaderboard(-10, 'easy') is None
+
+
+def test_rank_index_survives_reopen(board):
+    path, backend = board
+    fill(80)
+    before = [leaderboard.rank_of(s) for s in range(0, 2000, 130)]
+    leaderboard.configure(path, size=10, backend=backend)
+    assert [leaderboard.rank_of(s) for s in range(0, 2000, 130)] == before
+    assert leaderboard.count() == 80
+
+
+def test_log_compaction_crash_does_not_duplicate(tmp_path, monkeypatch):
+    path = str(tmp_path / 'leaderboard.jsonl')
+    leaderboard.configure(path, backend='log')
+    fill(leaderboard.LOG_COMPACT_EVERY - 1)
+
+    def crash(self):
+        raise OSError('模拟在写完快照、清空日志之前崩溃')
+    monkeypatch.setattr(leaderboard.LogBackend, '_truncate_log', crash)
+    with pytest.raises(OSError):
+        leaderboard.add_score(100, 'easy')
+    monkeypatch.undo()
+    leaderboard.configure(path, backend='log')
+    try:
+        assert leaderboard.count() == leaderboard.LOG_COMPACT_EVERY
+        leaderboard.add_score(200, 'easy')
+        leaderboard.configure(path, backend='log')
+        assert leaderboard.count() == leaderboard.LOG_COMPACT_EVERY + 1
+    finally:
+        leaderboard.configure(None)
+
+
+def test_failed_backend_write_leaves_index_unchanged(board, monkeypatch):
+    fill(40)
+    before = (leaderboard.count(), leaderboard.rank_of(500), leaderboard.percentile(500))
+
+    def fail(self, entry):
+        raise OSError('磁盘已满')
+    monkeypatch.setattr(type(leaderboard._backend), 'add', fail)
+    with pytest.raises(OSError):
+        leaderboard.add_score(1000, 'easy')
+    monkeypatch.undo()
+    assert (leaderboard.count(), leaderboard.rank_of(500), leaderboard.percentile(500)) == before
+    assert leaderboard.add_score(5000, 'easy') == 0
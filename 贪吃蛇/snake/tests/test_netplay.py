@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import socket
+
+import netplay
+from autopilot import Autopilot
+
+BOARD = (40, 30)
+
+
+def make_server(**kwargs):
+    eng = netplay.make_engine('hard', BOARD)
+    eng.reset(1)
+    return netplay.GameServer(eng, pilot=Autopilot(eng), **kwargs)
+
+
+async def wait_for(condition, timeout=5.0):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while not condition():
+        assert loop.time() < deadline, '等待超时'
+        await asyncio.sleep(0.005)
+
+
+async def follow(conn, kinds):
+    try:
+        while True:
+            kinds.append(await conn.recv())
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+
+
+def in_sync(server, conn):
+    return conn.game.tick == server.tick and conn.game.grid.occupied() == server.engine.grid.occupied()
+
+
+def test_clients_follow_deltas_on_loopback():
+    async def scenario():
+        server = make_server()
+        port = await server.start(port=0)
+        conns = [await netplay.AsyncClient.connect('127.0.0.1', port) for _ in range(3)]
+        kinds = [[] for _ in conns]
+        tasks = [asyncio.create_task(follow(c, k)) for c, k in zip(conns, kinds)]
+        await wait_for(lambda: len(server.clients) == len(conns))
+        try:
+            for _ in range(150):
+                server.step()
+                await asyncio.sleep(0)
+                # 每步都核对，覆盖蛇头、蛇尾、果实生成与过期的增量
+                await wait_for(lambda: all(c.game.tick == server.tick for c in conns))
+                assert all(c.game.grid.occupied() == server.engine.grid.occupied() for c in conns)
+                assert all(c.game.score == server.engine.score for c in conns)
+        finally:
+            for c in conns:
+                await c.close()
+            for t in tasks:
+                t.cancel()
+            await server.close()
+        assert server.resyncs == 0
+        assert all(k.count(netplay.MSG_DELTA) >= 140 for k in kinds)
+    asyncio.run(scenario())
+
+
+def test_stalled_client_is_resynced_with_keyframe():
+    async def scenario():
+        server = make_server(queue_size=8)
+        port = await server.start(port=0)
+        fast = await netplay.AsyncClient.connect('127.0.0.1', port)
+        slow = await netplay.AsyncClient.connect('127.0.0.1', port)
+        fast_kinds, slow_kinds = [], []
+        fast_task = asyncio.create_task(follow(fast, fast_kinds))
+        slow_task = None
+        await wait_for(lambda: len(server.clients) == 2)
+        # 慢客户端不再读取：缩小两端的内核缓冲，填满后服务器端的队列很快开始积压
+        slow.writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        for client in server.clients:
+            client.writer.get_extra_info('socket').setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+        slow.writer.transport.pause_reading()
+        try:
+            for _ in range(20000):
+                server.step()
+                await asyncio.sleep(0)
+                if server.resyncs:
+                    break
+            assert server.resyncs > 0
+            for _ in range(20):
+                server.step()
+                await asyncio.sleep(0)
+            slow.writer.transport.resume_reading()
+            slow_task = asyncio.create_task(follow(slow, slow_kinds))
+            await wait_for(lambda: in_sync(server, fast) and in_sync(server, slow))
+        finally:
+            await fast.close()
+            await slow.close()
+            fast_task.cancel()
+            if slow_task is not None:
+                slow_task.cancel()
+            await server.close()
+        assert netplay.MSG_KEYFRAME in slow_kinds
+        assert slow.frames < fast.frames
+    asyncio.run(scenario())
+
+
+def test_overflow_keeps_unsent_config():
+    server = make_server(queue_size=4)
+    client = netplay._Client(None, netplay.ROLE_SPECTATOR)
+    config = netplay.encode_config(*BOARD, server.engine.snake_speed)
+    client.queue.extend((config, server.keyframe()))
+    server.clients.add(client)
+    for _ in range(10):
+        server.step()
+    assert server.resyncs > 0
+    assert client.queue[0] == config
+    game = netplay._parse_config(client.queue[0][netplay.FRAME.size:])
+    for data in list(client.queue)[1:]:
+        game.apply(data[netplay.FRAME.size:])
+    assert game.grid.occupied() == server.engine.grid.occupied()
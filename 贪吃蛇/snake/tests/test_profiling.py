@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import json
+import threading
+import time
+
+import profiling
+
+
+def test_nested_wrapped_calls_count_once():
+    prof = profiling.Profiler()
+    inner = prof.wrap(lambda: None, 'inner')
+    outer = prof.wrap(lambda: inner(), 'outer')
+    prof.begin_frame()
+    outer()
+    inner()
+    prof.begin_frame()
+    spans = prof.main_track.recent()
+    # 外层里的 inner 只作为子区间记录，不计入 inner 阶段的帧内累计
+    nested = [dur for pid, _, dur, parent in spans if pid == prof.ids['inner'] and parent == prof.ids['outer']]
+    direct = [dur for pid, _, dur, parent in spans if pid == prof.ids['inner'] and parent < 0]
+    assert len(nested) == len(direct) == 1
+    assert prof.per_phase[prof.ids['inner']][0] == direct[0]
+
+
+def test_other_threads_do_not_charge_frame(tmp_path):
+    prof = profiling.Profiler()
+    work = prof.wrap(lambda: None, 'work')
+    prof.begin_frame()
+    worker = threading.Thread(target=lambda: [work() for _ in range(3)], name='writer')
+    worker.start()
+    worker.join()
+    prof.begin_frame()
+    assert prof.per_phase[prof.ids['work']][0] == 0
+    assert len(prof.tracks) == 2 and prof.tracks[1].ev_count == 3
+
+    path = tmp_path / 'trace.json'
+    prof.export(str(path))
+    events = json.loads(path.read_text(encoding='utf-8'))['traceEvents']
+    names = {e['tid']: e['args']['name'] for e in events if e['ph'] == 'M'}
+    assert names[prof.tracks[1].tid] == 'writer'
+    assert sum(1 for e in events if e['name'] == 'work' and e['tid'] == prof.tracks[1].tid) == 3
+
+
+def test_frame_phase_columns_add_up_to_total(tmp_path):
+    prof = profiling.Profiler()
+    work = prof.wrap(lambda: time.sleep(0.002), 'work')
+    t = prof.begin_frame()
+    for _ in range(3):
+        for pid in range(len(profiling.FRAME_PHASES)):
+            if pid == profiling.TICK:
+                work()
+            t = prof.span(pid, t)
+        t = prof.begin_frame()
+    path = tmp_path / 'frames.csv'
+    prof.export(str(path))
+    header, *rows = path.read_text(encoding='utf-8').splitlines()
+    names = header.split(',')
+    assert names[3:3 + len(profiling.FRAME_PHASES)] == list(profiling.FRAME_PHASES)
+    for row in rows:
+        values = dict(zip(names, map(int, row.split(','))))
+        phases = sum(values[name] for name in names[3:])
+        # 被包装调用只计入自己的列，不再同时计入 tick
+        assert values['work'] >= 2_000_000 > values['tick']
+        assert 0 <= values['total_ns'] - phases < 1_000_000
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import engine
+import replay
+from replay import Replay, ReplayError, ReplayPlayer, ReplayRecorder
+from sweep import greedy_policy
+
+
+def record_game(seed=5, difficulty='hard', max_ticks=1500):
+    eng = engine.SnakeEngine(difficulty=difficulty)
+    eng.reset(seed)
+    recorder = ReplayRecorder(eng)
+    recorder.start()
+    while eng.death is None and eng.move_count < max_ticks:
+        action = greedy_policy(eng)
+        recorder.record(action)
+        eng.step(action)
+    return eng, recorder.finish()
+
+
+def test_round_trip_and_verify(tmp_path):
+    eng, rec = record_game()
+    path = tmp_path / 'game.snkr'
+    rec.save(path)
+    loaded = Replay.load(path)
+    assert loaded.to_bytes() == rec.to_bytes()
+    ok, score, ticks, death = replay.verify(loaded)
+    assert ok
+    assert (score, ticks, death) == (eng.score, eng.move_count, eng.death)
+
+
+def test_seek_matches_linear_playback():
+    _, rec = record_game()
+    player = ReplayPlayer(rec, keyframe_every=64)
+    player.build_keyframes()
+    for tick in (len(rec), 500, 3, 130, 0, 129):
+        player.seek(tick)
+        expected = replay.run(rec, tick)
+        assert player.engine.score == expected.score
+        assert bytes(player.engine.grid.cells) == bytes(expected.grid.cells)
+
+
+def test_tampered_score_fails_verify():
+    _, rec = record_game()
+    rec.score += 10
+    assert not replay.verify(Replay.from_bytes(rec.to_bytes()))[0]
+
+
+@pytest.mark.parametrize('mutate', [
+    lambda data: b'',
+    lambda data: data[:replay.HEADER.size - 1],
+    lambda data: data[:-1],
+    lambda data: b'XXXX' + data[4:],
+    lambda data: data[:4] + b'\xff\xff' + data[6:],
+    # 难度字段（魔数、版本与种子之后的 8 字节）不是 ASCII
+    lambda data: data[:14] + b'\xff' * 8 + data[22:],
+])
+def test_corrupt_input_raises_replay_error(mutate):
+    _, rec = record_game(max_ticks=200)
+    with pytest.raises(ReplayError):
+        Replay.from_bytes(mutate(rec.to_bytes()))
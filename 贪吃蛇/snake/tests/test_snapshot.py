@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+import engine
+import snapshot
+from snapshot import SnapshotError
+from sweep import greedy_policy
+
+
+def advance(eng, ticks):
+    for _ in range(ticks):
+        if eng.step(greedy_policy(eng)) is not None:
+            break
+    return eng.score, eng.move_count, eng.death, bytes(eng.grid.cells)
+
+
+@pytest.fixture
+def saved(tmp_path):
+    eng = engine.SnakeEngine(difficulty='hard')
+    eng.reset(11)
+    advance(eng, 150)
+    path = tmp_path / 'savegame.snks'
+    snapshot.save(eng, path)
+    return eng, path
+
+
+def test_round_trip_continues_identically(saved):
+    eng, path = saved
+    data = path.read_bytes()
+    expected = advance(eng, 300)
+    assert advance(snapshot.load(path), 300) == expected
+    # 恢复到已有引擎上同样一致
+    other = engine.SnakeEngine(difficulty='hard')
+    assert advance(snapshot.load_into(other, data), 300) == expected
+
+
+@pytest.mark.parametrize('cut', [0, 1, snapshot.HEADER.size - 1, snapshot.HEADER.size + 100, -1])
+def test_truncated_file_raises_snapshot_error(saved, cut):
+    eng, path = saved
+    path.write_bytes(path.read_bytes()[:cut])
+    target = engine.SnakeEngine(difficulty='hard')
+    target.reset(1)
+    before = bytes(target.grid.cells), target.score, target.move_count
+    with pytest.raises(SnapshotError):
+        snapshot.load(path, target)
+    with pytest.raises(SnapshotError):
+        snapshot.load(path)
+    # 读取失败时目标引擎保持原样
+    assert (bytes(target.grid.cells), target.score, target.move_count) == before
+
+
+def test_mismatched_board_raises_snapshot_error(saved):
+    _, path = saved
+    other = engine.SnakeEngine(window_x=engine.WINDOW_X + 100, difficulty='hard')
+    with pytest.raises(SnapshotError):
+        snapshot.load(path, other)
+
+
+def test_corrupt_fields_raise_snapshot_error(saved):
+    _, path = saved
+    data = bytearray(path.read_bytes())
+    data[:4] = b'XXXX'
+    with pytest.raises(SnapshotError):
+        snapshot.load_into(engine.SnakeEngine(difficulty='hard'), bytes(data))
+    data = bytearray(path.read_bytes())
+    # 难度字段（魔数与版本之后的 8 字节）写入非法值
+    data[6:14] = b'\xff' * 8
+    with pytest.raises(SnapshotError):
+        snapshot.make_engine(bytes(data))
+
+
+@pytest.mark.parametrize('section', ['items', 'body', 'obstacles', 'fruits'])
+@pytest.mark.parametrize('value', [-1, engine.WINDOW_X // engine.CELL * (engine.WINDOW_Y // engine.CELL)])
+def test_out_of_range_cell_raises_snapshot_error(saved, section, value):
+    eng, path = saved
+    data = bytearray(path.read_bytes())
+    num_cells = eng.grid_w * eng.grid_h
+    # 依次跳过随机数状态、网格、空闲格映射，定位到各段的第一个格子下标
+    offset = snapshot.HEADER.size + snapshot.RNG_WORDS * 4 + num_cells + num_cells * 4
+    sections = {'items': len(eng.grid.free), 'body': len(eng.snake_body), 'obstacles': len(eng.obstacles),
+                'fruits': len(eng.fruits)}
+    for name, count in sections.items():
+        if name == section:
+            break
+        offset += count * 4
+    assert sections[section] > 0
+    data[offset:offset + 4] = value.to_bytes(4, 'little', signed=True)
+    target = engine.SnakeEngine(difficulty='hard')
+    target.reset(1)
+    before = bytes(target.grid.cells), target.score, target.move_count
+    with pytest.raises(SnapshotError):
+        snapshot.load_into(target, bytes(data))
+    assert (bytes(target.grid.cells), target.score, target.move_count) == before
+
+
+def test_chunked_engine_cannot_be_saved():
+    eng = engine.SnakeEngine(window_x=2048 * engine.CELL, window_y=1024 * engine.CELL)
+    assert eng.chunked
+    with pytest.raises(SnapshotError):
+        snapshot.dumps(eng)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+import csv
+
+import engine
+import sweep
+
+
+def run_sweep(tmp_path, *options):
+    out = tmp_path / 'sweep.csv'
+    sweep.main(['--games', '2', '--max-ticks', '50', '--workers', '1', '--out', str(out), *options])
+    with open(out, newline='', encoding='utf-8') as f:
+        return list(csv.DictReader(f))
+
+
+def config_keys(rows):
+    return [tuple(row[field] for field in sweep.CSV_FIELDS[:8]) for row in rows]
+
+
+def test_obstacle_grid_only_expands_hard(tmp_path):
+    rows = run_sweep(tmp_path, '--difficulty', 'easy', 'normal', 'hard', '--max-fruits', '10', '20',
+                     '--obstacles', '4', '6', '--obstacle-size', '2x2', '3x3')
+    keys = config_keys(rows)
+    assert len(keys) == len(set(keys))
+    by_diff = {d: [row for row in rows if row['difficulty'] == d] for d in engine.DIFFICULTIES}
+    assert len(by_diff['easy']) == len(by_diff['normal']) == 2
+    assert len(by_diff['hard']) == 2 * 2 * 2
+    assert all(row['obstacle_count'] == '0' for row in by_diff['easy'] + by_diff['normal'])
+    assert all(row['games'] == '2' for row in rows)
+
+
+def test_speed_and_red_probability_default_to_presets(tmp_path):
+    rows = run_sweep(tmp_path)
+    assert {row['difficulty']: (int(row['snake_speed']), float(row['red_probability'])) for row in rows} \
+        == engine.DIFFICULTIES
+    rows = run_sweep(tmp_path, '--difficulty', 'easy', 'hard', '--speed', '25', '50',
+                     '--red-probability', '0.1', '0.5')
+    assert len(rows) == 2 * 2 * 2
+    assert {(int(row['snake_speed']), float(row['red_probability'])) for row in rows} \
+        == {(25, 0.1), (25, 0.5), (50, 0.1), (50, 0.5)}
@@ -0,0 +1,80 @@
+# -*- coding: utf-8 -*-
+import random
+
+import numpy as np
+
+import engine
+import vecenv
+from sweep import greedy_policy
+
+NUM_ENVS = 3
+STEPS = 3000
+
+
+class MirroredSpawns:
+    """替换 VecSnakeEnv._spawn：按各局引擎这一步实际生成的果实（位置、种类、时刻）依次放置，两边的随机数不必相同。"""
+
+    def __init__(self, env):
+        self.env = env
+        self.queues = [[] for _ in range(env.num_envs)]
+
+    def __call__(self, games, slots, now_ms, fruit_type=None):
+        env = self.env
+        for g, s in zip(games, slots):
+            queue = self.queues[g]
+            if not queue:
+                continue
+            idx, tag, spawn_time = queue.pop(0)
+            assert env.grid[g, idx] == engine.EMPTY
+            env.grid[g, idx] = tag
+            env.fruit_pos[g, s] = idx
+            env.fruit_type[g, s] = tag
+            env.fruit_spawn_ms[g, s] = spawn_time
+
+
+def env_body(env, g):
+    cap = env.body.shape[1]
+    return [int(env.body[g, (env.body_head[g] + k) % cap]) for k in range(env.body_len[g])]
+
+
+def test_matches_engine_step_by_step():
+    speed, red_probability = engine.DIFFICULTIES['hard']
+    kwargs = dict(difficulty='hard', snake_speed=speed, red_probability=red_probability, fruit_lifetime_ms=3000)
+    env = vecenv.VecSnakeEnv(NUM_ENVS, seed=5, **kwargs)
+    spawns = env._spawn = MirroredSpawns(env)
+    engines = [engine.SnakeEngine(engine.WINDOW_X, engine.WINDOW_Y, **kwargs) for _ in range(NUM_ENVS)]
+    for g, eng in enumerate(engines):
+        eng.reset(int(env.seeds[g]))
+    rng = random.Random(5)
+    deaths = set()
+    expired = 0
+    for _ in range(STEPS):
+        actions = []
+        for g, eng in enumerate(engines):
+            # 大多走向果实（蛇会变长），偶尔随机转向：撞墙、撞障碍与撞到自己都会出现
+            action = rng.choice(engine.DIRECTIONS) if rng.random() < 0.2 else greedy_policy(eng)
+            actions.append(action)
+            before = {(idx, t) for idx, _, t in eng.fruits.items()}
+            death = eng.step(action)
+            after = eng.fruits.items()
+            spawns.queues[g] = [item for item in after if (item[0], item[2]) not in before]
+            # 消失的果实中不在蛇头上的是过期的
+            gone = before - {(idx, t) for idx, _, t in after}
+            expired += sum(1 for idx, _ in gone if death is not None or idx != eng.snake_body.head())
+        rewards, dones, info = env.step([vecenv.ACTION_CODES[a] for a in actions])
+        finished = list(np.flatnonzero(dones))
+        for g, eng in enumerate(engines):
+            assert not spawns.queues[g]
+            assert vecenv.DEATH_CAUSES[info['death'][g]] == eng.death
+            if eng.death is not None:
+                deaths.add(eng.death)
+                k = finished.index(g)
+                assert info['score'][k] == eng.score and info['ticks'][k] == eng.move_count
+                eng.reset(int(env.seeds[g]))
+            else:
+                assert env.score[g] == eng.score
+                assert env_body(env, g) == list(eng.snake_body.cells())
+            assert bytes(env.grid[g]) == bytes(eng.grid.cells)
+            assert sorted(env.fruit_pos[g][env.fruit_pos[g] >= 0]) == sorted(eng.fruits.cells())
+    assert deaths == {engine.DEATH_WALL, engine.DEATH_OBSTACLE, engine.DEATH_SELF}
+    assert expired > 0
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+# 向量化批量环境：用 NumPy 数组同时推进 N 局独立游戏，规则与 engine.SnakeEngine 相同
+import random
+import numpy as np
+import engine
+from occupancy import EMPTY, BODY, OBSTACLE, FRUIT_WHITE, FRUIT_RED
+
+# 动作编码：0 保持当前方向，1..4 对应 engine.DIRECTIONS
+ACTIONS = (None,) + engine.DIRECTIONS
+ACTION_CODES = {a: i for i, a in enumerate(ACTIONS)}
+_DX = np.array([0, 0, 0, -1, 1], dtype=np.int32)
+_DY = np.array([0, -1, 1, 0, 0], dtype=np.int32)
+_OPPOSITE = np.array([0, 2, 1, 4, 3], dtype=np.int8)
+
+# 死亡原因编码
+DEATH_NONE = 0
+DEATH_WALL = 1
+DEATH_OBSTACLE = 2
+DEATH_SELF = 3
+DEATH_CAUSES = (None, engine.DEATH_WALL, engine.DEATH_OBSTACLE, engine.DEATH_SELF)
+
+# 果实生成最多尝试的轮数（与原 spawn_fruit 的 1000 次一致）
+SPAWN_ATTEMPTS = 1000
+
+
+class VecSnakeEnv:
+    """
+    N 局游戏的结构化数组：占用网格 (N, 格数)、蛇身环形缓冲 (N, 格数)、果实槽 (N, max_fruits) 与分数等。
+    step(actions) 一次推进全部 N 局，结束的局自动重开。
+    开局（含困难模式障碍物）复用 SnakeEngine.reset，局中生成果实在合法格子中批量拒绝采样。
+    """
+
+    def __init__(self, num_envs, window_x=engine.WINDOW_X, window_y=engine.WINDOW_Y, difficulty=None,
+                 snake_speed=engine.SNAKE_SPEED, red_probability=engine.RED_PROBABILITY,
+                 max_fruits=engine.MAX_FRUITS, fruit_lifetime_ms=engine.FRUIT_LIFETIME_MS,
+                 center_block_half=engine.CENTER_BLOCK_HALF, seed=None):
+        self.num_envs = num_envs
+        self.snake_speed = snake_speed
+        self.red_probability = red_probability
+        self.max_fruits = max_fruits
+        self.fruit_lifetime_ms = fruit_lifetime_ms
+        # 模板引擎：提供棋盘尺寸、安全区与开局布局
+        self.template = engine.SnakeEngine(window_x, window_y, difficulty, snake_speed, red_probability,
+                                           max_fruits, fruit_lifetime_ms, center_block_half)
+        self.grid_w = self.template.grid_w
+        self.grid_h = self.template.grid_h
+        num_cells = self.grid_w * self.grid_h
+        self.spawnable_cells = np.flatnonzero(np.frombuffer(self.template.grid.spawnable, dtype=np.uint8)).astype(np.int32)
+        self.rng = np.random.default_rng(seed)
+        self.seed_rng = random.Random(seed)
+
+        n = num_envs
+        self.grid = np.zeros((n, num_cells), dtype=np.uint8)
+        self.body = np.zeros((n, num_cells), dtype=np.int32)
+        self.body_head = np.zeros(n, dtype=np.int32)
+        self.body_len = np.zeros(n, dtype=np.int32)
+        self.head_x = np.zeros(n, dtype=np.int32)
+        self.head_y = np.zeros(n, dtype=np.int32)
+        self.direction = np.zeros(n, dtype=np.int8)
+        self.fruit_pos = np.full((n, max_fruits), -1, dtype=np.int32)
+        self.fruit_type = np.zeros((n, max_fruits), dtype=np.uint8)
+        self.fruit_spawn_ms = np.zeros((n, max_fruits), dtype=np.int64)
+        self.move_count = np.zeros(n, dtype=np.int64)
+        self.pending_growth = np.zeros(n, dtype=np.int32)
+        self.score = np.zeros(n, dtype=np.int64)
+        self.seeds = np.zeros(n, dtype=np.int64)
+        self._rows = np.arange(n)
+        self.reset()
+
+    def reset(self, which=None):
+        """重开指定的局（默认全部），开局状态与 SnakeEngine.reset 相同。"""
+        tpl = self.template
+        for i in (range(self.num_envs) if which is None else which):
+            seed = self.seed_rng.getrandbits(32)
+            tpl.reset(seed)
+            self.seeds[i] = seed
+            self.grid[i] = np.frombuffer(tpl.grid.cells, dtype=np.uint8)
+            cells = tpl.snake_body.cells()
+            self.body[i, :len(cells)] = cells
+            self.body_head[i] = 0
+            self.body_len[i] = len(cells)
+            self.head_x[i] = tpl.snake_position[0] // engine.CELL
+            self.head_y[i] = tpl.snake_position[1] // engine.CELL
+            self.direction[i] = ACTION_CODES[tpl.direction]
+            self.fruit_pos[i] = -1
+            for j, (idx, tag, spawn_time) in enumerate(tpl.fruits.items()):
+                self.fruit_pos[i, j] = idx
+                self.fruit_type[i, j] = tag
+                self.fruit_spawn_ms[i, j] = spawn_time
+            self.move_count[i] = 0
+            self.pending_growth[i] = 0
+            self.score[i] = 0
+
+    def _spawn(self, games, slots, now_ms, fruit_type=None):
+        """在 games 各自的 slots 槽位生成一个果实；每局每次调用至多一个。"""
+        grid = self.grid
+        for _ in range(SPAWN_ATTEMPTS):
+            if not games.size:
+                return
+            cells = self.spawnable_cells[self.rng.integers(0, self.spawnable_cells.size, games.size)]
+            ok = grid[games, cells] == EMPTY
+            g, s, c = games[ok], slots[ok], cells[ok]
+            if fruit_type is None:
+                tags = np.where(self.rng.random(g.size) < self.red_probability, FRUIT_RED, FRUIT_WHITE).astype(np.uint8)
+            else:
+                tags = np.full(g.size, fruit_type, dtype=np.uint8)
+            grid[g, c] = tags
+            self.fruit_pos[g, s] = c
+            self.fruit_type[g, s] = tags
+            self.fruit_spawn_ms[g, s] = now_ms[g]
+            games, slots = games[~ok], slots[~ok]
+
+    def step(self, actions):
+        """
+        推进全部 N 局。actions 为长度 N 的动作编码数组（见 ACTIONS）。
+        返回 (rewards, dones, info)：rewards 为本步得分，dones 标记本步结束（已自动重开）的局，
+        info['death'] 为死亡原因编码，info['score'] / info['ticks'] 为结束局的最终分数与存活步数。
+        """
+        rows = self._rows
+        grid = self.grid
+        w, h = self.grid_w, self.grid_h
+        cap = self.body.shape[1]
+        fruit_pos = self.fruit_pos
+        now_ms = self.move_count * 1000 // self.snake_speed
+
+        # 移除过期果实并在原槽位补充
+        expired = (fruit_pos >= 0) & (now_ms[:, None] - self.fruit_spawn_ms >= self.fruit_lifetime_ms)
+        if expired.any():
+            g, s = np.nonzero(expired)
+            grid[g, fruit_pos[g, s]] = EMPTY
+            fruit_pos[g, s] = -1
+            for j in range(self.max_fruits):
+                games = np.flatnonzero(expired[:, j])
+                self._spawn(games, np.full(games.size, j), now_ms)
+
+        # 防止反向并移动蛇头
+        actions = np.asarray(actions, dtype=np.int8)
+        turn = (actions != 0) & (actions != _OPPOSITE[self.direction])
+        self.direction = np.where(turn, actions, self.direction)
+        self.head_x += _DX[self.direction]
+        self.head_y += _DY[self.direction]
+
+        # 每 20 步补一个果实
+        self.move_count += 1
+        free_slot = fruit_pos < 0
+        periodic = (self.move_count % 20 == 0) & free_slot.any(axis=1)
+        if periodic.any():
+            games = np.flatnonzero(periodic)
+            self._spawn(games, free_slot[games].argmax(axis=1), now_ms)
+
+        out = (self.head_x < 0) | (self.head_x >= w) | (self.head_y < 0) | (self.head_y >= h)
+        idx = np.where(out, 0, self.head_y * w + self.head_x)
+        tag = np.where(out, EMPTY, grid[rows, idx])
+        eat = tag >= FRUIT_WHITE
+
+        # 吃果实：红 +20 / 生长 2，白 +10 / 生长 1
+        rewards = np.where(eat, np.where(tag == FRUIT_RED, 20, 10), 0)
+        self.score += rewards
+        self.pending_growth += np.where(eat, np.where(tag == FRUIT_RED, 2, 1), 0)
+        if eat.any():
+            g = np.flatnonzero(eat)
+            fruit_pos[g, (fruit_pos[g] == idx[g, None]).argmax(axis=1)] = -1
+
+        # 未吃果实：消化生长或弹出蛇尾
+        grow = ~eat & (self.pending_growth > 0)
+        self.pending_growth -= grow
+        pop = ~eat & ~grow
+        g = np.flatnonzero(pop)
+        tail = self.body[g, (self.body_head[g] + self.body_len[g] - 1) % cap]
+        grid[g, tail] = EMPTY
+        self.body_len[g] -= 1
+
+        # 碰撞判定：蛇头尚未写入，该格若为蛇身即撞到自己
+        tag = np.where(out, EMPTY, grid[rows, idx])
+        death = np.where(out, DEATH_WALL,
+                         np.where(tag == OBSTACLE, DEATH_OBSTACLE,
+                                  np.where(tag == BODY, DEATH_SELF, DEATH_NONE))).astype(np.int8)
+        alive = death == DEATH_NONE
+        g = np.flatnonzero(alive)
+        self.body_head[g] = (self.body_head[g] - 1) % cap
+        self.body[g, self.body_head[g]] = idx[g]
+        self.body_len[g] += 1
+        grid[g, idx[g]] = BODY
+
+        # 吃光果实后立即补一个
+        empty = eat & (fruit_pos < 0).all(axis=1)
+        if empty.any():
+            games = np.flatnonzero(empty)
+            self._spawn(games, np.zeros(games.size, dtype=np.int64), now_ms)
+
+        dones = ~alive
+        info = {'death': death}
+        if dones.any():
+            finished = np.flatnonzero(dones)
+            info['score'] = self.score[finished].copy()
+            info['ticks'] = self.move_count[finished].copy()
+            self.reset(finished)
+        return rewards, dones, info
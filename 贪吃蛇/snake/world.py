@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+# 分块世界：超大棋盘按 CHUNK × CHUNK 的块存储，块在第一次写入非空标记时才分配、变回全空时释放，
+# 内存只与有内容的区域成正比。接口与 occupancy.OccupancyGrid 相同（格子下标仍为 gy * width + gx），
+# 引擎、碰撞判定与果实管理不需要区分两种网格。
+from occupancy import EMPTY
+
+# 块边长（格）；必须是 2 的幂，块内偏移用位运算计算
+CHUNK_SHIFT = 6
+CHUNK = 1 << CHUNK_SHIFT
+CHUNK_MASK = CHUNK - 1
+# 拒绝采样的尝试次数上限，超过后退化为从随机起点顺序查找（只在棋盘几乎填满时发生）
+REJECTION_TRIES = 64
+
+
+class _CellView:
+    """让 grid.cells[idx] 的读取写法对分块网格同样成立（只读）。"""
+    __slots__ = ('get',)
+
+    def __init__(self, get):
+        self.get = get
+
+    def __getitem__(self, idx):
+        return self.get(idx)
+
+
+class SparseFree:
+    """
+    分块网格的空闲格集合：只维护数量，抽取时在全盘均匀取格子并拒绝不可生成或已占用的格子。
+    大棋盘上空地占绝大多数，期望一两次就能取到；与 FreeCells 一样按同一随机数序列确定性地抽取。
+    """
+    __slots__ = ('grid', 'count')
+
+    def __init__(self, grid, count: int):
+        self.grid = grid
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, idx: int) -> bool:
+        return self.grid.spawnable(idx) and self.grid.get(idx) == EMPTY
+
+    def add(self, idx: int):
+        self.count += 1
+
+    def discard(self, idx: int):
+        self.count -= 1
+
+    def copy(self) -> 'SparseFree':
+        return SparseFree(self.grid, self.count)
+
+    def choice(self, rng) -> int:
+        grid = self.grid
+        num_cells = grid.width * grid.height
+        idx = 0
+        for _ in range(REJECTION_TRIES):
+            idx = rng.randrange(num_cells)
+            if idx in self:
+                return idx
+        for offset in range(num_cells):
+            cand = (idx + offset) % num_cells
+            if cand in self:
+                return cand
+        raise IndexError('没有空闲格')
+
+
+class ChunkedGrid:
+    """
+    width × height 的分块占用网格。chunks 为 块编号 → bytearray(CHUNK * CHUNK)，
+    filled 记录每块中非空格子数，降到 0 时整块释放。
+    spawnable 为判断格子能否生成果实的函数（大棋盘不再构建全盘掩码），spawn_total 为空盘时可生成的格子数。
+    dirty 与 OccupancyGrid 相同；分块渲染每帧按视口重画，通常保持为 None。
+    """
+    __slots__ = ('width', 'height', 'chunks_x', 'chunks_y', 'chunks', 'filled', 'cells', 'spawnable',
+                 'spawn_total', 'free', 'dirty')
+
+    def __init__(self, width: int, height: int, spawnable, spawn_total: int):
+        self.width = width
+        self.height = height
+        self.chunks_x = (width + CHUNK_MASK) >> CHUNK_SHIFT
+        self.chunks_y = (height + CHUNK_MASK) >> CHUNK_SHIFT
+        self.chunks = {}
+        self.filled = {}
+        self.cells = _CellView(self.get)
+        self.spawnable = spawnable
+        self.spawn_total = spawn_total
+        self.free = SparseFree(self, spawn_total)
+        self.dirty = None
+
+    def clear(self):
+        self.chunks.clear()
+        self.filled.clear()
+        self.free = SparseFree(self, self.spawn_total)
+
+    def index(self, gx: int, gy: int) -> int:
+        return gy * self.width + gx
+
+    def coords(self, idx: int) -> tuple[int, int]:
+        return idx % self.width, idx // self.width
+
+    def in_bounds(self, gx: int, gy: int) -> bool:
+        return 0 <= gx < self.width and 0 <= gy < self.height
+
+    def chunk_id(self, gx: int, gy: int) -> int:
+        return (gy >> CHUNK_SHIFT) * self.chunks_x + (gx >> CHUNK_SHIFT)
+
+    def get(self, idx: int) -> int:
+        gy, gx = divmod(idx, self.width)
+        chunk = self.chunks.get((gy >> CHUNK_SHIFT) * self.chunks_x + (gx >> CHUNK_SHIFT))
+        if chunk is None:
+            return EMPTY
+        return chunk[((gy & CHUNK_MASK) << CHUNK_SHIFT) | (gx & CHUNK_MASK)]
+
+    def set(self, idx: int, tag: int):
+        gy, gx = divmod(idx, self.width)
+        cid = (gy >> CHUNK_SHIFT) * self.chunks_x + (gx >> CHUNK_SHIFT)
+        chunk = self.chunks.get(cid)
+        if chunk is None:
+            if tag == EMPTY:
+                return
+            chunk = self.chunks[cid] = bytearray(CHUNK * CHUNK)
+            self.filled[cid] = 0
+        off = ((gy & CHUNK_MASK) << CHUNK_SHIFT) | (gx & CHUNK_MASK)
+        old = chunk[off]
+        chunk[off] = tag
+        if self.dirty is not None:
+            self.dirty.append(idx)
+        if (old == EMPTY) == (tag == EMPTY):
+            return
+        if tag == EMPTY:
+            self.filled[cid] -= 1
+            if not self.filled[cid]:
+                del self.chunks[cid]
+                del self.filled[cid]
+            if self.spawnable(idx):
+                self.free.add(idx)
+        else:
+            self.filled[cid] += 1
+            if self.spawnable(idx):
+                self.free.discard(idx)
+
+    def is_empty(self, idx: int) -> bool:
+        return self.get(idx) == EMPTY
+
+    def occupied(self) -> tuple[list[int], bytes]:
+        """全部非空格子的下标与对应标记（联机关键帧使用），只遍历已分配的块。"""
+        width = self.width
+        idx = []
+        tags = bytearray()
+        for cid, chunk in sorted(self.chunks.items()):
+            base_y, base_x = divmod(cid, self.chunks_x)
+            base = (base_y << CHUNK_SHIFT) * width + (base_x << CHUNK_SHIFT)
+            for off, tag in enumerate(chunk):
+                if tag:
+                    idx.append(base + (off >> CHUNK_SHIFT) * width + (off & CHUNK_MASK))
+                    tags.append(tag)
+        return idx, bytes(tags)
+
+    def save_cells(self):
+        """全部已分配块的拷贝，供 restore_cells 恢复（引擎的 get_state / set_state 使用）。"""
+        return {cid: bytes(chunk) for cid, chunk in self.chunks.items()}, dict(self.filled)
+
+    def restore_cells(self, saved):
+        chunks, filled = saved
+        self.chunks = {cid: bytearray(chunk) for cid, chunk in chunks.items()}
+        self.filled = dict(filled)